@@ -1,51 +1,355 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import time
 from typing import List, Optional
 
-from app.schemas import AnalysisRequest, AnalysisResponse, Candle, SignalType
+from app.schemas import (
+    AnalysisRequest, AnalysisResponse, Candle, SignalType, SessionResponse, ColumnarAnalysisRequest,
+    BacktestRequest, BacktestResponse, BatchAnalysisRequest, BatchAnalysisResponse,
+    SignalHistoryResponse, SignalSnapshotResponse,
+)
 from app.engine.signal_engine import engine
+from app.engine.frame import MarketFrame, FrameValidationError, COLUMNS
+from app.engine.sessions import sessions, StaleCandleError
+from app.engine.backtest import run_backtest
+from app.engine.batch import batch_analyzer
+from app.engine.ingest import CandleStreamParser, IngestError, RowLimitError
+from app.engine.cache import CacheEntry
+from app.utils.fastjson import FastJSONRoute, FastJSONResponse, loads
+from market_data.storage import load_candles
 
-router = APIRouter()
+# Request bodies are decoded and responses encoded with orjson when installed
+router = APIRouter(route_class=FastJSONRoute, default_response_class=FastJSONResponse)
 
 @router.get("/health")
 def health_check():
     return {"status": "ok", "service": "AI Signal Engine"}
 
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def _cached_response(entry: CacheEntry, if_none_match: Optional[str]) -> Response:
+    """
+    Serves an analysis from its cache entry: 304 when the client already
+    holds this exact response, otherwise the pre-serialized body.
+    """
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if if_none_match and _etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
 @router.post("/analyze", response_model=AnalysisResponse)
-def analyze_market(request: AnalysisRequest):
+def analyze_market(request: AnalysisRequest, if_none_match: Optional[str] = Header(None)):
     """
     Analyzes list of candles and returns a trading signal.
+    Identical windows are served from the result cache; send the returned
+    ETag as If-None-Match to get 304 Not Modified instead of the body.
     """
     if not request.candles:
          raise HTTPException(status_code=400, detail="No candle data provided")
     
-    # Sort candles by timestamp just in case
-    sorted_candles = sorted(request.candles, key=lambda c: c.timestamp)
-    
-    response = engine.analyze(
-        candles=sorted_candles, 
+    # The engine sorts by timestamp while building its columnar frame; only the
+    # trailing window the agents need is converted
+    entry = engine.analyze_cached(
+        MarketFrame.from_candles(engine.trim_candles(request.candles)),
         symbol=request.symbol, 
-        timeframe=request.timeframe
+        timeframe=request.timeframe,
+        received=len(request.candles)
     )
-    return response
+    return _cached_response(entry, if_none_match)
 
-@router.get("/signals/latest", response_model=AnalysisResponse)
-def get_latest_signal():
+@router.post(
+    "/analyze/columnar",
+    response_model=AnalysisResponse,
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": ColumnarAnalysisRequest.schema()}},
+    }},
+)
+async def analyze_columnar(request: Request):
     """
-    Returns the latest generated signal from memory.
+    Same as /analyze for a columnar body: parallel arrays of epoch-ms
+    timestamps and OHLCV. The arrays are validated in vectorized form
+    (no per-candle models) and passed straight to the engine.
+    """
+    try:
+        body = loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=422, detail="Expected a JSON object")
+    for field in ("symbol", "timeframe"):
+        if not isinstance(body.get(field), str):
+            raise HTTPException(status_code=422, detail=[
+                {"loc": ["body", field], "msg": "Input should be a valid string", "type": "string_type"}
+            ])
+
+    try:
+        frame = MarketFrame.from_columns(*(body.get(name) for name in ("timestamp",) + COLUMNS))
+    except FrameValidationError as e:
+        loc = ["body", e.field] + ([e.index] if e.index is not None else [])
+        raise HTTPException(status_code=422, detail=[{"loc": loc, "msg": e.message, "type": e.kind}])
+    if len(frame) == 0:
+        raise HTTPException(status_code=400, detail="No candle data provided")
+
+    # CPU-bound: keep it off the event loop like the sync endpoints
+    entry = await run_in_threadpool(engine.analyze_cached, frame, body["symbol"], body["timeframe"])
+    return _cached_response(entry, request.headers.get("if-none-match"))
+
+async def _read_upload(request: Request, fmt: Optional[str]) -> MarketFrame:
+    """
+    Parses a streamed NDJSON/CSV candle upload chunk by chunk into columnar
+    buffers; the body is never held in memory as a whole.
+    """
+    if fmt is None:
+        fmt = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    try:
+        parser = CandleStreamParser(fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                await run_in_threadpool(parser.feed, chunk)
+        frame = await run_in_threadpool(parser.close)
+    except RowLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except IngestError as e:
+        raise HTTPException(status_code=422, detail=[
+            {"loc": ["body", "line", e.line], "msg": e.message, "type": "value_error"}
+        ])
+    if len(frame) == 0:
+        raise HTTPException(status_code=400, detail="No candle data provided")
+    return frame
+
+@router.post("/analyze/upload", response_model=AnalysisResponse)
+async def analyze_upload(request: Request, symbol: str, timeframe: str,
+                         fmt: Optional[str] = Query(None, alias="format")):
+    """
+    Same as /analyze for a streamed upload: NDJSON (one candle per line) or
+    CSV, chosen by `format` or the Content-Type. Rows are validated as
+    they arrive and the first bad line rejects the upload.
+    """
+    frame = await _read_upload(request, fmt)
+    entry = await run_in_threadpool(engine.analyze_cached, frame, symbol, timeframe)
+    return _cached_response(entry, request.headers.get("if-none-match"))
+
+def _publish_and_review(result: AnalysisResponse):
+    engine.publish(result)
+    engine.request_review(result)
+
+@router.post("/analyze/batch", response_model=BatchAnalysisResponse)
+def analyze_batch(request: BatchAnalysisRequest):
+    """
+    Analyzes many symbol/timeframe candle sets in parallel.
+    Each item has the /analyze body; failures are reported per item.
+    """
+    start = time.perf_counter()
+    results = batch_analyzer.analyze(request.items, publish=_publish_and_review)
+
+    succeeded = sum(1 for item in results if item.error is None)
+    return BatchAnalysisResponse(
+        results=results,
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        total_ms=round((time.perf_counter() - start) * 1000, 3),
+        executor=batch_analyzer.executor_kind,
+        workers=batch_analyzer.workers
+    )
+
+@router.post("/sessions", response_model=SessionResponse)
+def create_session(request: AnalysisRequest):
+    """
+    Opens an append-only analysis session seeded with history.
+    Replaces any existing session for the same symbol/timeframe.
+    """
+    if not request.candles:
+        raise HTTPException(status_code=400, detail="No candle data provided")
+
+    session = sessions.create(request.symbol, request.timeframe, MarketFrame.from_candles(request.candles))
+    with session.lock:
+        session.last_result = engine.analyze_state(
+            session.state, session.ring.frame(), session.symbol, session.timeframe
+        )
+        return SessionResponse(
+            session_id=session.id,
+            symbol=session.symbol,
+            timeframe=session.timeframe,
+            candles=len(session.ring),
+            analysis=session.last_result
+        )
+
+@router.post("/sessions/{session_id}/candles", response_model=AnalysisResponse)
+def append_session_candle(session_id: str, candle: Candle):
+    """
+    Appends one closed candle to a session and returns the updated signal.
     """
-    latest = engine.get_latest_analysis()
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    with session.lock:
+        try:
+            appended = session.append(candle)
+        except StaleCandleError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        if appended or session.last_result is None:
+            session.last_result = engine.analyze_state(
+                session.state, session.ring.frame(), session.symbol, session.timeframe
+            )
+        return session.last_result
+
+@router.delete("/sessions/{session_id}")
+def delete_session(session_id: str):
+    if not sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"status": "deleted", "session_id": session_id}
+
+@router.post("/backtest", response_model=BacktestResponse)
+def backtest(request: BacktestRequest):
+    """
+    Runs every agent and the consensus over stored history in one vectorized
+    pass. Bar i matches what /analyze returns for the candles up to bar i.
+    """
+    arrays = load_candles(request.symbol, request.timeframe, start=request.start, end=request.end, as_arrays=True)
+    if len(arrays['timestamp']) == 0:
+        raise HTTPException(status_code=404, detail="No stored candles for this symbol/timeframe")
+
+    result = run_backtest(MarketFrame(**arrays), engine.agents, engine.aggregator)
+    return BacktestResponse(
+        symbol=request.symbol,
+        timeframe=request.timeframe,
+        bars=len(result.frame),
+        stats=result.stats,
+        series=result.series() if request.include_series else None
+    )
+
+@router.post("/backtest/upload", response_model=BacktestResponse)
+async def backtest_upload(request: Request, symbol: str, timeframe: str,
+                          fmt: Optional[str] = Query(None, alias="format"), include_series: bool = False):
+    """
+    Same as /backtest over a streamed NDJSON/CSV upload instead of stored history.
+    """
+    frame = await _read_upload(request, fmt)
+    result = await run_in_threadpool(run_backtest, frame, engine.agents, engine.aggregator)
+    return BacktestResponse(
+        symbol=symbol,
+        timeframe=timeframe,
+        bars=len(result.frame),
+        stats=result.stats,
+        series=result.series() if include_series else None
+    )
+
+@router.get("/cache/stats")
+def cache_stats():
+    """
+    Result cache counters: hits, misses, evictions, expirations, size.
+    `llm_reviews` holds the LLM review cache and batching counters,
+    `signal_store` the size of the per-symbol signal history.
+    """
+    stats = engine.cache.stats()
+    stats["llm_reviews"] = engine.llm.stats()
+    stats["llm_reviews"]["batching"] = engine.llm_batcher.stats()
+    stats["signal_store"] = engine.signals.stats()
+    return stats
+
+@router.get("/analyses/{analysis_id}", response_model=AnalysisResponse)
+def get_analysis(analysis_id: str):
+    """
+    A recent analysis by its analysis_id. With LLM_MODE=deferred, poll this
+    until llm_status is no longer "pending" to get the reviewed result.
+    """
+    result = engine.get_analysis(analysis_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired analysis_id")
+    return result
+
+# Comment line sent on idle /signals/stream connections to keep proxies from closing them
+SSE_KEEPALIVE_SECONDS = 15
+
+@router.get("/signals/stream")
+async def stream_signals():
+    """
+    Server-Sent Events: every published analysis as an `analysis` event,
+    including the LLM-reviewed version of deferred results.
+    """
+    async def events():
+        queue = engine.feed.subscribe()
+        try:
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: analysis\ndata: {payload}\n\n"
+        finally:
+            engine.feed.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/signals/latency")
+def signal_latency():
+    """
+    Latency percentiles (ms) of rule-only results (`rule`), LLM reviews
+    (`llm_review`) and LLM-refined results (`refined`), plus review counters.
+    """
+    return {
+        "llm_mode": engine.llm_mode,
+        "llm_available": engine.llm.is_available(),
+        "latency_ms": engine.latency.stats(),
+        "reviews": engine.reviewer.stats(),
+        "stream_clients": len(engine.feed),
+    }
+
+def _latest_or_404(symbol: Optional[str], timeframe: Optional[str]) -> AnalysisResponse:
+    latest = engine.get_latest_analysis(symbol, timeframe)
     if not latest:
+        if symbol or timeframe:
+            raise HTTPException(status_code=404, detail="No analysis for this symbol/timeframe yet")
         raise HTTPException(status_code=404, detail="No analysis performed yet")
     return latest
 
+@router.get("/signals/latest", response_model=AnalysisResponse)
+def get_latest_signal(symbol: Optional[str] = None, timeframe: Optional[str] = None):
+    """
+    Returns the latest generated signal from memory.
+    Filter by symbol and/or timeframe; without them, the last one overall.
+    """
+    return _latest_or_404(symbol, timeframe)
+
+@router.get("/signals/history", response_model=SignalHistoryResponse)
+def get_signal_history(symbol: str, timeframe: str, limit: int = Query(20, ge=1)):
+    """
+    The most recent signals for a symbol/timeframe, newest first
+    (at most SIGNAL_HISTORY_SIZE are kept per key).
+    """
+    signals = engine.signals.history(symbol, timeframe, limit)
+    if not signals:
+        raise HTTPException(status_code=404, detail="No analysis for this symbol/timeframe yet")
+    return SignalHistoryResponse(symbol=signals[0].symbol, timeframe=timeframe, count=len(signals), signals=signals)
+
+@router.get("/signals/snapshot", response_model=SignalSnapshotResponse)
+def get_signal_snapshot(timeframe: Optional[str] = None):
+    """
+    Latest signal of every symbol/timeframe (optionally one timeframe),
+    most recently updated first.
+    """
+    signals = engine.signals.snapshot(timeframe)
+    return SignalSnapshotResponse(count=len(signals), signals=signals)
+
 @router.get("/signals/explain")
-def explain_signal():
+def explain_signal(symbol: Optional[str] = None, timeframe: Optional[str] = None):
     """
     Returns detailed explanation of the latest signal.
     """
-    latest = engine.get_latest_analysis()
-    if not latest:
-        raise HTTPException(status_code=404, detail="No analysis performed yet")
+    latest = _latest_or_404(symbol, timeframe)
     
     return {
         "signal": latest.signal,
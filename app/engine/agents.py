@@ -1,33 +1,117 @@
-from abc import ABC, abstractmethod
-from typing import List, Tuple
+from abc import ABC
+from typing import List, Optional, Tuple
 import pandas as pd
 import numpy as np
 
 from app.schemas import Candle, SignalType, AgentSignal
-from app.engine.indicators import calculate_sma, calculate_rsi, calculate_macd, calculate_atr
+from app.engine.indicator_graph import IndicatorKey, indicator, indicator_window
+from app.engine.frame import MarketFrame
+from app.engine.streaming import IndicatorState
+
+SIGNAL_VALUES = {SignalType.BUY: 1, SignalType.SELL: -1, SignalType.HOLD: 0}
+
+SMA_50 = indicator("sma", period=50)
+SMA_200 = indicator("sma", period=200)
+RSI_14 = indicator("rsi", period=14)
+MACD = indicator("macd", fast=12, slow=26, signal=9)
+BOLLINGER_20 = indicator("bollinger", period=20, k=2)
+
+
+def _round2(values: np.ndarray) -> np.ndarray:
+    # Python's round() (not np.round) so series match the per-request path exactly
+    return np.array([round(v, 2) for v in values.tolist()], dtype=np.float64)
+
 
 class BaseAgent(ABC):
+    """
+    Agents implement either `analyze_frame` (preferred, receives the shared
+    MarketFrame built once by the engine) or the legacy `analyze(candles)`.
+    Each entry point falls back to the other, so both always work; a subclass
+    that overrides neither is rejected when the class is defined.
+    `time_budget_ms` overrides the engine's default per-agent time budget.
+
+    `required_indicators` lists the indicator nodes the agent reads through
+    `frame.indicator(...)`; the engine evaluates the final value of their
+    union once per frame (`last=True`) before the agents run. `analyze_frame`
+    should read them the same way; `signal_series` reads the full series.
+
+    `lookback` is the number of trailing bars the agent's own rules need
+    (e.g. 200 before it trusts SMA200). Together with its indicators'
+    windows it bounds the input the engine passes in (see `required_window`);
+    None means unknown, and the engine then keeps the full input.
+    """
+    time_budget_ms: Optional[float] = None
+    required_indicators: Tuple[IndicatorKey, ...] = ()
+    lookback: Optional[int] = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.analyze is BaseAgent.analyze and cls.analyze_frame is BaseAgent.analyze_frame:
+            raise TypeError(f"{cls.__name__} must implement analyze or analyze_frame")
+
     def __init__(self, name: str):
         self.name = name
 
+    def required_window(self) -> Optional[int]:
+        """
+        Trailing bars `analyze_frame` depends on: `lookback`, widened to the
+        indicators' windows (including the EMA convergence window for MACD).
+        None when the agent or one of its indicators does not declare it.
+        """
+        if self.lookback is None:
+            return None
+        windows = [indicator_window(key) for key in self.required_indicators]
+        if None in windows:
+            return None
+        return max([self.lookback] + windows)
+
     def _candles_to_df(self, candles: List[Candle]) -> pd.DataFrame:
-        data = [c.dict() for c in candles]
-        df = pd.DataFrame(data)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df.set_index('timestamp', inplace=True)
-        return df.sort_index()
+        return MarketFrame.from_candles(candles).df
 
-    @abstractmethod
     def analyze(self, candles: List[Candle]) -> AgentSignal:
-        pass
+        if type(self).analyze_frame is BaseAgent.analyze_frame:
+            raise NotImplementedError(f"{type(self).__name__} must implement analyze or analyze_frame")
+        return self.analyze_frame(MarketFrame.from_candles(candles))
+
+    def analyze_frame(self, frame: MarketFrame) -> AgentSignal:
+        if type(self).analyze is BaseAgent.analyze:
+            raise NotImplementedError(f"{type(self).__name__} must implement analyze or analyze_frame")
+        return self.analyze(frame.candles())
+
+    def analyze_state(self, state: IndicatorState) -> AgentSignal:
+        """
+        Evaluates the agent from streaming indicator state (O(1) per candle).
+        Agents that cannot run on state raise NotImplementedError.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support streaming state")
+
+    def signal_series(self, frame: MarketFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized backtest form: the signal (+1 BUY, -1 SELL, 0 HOLD) and
+        confidence this agent would emit for every prefix frame[:i + 1].
+        The default replays `analyze_frame` bar by bar (O(N^2)); built-in
+        agents override it with a single vectorized pass.
+        """
+        n = len(frame)
+        signals = np.zeros(n, dtype=np.int8)
+        confidence = np.zeros(n, dtype=np.float64)
+        for i in range(n):
+            sig = self.analyze_frame(frame.slice(0, i + 1))
+            signals[i] = SIGNAL_VALUES[sig.signal]
+            confidence[i] = sig.confidence
+        return signals, confidence
 
 class TrendFollowingAgent(BaseAgent):
-    def __init__(self):
+    required_indicators = (SMA_50, SMA_200)
+    lookback = 200
+
+    def __init__(self, min_separation: float = 0.02):
         super().__init__("TrendFollowingAgent")
+        # SMA50/SMA200 separation (fraction of SMA200) required for a strong signal
+        self.min_separation = min_separation
 
-    def analyze(self, candles: List[Candle]) -> AgentSignal:
-        df = self._candles_to_df(candles)
-        if len(df) < 200:
+    def analyze_frame(self, frame: MarketFrame) -> AgentSignal:
+        if len(frame) < 200:
              return AgentSignal(
                 signal=SignalType.HOLD,
                 confidence=0.0,
@@ -36,16 +120,45 @@ class TrendFollowingAgent(BaseAgent):
             )
 
         # Strategy: Golden Cross / Death Cross
-        sma_50 = calculate_sma(df['close'], 50).iloc[-1]
-        sma_200 = calculate_sma(df['close'], 200).iloc[-1]
-        
+        sma_50 = frame.indicator(SMA_50, last=True)
+        sma_200 = frame.indicator(SMA_200, last=True)
+        return self._evaluate(sma_50, sma_200)
+
+    def analyze_state(self, state: IndicatorState) -> AgentSignal:
+        if state.count < 200:
+            return AgentSignal(
+                signal=SignalType.HOLD,
+                confidence=0.0,
+                agent_name=self.name,
+                metadata={"reason": "Insufficient data for 200 SMA"}
+            )
+        return self._evaluate(state.sma_50.value, state.sma_200.value)
+
+    def signal_series(self, frame: MarketFrame) -> Tuple[np.ndarray, np.ndarray]:
+        sma_50 = frame.indicator(SMA_50).to_numpy()
+        sma_200 = frame.indicator(SMA_200).to_numpy()
+        valid = np.arange(1, len(frame) + 1) >= 200
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            diff_pct = np.abs(sma_50 - sma_200) / sma_200
+            strong = valid & (diff_pct > self.min_separation)
+            buy = strong & (sma_50 > sma_200)
+            sell = strong & (sma_50 < sma_200)
+            weak = valid & ~strong & (sma_50 != sma_200)
+            strong_conf = np.minimum(0.6 + (diff_pct * 10), 0.90)
+
+        signals = np.where(buy, 1, np.where(sell, -1, 0)).astype(np.int8)
+        confidence = np.where(buy | sell, strong_conf, np.where(weak, 0.3, 0.0))
+        return signals, _round2(confidence)
+
+    def _evaluate(self, sma_50: float, sma_200: float) -> AgentSignal:
         # Calculate slope or recent trend strength for confidence
         # Simple heuristic: difference between MAs
         diff_pct = abs(sma_50 - sma_200) / sma_200
         confidence = min(0.5 + (diff_pct * 10), 0.95) # Base 0.5, scales with separation
 
         if sma_50 > sma_200:
-            if diff_pct > 0.02: # Require 2% separation for strong signal
+            if diff_pct > self.min_separation: # Require 2% separation (default) for strong signal
                 signal = SignalType.BUY
                 confidence = min(0.6 + (diff_pct * 10), 0.90)
                 reasoning = f"Strong Golden Cross detected (SMA50 {sma_50:.2f} > SMA200 {sma_200:.2f}, Diff {diff_pct:.2%})"
@@ -55,7 +168,7 @@ class TrendFollowingAgent(BaseAgent):
                 reasoning = f"Weak Golden Cross (SMA50 > SMA200), insufficient separation ({diff_pct:.2%})"
 
         elif sma_50 < sma_200:
-            if diff_pct > 0.02: # Require 2% separation for strong signal
+            if diff_pct > self.min_separation: # Require 2% separation (default) for strong signal
                 signal = SignalType.SELL
                 confidence = min(0.6 + (diff_pct * 10), 0.90)
                 reasoning = f"Strong Death Cross detected (SMA50 {sma_50:.2f} < SMA200 {sma_200:.2f}, Diff {diff_pct:.2%})"
@@ -81,28 +194,62 @@ class TrendFollowingAgent(BaseAgent):
         )
 
 class MomentumAgent(BaseAgent):
-    def __init__(self):
+    required_indicators = (RSI_14, MACD)
+    lookback = 30
+
+    def __init__(self, rsi_oversold: float = 30, rsi_overbought: float = 70):
         super().__init__("MomentumAgent")
+        self.rsi_oversold = rsi_oversold
+        self.rsi_overbought = rsi_overbought
 
-    def analyze(self, candles: List[Candle]) -> AgentSignal:
-        df = self._candles_to_df(candles)
-        if len(df) < 30:
+    def analyze_frame(self, frame: MarketFrame) -> AgentSignal:
+        if len(frame) < 30:
+            return AgentSignal(
+                signal=SignalType.HOLD,
+                confidence=0.0,
+                agent_name=self.name,
+                metadata={"reason": "Insufficient data"}
+            )
+
+        rsi = frame.indicator(RSI_14, last=True)
+        macd = frame.indicator(MACD, last=True)
+        return self._evaluate(rsi, macd['macd'], macd['signal'])
+
+    def analyze_state(self, state: IndicatorState) -> AgentSignal:
+        if state.count < 30:
             return AgentSignal(
                 signal=SignalType.HOLD,
                 confidence=0.0,
                 agent_name=self.name,
                 metadata={"reason": "Insufficient data"}
             )
+        return self._evaluate(state.rsi.value, state.macd.macd, state.macd.signal)
+
+    def signal_series(self, frame: MarketFrame) -> Tuple[np.ndarray, np.ndarray]:
+        rsi = frame.indicator(RSI_14).to_numpy()
+        macd_df = frame.indicator(MACD)
+        macd_val = macd_df['macd'].to_numpy()
+        signal_val = macd_df['signal'].to_numpy()
+        valid = np.arange(1, len(frame) + 1) >= 30
 
-        rsi = calculate_rsi(df['close'], 14).iloc[-1]
-        macd_df = calculate_macd(df['close'])
-        macd_val = macd_df['macd'].iloc[-1]
-        signal_val = macd_df['signal'].iloc[-1]
+        rsi_sig = np.where(rsi < self.rsi_oversold, 1, np.where(rsi > self.rsi_overbought, -1, 0))
+        macd_sig = np.where(macd_val > signal_val, 1, np.where(macd_val < signal_val, -1, 0))
 
+        both_buy = (rsi_sig == 1) & (macd_sig == 1)
+        both_sell = (rsi_sig == -1) & (macd_sig == -1)
+        signals = np.where(valid & both_buy, 1, np.where(valid & both_sell, -1, 0)).astype(np.int8)
+        confidence = np.select(
+            [~valid, both_buy | both_sell, rsi_sig != 0, macd_sig != 0],
+            [0.0, 0.80, 0.4, 0.3],
+            default=0.5,
+        )
+        return signals, _round2(confidence)
+
+    def _evaluate(self, rsi: float, macd_val: float, signal_val: float) -> AgentSignal:
         # RSI Logic
         rsi_signal = SignalType.HOLD
-        if rsi < 30: rsi_signal = SignalType.BUY
-        elif rsi > 70: rsi_signal = SignalType.SELL
+        if rsi < self.rsi_oversold: rsi_signal = SignalType.BUY
+        elif rsi > self.rsi_overbought: rsi_signal = SignalType.SELL
         
         # MACD Logic
         macd_signal = SignalType.HOLD
@@ -117,11 +264,11 @@ class MomentumAgent(BaseAgent):
         if rsi_signal == SignalType.BUY and macd_signal == SignalType.BUY:
             final_signal = SignalType.BUY
             confidence = 0.80
-            reason.append("RSI oversold (<30) and MACD bullish")
+            reason.append(f"RSI oversold (<{self.rsi_oversold:g}) and MACD bullish")
         elif rsi_signal == SignalType.SELL and macd_signal == SignalType.SELL:
             final_signal = SignalType.SELL
             confidence = 0.80
-            reason.append("RSI overbought (>70) and MACD bearish")
+            reason.append(f"RSI overbought (>{self.rsi_overbought:g}) and MACD bearish")
         elif rsi_signal == SignalType.BUY:
             final_signal = SignalType.HOLD # Downgrade single indicator
             confidence = 0.4
@@ -151,12 +298,16 @@ class MomentumAgent(BaseAgent):
         )
 
 class VolatilityAgent(BaseAgent):
-    def __init__(self):
+    required_indicators = (BOLLINGER_20,)
+    lookback = 20
+
+    def __init__(self, knife_ratio: float = 0.1):
         super().__init__("VolatilityAgent")
+        # Overshoot beyond a band (fraction of band width) treated as a falling knife
+        self.knife_ratio = knife_ratio
 
-    def analyze(self, candles: List[Candle]) -> AgentSignal:
-        df = self._candles_to_df(candles)
-        if len(df) < 20: # Bollinger bands
+    def analyze_frame(self, frame: MarketFrame) -> AgentSignal:
+        if len(frame) < 20: # Bollinger bands
              return AgentSignal(
                 signal=SignalType.HOLD,
                 confidence=0.0,
@@ -165,15 +316,41 @@ class VolatilityAgent(BaseAgent):
             )
         
         # Bollinger Bands (Mean Reversion)
-        sma_20 = calculate_sma(df['close'], 20)
-        std_20 = df['close'].rolling(window=20).std()
-        upper_band = sma_20 + (std_20 * 2)
-        lower_band = sma_20 - (std_20 * 2)
-        
-        current_close = df['close'].iloc[-1]
-        upper_val = upper_band.iloc[-1]
-        lower_val = lower_band.iloc[-1]
+        bands = frame.indicator(BOLLINGER_20, last=True)
         
+        current_close = float(frame.close[-1])
+        return self._evaluate(current_close, bands['upper'], bands['lower'])
+
+    def analyze_state(self, state: IndicatorState) -> AgentSignal:
+        if state.count < 20:
+            return AgentSignal(
+                signal=SignalType.HOLD,
+                confidence=0.0,
+                agent_name=self.name,
+                metadata={"reason": "Insufficient data"}
+            )
+        sma_20 = state.sma_20.value
+        std_20 = state.std_20.value
+        return self._evaluate(state.close, sma_20 + (std_20 * 2), sma_20 - (std_20 * 2))
+
+    def signal_series(self, frame: MarketFrame) -> Tuple[np.ndarray, np.ndarray]:
+        bands = frame.indicator(BOLLINGER_20)
+        upper = bands['upper'].to_numpy()
+        lower = bands['lower'].to_numpy()
+        current = frame.close
+        valid = np.arange(1, len(frame) + 1) >= 20
+
+        band_width = upper - lower
+        above = valid & (current > upper)
+        below = valid & ~above & (current < lower)
+        knife = (above & ((current - upper) > (band_width * self.knife_ratio))) | \
+                (below & ((lower - current) > (band_width * self.knife_ratio)))
+
+        signals = np.where(knife, 0, np.where(above, -1, np.where(below, 1, 0))).astype(np.int8)
+        confidence = np.select([~valid, knife, above | below], [0.0, 0.2, 0.6], default=0.5)
+        return signals, _round2(confidence)
+
+    def _evaluate(self, current_close: float, upper_val: float, lower_val: float) -> AgentSignal:
         signal = SignalType.HOLD
         confidence = 0.5
         reason = "Within bands"
@@ -189,11 +366,11 @@ class VolatilityAgent(BaseAgent):
 
         # Safety: If the move is extremely strong (e.g. Price > Bands by > 1%), prefer HOLD to avoid catching falling knife
         band_width = upper_val - lower_val
-        if signal == SignalType.SELL and (current_close - upper_val) > (band_width * 0.1):
+        if signal == SignalType.SELL and (current_close - upper_val) > (band_width * self.knife_ratio):
              signal = SignalType.HOLD
              confidence = 0.2
              reason += " - BUT momentum strong, waiting for confirmation"
-        elif signal == SignalType.BUY and (lower_val - current_close) > (band_width * 0.1):
+        elif signal == SignalType.BUY and (lower_val - current_close) > (band_width * self.knife_ratio):
              signal = SignalType.HOLD
              confidence = 0.2
              reason += " - BUT momentum strong, waiting for confirmation"
@@ -1,8 +1,13 @@
-from typing import List
+from typing import List, Tuple
 from collections import defaultdict
+import numpy as np
 from app.schemas import AgentSignal, AnalysisResponse, SignalType, Candle
 
 class SignalAggregator:
+    def __init__(self, threshold: float = 0.4):
+        # |normalized score| needed for BUY / SELL (was 0.25)
+        self.threshold = threshold
+
     def aggregate(self, agent_signals: List[AgentSignal], symbol: str, timeframe: str) -> AnalysisResponse:
         
         # Weighted Consensus Logic
@@ -43,9 +48,9 @@ class SignalAggregator:
         final_signal = SignalType.HOLD
         final_confidence = abs(normalized_score)
         
-        if normalized_score >= 0.4: # Higher threshold (was 0.25)
+        if normalized_score >= self.threshold:
             final_signal = SignalType.BUY
-        elif normalized_score <= -0.4: # Higher threshold (was -0.25)
+        elif normalized_score <= -self.threshold:
             final_signal = SignalType.SELL
             
         # Human readable summary
@@ -65,3 +70,33 @@ class SignalAggregator:
             indicators=indicators_all,
             timestamp="" # Populated by caller or API
         )
+
+    def aggregate_series(self, agent_series: List[Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Vectorized form of `aggregate` over whole signal series (for backtests).
+        Takes one (signals, confidence) pair per agent, in agent order, and
+        returns (signal, confidence, normalized score) per bar.
+        """
+        normalized_score = self.score_series(agent_series)
+        final_signal = self.signal_from_score(normalized_score)
+        final_confidence = np.array([round(v, 2) for v in np.abs(normalized_score).tolist()], dtype=np.float64)
+        return final_signal, final_confidence, normalized_score
+
+    def score_series(self, agent_series: List[Tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
+        """Normalized consensus score (-1 to 1) per bar, as in `aggregate`."""
+        n = len(agent_series[0][0]) if agent_series else 0
+        score = np.zeros(n, dtype=np.float64)
+        total_weight = np.zeros(n, dtype=np.float64)
+
+        # Same accumulation order as `aggregate`, so floats match bar for bar
+        for signals, weight in agent_series:
+            score += signals * weight
+            total_weight += weight
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(total_weight > 0, score / total_weight, 0.0)
+
+    def signal_from_score(self, normalized_score: np.ndarray) -> np.ndarray:
+        """Consensus signal (+1 / -1 / 0) per bar for normalized scores from `aggregate_series`."""
+        return np.where(normalized_score >= self.threshold, 1,
+                        np.where(normalized_score <= -self.threshold, -1, 0)).astype(np.int8)
@@ -0,0 +1,91 @@
+from typing import Dict, Any, List, Optional
+import numpy as np
+
+from app.engine.frame import MarketFrame
+from app.engine.agents import BaseAgent
+from app.engine.aggregator import SignalAggregator
+
+SIGNAL_NAMES = {1: "BUY", -1: "SELL", 0: "HOLD"}
+
+
+class BacktestResult:
+    """
+    Per-bar signal series for every agent and the consensus, plus statistics.
+    Bar i holds what `/analyze` (rule-based, no LLM) returns for candles[:i + 1].
+    """
+
+    def __init__(self, frame: MarketFrame, agent_series: Dict[str, tuple], signal: np.ndarray,
+                 confidence: np.ndarray, score: np.ndarray):
+        self.frame = frame
+        self.agent_series = agent_series
+        self.signal = signal
+        self.confidence = confidence
+        self.score = score
+        self.stats = compute_stats(frame.close, signal, agent_series)
+
+    def series(self) -> Dict[str, List[Any]]:
+        out = {
+            "timestamp": self.frame.timestamp.tolist(),
+            "close": self.frame.close.tolist(),
+            "signal": [SIGNAL_NAMES[v] for v in self.signal.tolist()],
+            "confidence": self.confidence.tolist(),
+        }
+        for name, (signals, confidence) in self.agent_series.items():
+            out[f"{name}.signal"] = [SIGNAL_NAMES[v] for v in signals.tolist()]
+            out[f"{name}.confidence"] = confidence.tolist()
+        return out
+
+
+def run_backtest(frame: MarketFrame, agents: List[BaseAgent], aggregator: Optional[SignalAggregator] = None) -> BacktestResult:
+    """
+    Computes every agent's signal and the aggregated consensus at every bar
+    in one vectorized pass over the full history.
+    """
+    aggregator = aggregator or SignalAggregator()
+    agent_series = {agent.name: agent.signal_series(frame) for agent in agents}
+    signal, confidence, score = aggregator.aggregate_series(list(agent_series.values()))
+    return BacktestResult(frame, agent_series, signal, confidence, score)
+
+
+def _signal_stats(position: np.ndarray, bar_returns: np.ndarray) -> Dict[str, Any]:
+    """
+    Position at bar t (+1/-1/0) is held from close t to close t + 1.
+    """
+    strategy_returns = position * bar_returns
+    active = position != 0
+    hits = np.sign(bar_returns[active]) == position[active]
+
+    equity = np.cumprod(1.0 + strategy_returns)
+    peak = np.maximum.accumulate(equity) if len(equity) else equity
+    drawdown = (equity / peak - 1.0).min() if len(equity) else 0.0
+
+    return {
+        "buy_signals": int((position == 1).sum()),
+        "sell_signals": int((position == -1).sum()),
+        "hold_signals": int((position == 0).sum()),
+        "trades": int(np.count_nonzero((np.diff(position, prepend=0) != 0) & active)),
+        "hit_rate": float(hits.mean()) if hits.size else None,
+        "total_return": float(equity[-1] - 1.0) if len(equity) else 0.0,
+        "avg_return_per_signal": float(strategy_returns[active].mean()) if active.any() else None,
+        "max_drawdown": float(drawdown),
+    }
+
+
+def compute_stats(close: np.ndarray, signal: np.ndarray, agent_series: Dict[str, tuple]) -> Dict[str, Any]:
+    """
+    Basic PnL / hit-rate statistics for the consensus and each agent.
+    """
+    if len(close) < 2:
+        return {"bars": int(len(close))}
+
+    bar_returns = close[1:] / close[:-1] - 1.0
+    stats = {
+        "bars": int(len(close)),
+        "buy_and_hold_return": float(close[-1] / close[0] - 1.0),
+        "consensus": _signal_stats(signal[:-1].astype(np.int64), bar_returns),
+        "agents": {
+            name: _signal_stats(signals[:-1].astype(np.int64), bar_returns)
+            for name, (signals, _) in agent_series.items()
+        },
+    }
+    return stats
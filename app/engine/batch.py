@@ -0,0 +1,109 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.schemas import AnalysisRequest, AnalysisResponse, BatchItemResult
+
+# "process" spreads items across cores; "thread" avoids process start-up cost.
+BATCH_EXECUTOR = os.environ.get("BATCH_EXECUTOR", "process")
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "0")) or (os.cpu_count() or 1)
+
+
+def _analyze_item(item: Dict[str, Any]) -> Tuple[Optional[AnalysisResponse], Optional[str], float, bool]:
+    """
+    Validates and analyzes one batch item. Runs inside a pool worker, so any
+    failure is returned as an error string instead of raised. The last value
+    is True when the item ran in a child process, whose engine neither
+    published the result nor submitted its review.
+    """
+    # Imported here so process workers build their own engine instance
+    from app.engine.signal_engine import engine
+    from app.engine.executor import AgentExecutor
+
+    in_child = multiprocessing.parent_process() is not None
+    if in_child:
+        # Deferred LLM reviews of process-worker results run in the API process
+        engine.submit_reviews = False
+        # Items are already spread across processes; no nested agent pools
+        if engine.executor.kind != "serial":
+            engine.executor = AgentExecutor("serial", budget_ms=engine.executor.budget_ms)
+
+    start = time.perf_counter()
+    try:
+        request = AnalysisRequest(**item)
+        if not request.candles:
+            raise ValueError("No candle data provided")
+        # Trims to the agents' window before building the frame
+        result = engine.analyze(request.candles, request.symbol, request.timeframe)
+        return result, None, (time.perf_counter() - start) * 1000, in_child
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", (time.perf_counter() - start) * 1000, in_child
+
+
+class BatchAnalyzer:
+    """
+    Analyzes many symbol/timeframe candle sets in parallel.
+    The pool is created lazily and reused across requests.
+    """
+
+    def __init__(self, executor: str = BATCH_EXECUTOR, workers: int = BATCH_WORKERS):
+        if executor not in ("process", "thread"):
+            raise ValueError(f"Unknown batch executor: {executor}")
+        self.executor_kind = executor
+        self.workers = workers
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                if self.executor_kind == "process":
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def analyze(
+        self,
+        items: List[Dict[str, Any]],
+        publish: Optional[Callable[[AnalysisResponse], None]] = None
+    ) -> List[BatchItemResult]:
+        """
+        Runs every item and returns per-item results in order. `publish` is
+        called for results computed in a child process; inline and thread
+        runs already went through the API process's engine.
+        """
+        if len(items) <= 1:
+            outcomes = [_analyze_item(item) for item in items]
+        else:
+            outcomes = list(self._get_pool().map(_analyze_item, items))
+
+        results = []
+        for index, (item, (result, error, elapsed_ms, in_child)) in enumerate(zip(items, outcomes)):
+            if publish is not None and result is not None and in_child:
+                publish(result)
+            results.append(BatchItemResult(
+                index=index,
+                symbol=str(item.get("symbol", "")),
+                timeframe=str(item.get("timeframe", "")),
+                result=result,
+                error=error,
+                elapsed_ms=round(elapsed_ms, 3)
+            ))
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+# Global Instance
+batch_analyzer = BatchAnalyzer()
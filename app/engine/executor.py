@@ -0,0 +1,231 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.schemas import AgentSignal, SignalType
+from app.engine.agents import BaseAgent
+from app.engine.frame import MarketFrame
+from app.engine.streaming import IndicatorState
+
+# "serial" runs agents one after another in the calling thread, "thread"
+# concurrently on a shared thread pool, "process" on a process pool (for
+# CPU-heavy pure-Python agents; the frame is pickled to the workers).
+AGENT_EXECUTOR = os.getenv("AGENT_EXECUTOR", "thread")
+AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", "0")) or 8
+# Default per-agent budget; an agent that overruns it counts as a timed-out HOLD
+AGENT_TIME_BUDGET_MS = float(os.getenv("AGENT_TIME_BUDGET_MS", 2000))
+
+EXECUTORS = ("serial", "thread", "process")
+# How often the start of an agent queued behind others is checked (seconds)
+START_POLL_SECONDS = 0.005
+
+
+def run_agent(agent: BaseAgent, frame: MarketFrame, state: Optional[IndicatorState] = None) -> AgentSignal:
+    """
+    One agent on one input: streaming state when given and supported,
+    otherwise the (bounded) frame.
+    """
+    if state is not None:
+        try:
+            return agent.analyze_state(state)
+        except NotImplementedError:
+            pass
+    return agent.analyze_frame(frame)
+
+
+def _timed_run(agent: BaseAgent, frame: MarketFrame, state: Optional[IndicatorState]) -> Tuple[AgentSignal, float]:
+    # Module level so process workers can unpickle it
+    start = time.perf_counter()
+    signal = run_agent(agent, frame, state)
+    return signal, (time.perf_counter() - start) * 1000
+
+
+def _tracked_run(started: Dict[int, float], index: int, agent: BaseAgent, frame: MarketFrame,
+                 state: Optional[IndicatorState]) -> Tuple[AgentSignal, float]:
+    # Thread pools: publish the start time so the budget excludes queueing
+    started[index] = time.perf_counter()
+    return _timed_run(agent, frame, state)
+
+
+def _warm_up(_) -> None:
+    # Spawns a worker and imports this module (pandas, agents) ahead of the first budgeted run
+    time.sleep(0.05)
+
+
+def timed_out_signal(agent: BaseAgent, budget_ms: float) -> AgentSignal:
+    """Stand-in for an agent that overran its budget: HOLD with no weight in the consensus."""
+    return AgentSignal(
+        signal=SignalType.HOLD,
+        confidence=0.0,
+        agent_name=agent.name,
+        metadata={"reasoning": f"Timed out (budget {budget_ms:g} ms)", "timed_out": True}
+    )
+
+
+class AgentOutcome:
+    """
+    Result of one agent run: status is "ok", "timeout" or "error".
+    `over_budget` marks an agent that returned after its budget but was
+    still waited for (serial mode, or finished before the deadline check).
+    """
+    __slots__ = ("agent_name", "signal", "status", "elapsed_ms", "error", "over_budget")
+
+    def __init__(self, agent_name: str, signal: Optional[AgentSignal], status: str, elapsed_ms: float,
+                 error: Optional[str] = None, over_budget: bool = False):
+        self.agent_name = agent_name
+        self.signal = signal
+        self.status = status
+        self.elapsed_ms = elapsed_ms
+        self.error = error
+        self.over_budget = over_budget
+
+    def report(self) -> Dict[str, Any]:
+        report = {"status": self.status, "elapsed_ms": round(self.elapsed_ms, 3)}
+        if self.error:
+            report["error"] = self.error
+        if self.over_budget:
+            report["over_budget"] = True
+        return report
+
+
+class AgentExecutor:
+    """
+    Runs the engine's agents under per-agent time budgets
+    (`agent.time_budget_ms`, else AGENT_TIME_BUDGET_MS).
+
+    Outcomes always come back in agent order, so the aggregated result is the
+    same in every mode. Budgets count from the moment an agent starts, so
+    waiting behind other requests in the shared pool does not use them up
+    (process pools only report when a call is handed to a worker, which is
+    slightly earlier).
+
+    A pooled agent still running when its budget runs out becomes a
+    timed-out HOLD. Its thread or process cannot be interrupted: it keeps
+    its worker until it returns, and `abandoned` counts those workers. While
+    abandoned agents hold every worker, queued agents are cancelled as
+    timeouts instead of waiting behind them. Serial mode cannot abandon
+    anything: it keeps the result of an agent that overran and reports it
+    `over_budget`.
+    """
+
+    def __init__(self, kind: str = AGENT_EXECUTOR, workers: int = AGENT_WORKERS,
+                 budget_ms: float = AGENT_TIME_BUDGET_MS):
+        if kind not in EXECUTORS:
+            raise ValueError(f"Unknown agent executor {kind!r}, expected one of {EXECUTORS}")
+        self.kind = kind
+        self.workers = workers
+        self.budget_ms = budget_ms
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._abandoned: Set[Future] = set()
+
+    def budget_for(self, agent: BaseAgent) -> float:
+        return getattr(agent, "time_budget_ms", None) or self.budget_ms
+
+    @property
+    def abandoned(self) -> int:
+        """Workers still busy with an agent whose result was given up on."""
+        with self._lock:
+            return len(self._abandoned)
+
+    def _abandon(self, future: Future):
+        with self._lock:
+            self._abandoned.add(future)
+        future.add_done_callback(self._release)
+
+    def _release(self, future: Future):
+        with self._lock:
+            self._abandoned.discard(future)
+
+    def _get_pool(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                if self.kind == "process":
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                    # Worker start-up (seconds) must not count against agent budgets
+                    list(self._pool.map(_warm_up, range(self.workers)))
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="agent")
+            return self._pool
+
+    def run(self, agents: List[BaseAgent], frame: MarketFrame,
+            state: Optional[IndicatorState] = None) -> List[AgentOutcome]:
+        if self.kind == "serial" or len(agents) <= 1:
+            return [self._run_serial(agent, frame, state) for agent in agents]
+
+        pool = self._get_pool()
+        dispatched = time.perf_counter()
+        started: Dict[int, float] = {}
+        if self.kind == "thread":
+            futures = [pool.submit(_tracked_run, started, i, agent, frame, state) for i, agent in enumerate(agents)]
+        else:
+            futures = [pool.submit(_timed_run, agent, frame, state) for agent in agents]
+        budgets = [self.budget_for(agent) / 1000 for agent in agents]
+        outcomes: List[Optional[AgentOutcome]] = [None] * len(agents)
+        pending = set(range(len(agents)))
+
+        while pending:
+            now = time.perf_counter()
+            wake_at = None
+            for i in list(pending):
+                agent, future = agents[i], futures[i]
+                if future.done():
+                    outcomes[i] = self._resolved(agent, future, budgets[i] * 1000,
+                                                 (now - started.get(i, dispatched)) * 1000)
+                    pending.discard(i)
+                    continue
+                if i not in started and future.running() and self.kind == "process":
+                    started[i] = now
+                start = started.get(i)
+                if start is None:
+                    # Still queued; give up only if abandoned agents hold every worker
+                    if self.abandoned >= self.workers and future.cancel():
+                        outcomes[i] = AgentOutcome(agent.name, timed_out_signal(agent, budgets[i] * 1000), "timeout",
+                                                   (now - dispatched) * 1000)
+                        pending.discard(i)
+                        continue
+                    deadline = now + START_POLL_SECONDS
+                elif now - start >= budgets[i]:
+                    self._abandon(future)
+                    outcomes[i] = AgentOutcome(agent.name, timed_out_signal(agent, budgets[i] * 1000), "timeout",
+                                               (now - start) * 1000)
+                    pending.discard(i)
+                    continue
+                else:
+                    deadline = start + budgets[i]
+                wake_at = deadline if wake_at is None else min(wake_at, deadline)
+            if pending:
+                wait([futures[i] for i in pending], timeout=max(0.0, wake_at - time.perf_counter()),
+                     return_when=FIRST_COMPLETED)
+        return outcomes
+
+    @staticmethod
+    def _resolved(agent: BaseAgent, future: Future, budget: float, waited_ms: float) -> AgentOutcome:
+        try:
+            signal, elapsed = future.result()
+        except Exception as e:
+            return AgentOutcome(agent.name, None, "error", waited_ms, f"{type(e).__name__}: {e}")
+        return AgentOutcome(agent.name, signal, "ok", elapsed, over_budget=elapsed > budget)
+
+    def _run_serial(self, agent: BaseAgent, frame: MarketFrame, state: Optional[IndicatorState]) -> AgentOutcome:
+        start = time.perf_counter()
+        try:
+            signal = run_agent(agent, frame, state)
+        except Exception as e:
+            return AgentOutcome(agent.name, None, "error", (time.perf_counter() - start) * 1000,
+                                f"{type(e).__name__}: {e}")
+        elapsed = (time.perf_counter() - start) * 1000
+        # The work is done: keep it, so serial results do not depend on load
+        return AgentOutcome(agent.name, signal, "ok", elapsed, over_budget=elapsed > self.budget_for(agent))
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
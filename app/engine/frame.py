@@ -0,0 +1,330 @@
+import threading
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple
+import pandas as pd
+import numpy as np
+
+from app.schemas import Candle
+
+if TYPE_CHECKING:
+    from app.engine.indicator_graph import IndicatorGraph
+
+COLUMNS = ("open", "high", "low", "close", "volume")
+
+# Epoch-ms range that pandas' nanosecond timestamps (MarketFrame.df) can hold
+TIMESTAMP_MIN_MS = -(-pd.Timestamp.min.value // 1_000_000)
+TIMESTAMP_MAX_MS = pd.Timestamp.max.value // 1_000_000
+
+
+class FrameValidationError(ValueError):
+    """A columnar series failed validation; `field`/`index` locate the first bad value."""
+
+    def __init__(self, field: str, index: Optional[int], message: str, kind: str = "value_error"):
+        super().__init__(f"{field}[{index}]: {message}" if index is not None else f"{field}: {message}")
+        self.field = field
+        self.index = index
+        self.message = message
+        self.kind = kind
+
+
+def _first_bad(mask: np.ndarray) -> Optional[int]:
+    return int(np.argmax(mask)) if mask.any() else None
+
+
+def invalid_epoch_ms(raw: np.ndarray) -> Optional[Tuple[int, str, str]]:
+    """
+    Finds the first value of a numeric array that is not an integral epoch-ms
+    timestamp in range, as (index, message, error type). Casting to int64
+    would otherwise truncate fractions and wrap huge values silently.
+    """
+    if raw.dtype.kind == "f":
+        bad = _first_bad(~np.isfinite(raw))
+        if bad is not None:
+            return bad, "Input should be a finite number", "finite_number"
+        bad = _first_bad(raw != np.trunc(raw))
+        if bad is not None:
+            return bad, "Input should be a valid integer, got a number with a fractional part", "int_from_float"
+    bad = _first_bad((raw < TIMESTAMP_MIN_MS) | (raw > TIMESTAMP_MAX_MS))
+    if bad is not None:
+        return bad, "Input should be a valid datetime, epoch milliseconds outside 1677-2262 are not supported", "datetime_parsing"
+    return None
+
+
+def _numeric_column(name: str, values: Any) -> np.ndarray:
+    """
+    Flat numeric array from a list or array. Booleans and strings are
+    rejected rather than coerced to 1/0 or parsed, as numpy would do.
+    """
+    if isinstance(values, (list, tuple)) and not set(map(type, values)) <= {int, float}:
+        bad = next(i for i, v in enumerate(values) if type(v) not in (int, float))
+        if name == "timestamp":
+            raise FrameValidationError(name, bad, "Input should be a valid integer", "int_type")
+        raise FrameValidationError(name, bad, "Input should be a valid number", "float_type")
+    try:
+        arr = np.asarray(values)
+        if arr.dtype.kind == "O":
+            arr = arr.astype(np.float64)  # Python ints beyond 64 bits
+    except (TypeError, ValueError):
+        raise FrameValidationError(name, None, "expected a list of numbers", "list_type")
+    except OverflowError:
+        raise FrameValidationError(name, None, "Input should be a finite number", "finite_number")
+    if arr.dtype.kind not in "iuf":
+        raise FrameValidationError(name, None, "expected a list of numbers", "list_type")
+    if arr.ndim != 1:
+        raise FrameValidationError(name, None, "expected a flat list", "list_type")
+    return arr
+
+
+def to_epoch_ms(ts: datetime) -> int:
+    """
+    Converts a datetime to epoch milliseconds. Naive datetimes are treated as UTC.
+    """
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return int(round(ts.timestamp() * 1000))
+
+
+def parse_date_ms(value: Optional[str]) -> Optional[int]:
+    """
+    Parses an ISO-8601 date/datetime (CLI --start/--end) to epoch milliseconds.
+    Naive input is UTC, like the stored candle timestamps. None passes through.
+    """
+    return to_epoch_ms(datetime.fromisoformat(value)) if value else None
+
+
+def _readonly(values, dtype) -> np.ndarray:
+    arr = np.ascontiguousarray(values, dtype=dtype)
+    arr.flags.writeable = False
+    return arr
+
+
+class MarketFrame:
+    """
+    Read-only columnar view of an OHLCV series, sorted by timestamp.
+
+    Built once per request by the SignalEngine and shared by every agent,
+    so the candle -> DataFrame conversion happens a single time.
+    Timestamps are epoch milliseconds (int64), prices and volume float64.
+    """
+
+    def __init__(self, timestamp, open, high, low, close, volume):
+        self.timestamp = _readonly(timestamp, np.int64)
+        self.open = _readonly(open, np.float64)
+        self.high = _readonly(high, np.float64)
+        self.low = _readonly(low, np.float64)
+        self.close = _readonly(close, np.float64)
+        self.volume = _readonly(volume, np.float64)
+        self._df: Optional[pd.DataFrame] = None
+        self._candles: Optional[List[Candle]] = None
+        self._indicators = None
+        # Guards the lazily built views when agents share the frame across threads
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Pickled (process executors) as the columns plus computed indicators;
+        # the DataFrame and candle views are rebuilt on demand
+        columns = tuple(getattr(self, name) for name in ("timestamp",) + COLUMNS)
+        if self._indicators is None:
+            return columns, None
+        return columns, (self._indicators.values(), self._indicators.last_values())
+
+    def __setstate__(self, state):
+        columns, indicator_values = state
+        self.__init__(*columns)
+        if indicator_values:
+            from app.engine.indicator_graph import IndicatorGraph
+            self._indicators = IndicatorGraph(self, *indicator_values)
+
+    @classmethod
+    def from_candles(cls, candles: List[Candle]) -> "MarketFrame":
+        n = len(candles)
+        ts = np.empty(n, dtype=np.int64)
+        cols = np.empty((5, n), dtype=np.float64)
+        for i, c in enumerate(candles):
+            ts[i] = to_epoch_ms(c.timestamp)
+            cols[0, i] = c.open
+            cols[1, i] = c.high
+            cols[2, i] = c.low
+            cols[3, i] = c.close
+            cols[4, i] = c.volume
+
+        if n > 1 and np.any(ts[1:] < ts[:-1]):
+            order = np.argsort(ts, kind="stable")
+            ts = ts[order]
+            cols = cols[:, order]
+            candles = [candles[i] for i in order]
+
+        frame = cls(ts, *cols)
+        frame._candles = list(candles)
+        return frame
+
+    @classmethod
+    def from_columns(cls, timestamp, open, high, low, close, volume) -> "MarketFrame":
+        """
+        Builds a frame from parallel arrays (epoch-ms timestamps + OHLCV),
+        applying the `Candle` field constraints in vectorized form. Unsorted
+        input is sorted by timestamp, as `from_candles` does.
+        Raises FrameValidationError.
+        """
+        columns = {"open": open, "high": high, "low": low, "close": close, "volume": volume}
+        raw = _numeric_column("timestamp", timestamp)
+        error = invalid_epoch_ms(raw)
+        if error is not None:
+            raise FrameValidationError("timestamp", *error)
+        ts = raw.astype(np.int64)
+        n = len(ts)
+
+        arrays = {}
+        for name, values in columns.items():
+            arr = _numeric_column(name, values).astype(np.float64, copy=False)
+            if len(arr) != n:
+                raise FrameValidationError(name, None, f"expected {n} values like timestamp, got {arr.size}")
+            bad = _first_bad(~np.isfinite(arr))
+            if bad is not None:
+                raise FrameValidationError(name, bad, "Input should be a finite number", "finite_number")
+            # Same constraints as the Candle model: prices > 0, volume >= 0
+            bad = _first_bad(arr < 0 if name == "volume" else arr <= 0)
+            if bad is not None:
+                if name == "volume":
+                    raise FrameValidationError(name, bad, "Input should be greater than or equal to 0", "greater_than_equal")
+                raise FrameValidationError(name, bad, "Input should be greater than 0", "greater_than")
+            arrays[name] = arr
+
+        if n > 1 and np.any(ts[1:] < ts[:-1]):
+            order = np.argsort(ts, kind="stable")
+            ts = ts[order]
+            arrays = {name: arr[order] for name, arr in arrays.items()}
+        return cls(ts, *(arrays[name] for name in COLUMNS))
+
+    @classmethod
+    def from_records(cls, records: List[dict]) -> "MarketFrame":
+        """
+        Builds a frame from stored candle dicts (epoch-ms `timestamp`), as
+        returned by `market_data.storage.load_candles`. Records must be sorted.
+        """
+        n = len(records)
+        ts = np.fromiter((r["timestamp"] for r in records), dtype=np.int64, count=n)
+        cols = [np.fromiter((r[name] for r in records), dtype=np.float64, count=n) for name in COLUMNS]
+        return cls(ts, *cols)
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def records(self) -> List[dict]:
+        """
+        Inverse of `from_records`: candle dicts with epoch-ms timestamps.
+        """
+        return [
+            {"timestamp": ts, "open": o, "high": h, "low": l, "close": c, "volume": v}
+            for ts, o, h, l, c, v in zip(
+                self.timestamp.tolist(), self.open.tolist(), self.high.tolist(),
+                self.low.tolist(), self.close.tolist(), self.volume.tolist(),
+            )
+        ]
+
+    def slice(self, start: Optional[int] = None, stop: Optional[int] = None) -> "MarketFrame":
+        """
+        Zero-copy sub-frame (e.g. the prefix a backtest bar would have seen).
+        """
+        window = slice(start, stop)
+        return MarketFrame(*(getattr(self, name)[window] for name in ("timestamp",) + COLUMNS))
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """
+        DataFrame indexed by timestamp, built lazily and cached.
+        Shared between agents: treat it as read-only.
+        """
+        if self._df is None:
+            with self._lock:
+                if self._df is None:
+                    index = pd.DatetimeIndex(pd.to_datetime(self.timestamp, unit="ms"), name="timestamp")
+                    self._df = pd.DataFrame(
+                        {name: getattr(self, name) for name in COLUMNS},
+                        index=index,
+                    )
+        return self._df
+
+    @property
+    def indicators(self) -> "IndicatorGraph":
+        """
+        Memoized indicator graph of this frame: every indicator node is
+        computed at most once, however many agents read it.
+        """
+        if self._indicators is None:
+            from app.engine.indicator_graph import IndicatorGraph
+            with self._lock:
+                if self._indicators is None:
+                    self._indicators = IndicatorGraph(self)
+        return self._indicators
+
+    def indicator(self, key, last: bool = False) -> Any:
+        """
+        Value of an indicator node, e.g. frame.indicator(indicator("sma", period=50)).
+        With `last=True` only its final value (see IndicatorGraph).
+        """
+        return self.indicators.get(key, last)
+
+    def candles(self) -> List[Candle]:
+        """
+        Returns the series as Candle objects (for agents using the list API).
+        """
+        if self._candles is None:
+            self._candles = [
+                Candle(
+                    timestamp=datetime.fromtimestamp(ts / 1000, tz=timezone.utc),
+                    open=o, high=h, low=l, close=c, volume=v,
+                )
+                for ts, o, h, l, c, v in zip(
+                    self.timestamp.tolist(), self.open.tolist(), self.high.tolist(),
+                    self.low.tolist(), self.close.tolist(), self.volume.tolist(),
+                )
+            ]
+        return self._candles
+
+
+class CandleRing:
+    """
+    Fixed-capacity OHLCV ring buffer with preallocated NumPy columns.
+
+    Every value is written twice (at i and i + capacity) so the most recent
+    `n` candles are always one contiguous slice: `frame()` returns a
+    zero-copy MarketFrame view. A view stays valid until roughly
+    `capacity - n` further appends overwrite it.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._ts = np.zeros(2 * capacity, dtype=np.int64)
+        self._cols = np.zeros((5, 2 * capacity), dtype=np.float64)
+        self._head = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        if self.count == 0:
+            return None
+        return int(self._ts[self._head + self.capacity - 1])
+
+    def append(self, timestamp: int, open: float, high: float, low: float, close: float, volume: float):
+        i = self._head
+        j = i + self.capacity
+        self._ts[i] = self._ts[j] = timestamp
+        self._cols[:, i] = self._cols[:, j] = (open, high, low, close, volume)
+        self._head = (i + 1) % self.capacity
+        self.count += 1
+
+    def extend(self, frame: MarketFrame):
+        start = max(0, len(frame) - self.capacity)
+        for i in range(start, len(frame)):
+            self.append(frame.timestamp[i], frame.open[i], frame.high[i],
+                        frame.low[i], frame.close[i], frame.volume[i])
+
+    def frame(self, n: Optional[int] = None) -> MarketFrame:
+        size = len(self) if n is None else min(n, len(self))
+        end = self._head + self.capacity
+        window = slice(end - size, end)
+        return MarketFrame(self._ts[window], *self._cols[:, window])
@@ -0,0 +1,269 @@
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from app.engine.indicators import (
+    calculate_sma, calculate_ema, calculate_rsi, calculate_atr, ema_lookback,
+    last_sma, last_std, last_ema, last_rsi, last_macd, last_bollinger, last_atr,
+)
+
+# (name, sorted (param, value) pairs) with defaults filled in, so equal
+# requests from different agents map to the same node
+IndicatorKey = Tuple[str, Tuple[Tuple[str, Any], ...]]
+
+
+class IndicatorDef:
+    __slots__ = ("name", "defaults", "deps", "compute", "last", "window")
+
+    def __init__(self, name: str, defaults: Dict[str, Any], deps: Callable[..., List[IndicatorKey]],
+                 compute: Callable[..., Any], last: Optional[Callable[..., Any]] = None,
+                 window: Optional[Callable[..., int]] = None):
+        self.name = name
+        self.defaults = defaults
+        self.deps = deps
+        self.compute = compute
+        self.last = last
+        self.window = window
+
+
+_REGISTRY: Dict[str, IndicatorDef] = {}
+
+
+def register_indicator(name: str, defaults: Optional[Dict[str, Any]] = None,
+                       deps: Optional[Callable[..., List[IndicatorKey]]] = None,
+                       last: Optional[Callable[..., Any]] = None,
+                       window: Optional[Callable[..., int]] = None):
+    """
+    Decorator registering `compute(frame, inputs, **params)` as indicator
+    `name`. `deps(**params)` lists the nodes whose values arrive as `inputs`.
+    `last(frame, **params)`, when given, evaluates only the final value
+    (a float, or a dict for multi-column nodes) from the frame's columns.
+    `window(**params)` is the number of trailing bars that final value
+    depends on (see indicator_window).
+    """
+    def wrap(compute):
+        _REGISTRY[name] = IndicatorDef(name, dict(defaults or {}), deps or (lambda **params: []), compute, last,
+                                       window)
+        return compute
+    return wrap
+
+
+def indicator(name: str, **params) -> IndicatorKey:
+    """Key of an indicator node, e.g. indicator("sma", period=50)."""
+    definition = _REGISTRY.get(name)
+    if definition is None:
+        raise ValueError(f"Unknown indicator {name!r}")
+    unknown = set(params) - set(definition.defaults)
+    if unknown:
+        raise ValueError(f"Unknown parameters for {name}: {', '.join(sorted(unknown))}")
+    return (name, tuple(sorted({**definition.defaults, **params}.items())))
+
+
+def label(key: IndicatorKey) -> str:
+    name, params = key
+    return f"{name}({', '.join(f'{k}={v}' for k, v in params)})"
+
+
+def indicator_window(key: IndicatorKey) -> Optional[int]:
+    """
+    Trailing bars the last value of `key` depends on: the `last` kernel
+    reads no further back, so a frame trimmed to this many bars gives the
+    same last value. For EMA-based nodes this is the convergence window
+    (ema_lookback). None when the node does not declare one.
+    """
+    definition = _REGISTRY[key[0]]
+    if definition.window is None:
+        return None
+    return definition.window(**dict(key[1]))
+
+
+# -- built-in nodes --------------------------------------------------------
+# Same pandas operations as indicators.py, so values match the direct calls
+# exactly; the `last` kernels are the NumPy last-value forms from indicators.py
+
+@register_indicator("column", {"field": "close"},
+                    last=lambda frame, field: float(getattr(frame, field)[-1]) if len(frame) else math.nan,
+                    window=lambda field: 1)
+def _column(frame, inputs, field):
+    return frame.df[field]
+
+
+def _source(period=None, source="close", **_):
+    return [indicator("column", field=source)]
+
+
+@register_indicator("sma", {"period": 20, "source": "close"}, deps=_source,
+                    last=lambda frame, period, source: last_sma(getattr(frame, source), period),
+                    window=lambda period, source: period)
+def _sma(frame, inputs, period, source):
+    return calculate_sma(inputs[0], period)
+
+
+@register_indicator("std", {"period": 20, "source": "close"}, deps=_source,
+                    last=lambda frame, period, source: last_std(getattr(frame, source), period),
+                    window=lambda period, source: period)
+def _std(frame, inputs, period, source):
+    return inputs[0].rolling(window=period).std()
+
+
+@register_indicator("ema", {"period": 12, "source": "close"}, deps=_source,
+                    last=lambda frame, period, source: last_ema(getattr(frame, source), period),
+                    window=lambda period, source: ema_lookback(period) + 1)
+def _ema(frame, inputs, period, source):
+    return calculate_ema(inputs[0], period)
+
+
+@register_indicator("rsi", {"period": 14, "source": "close"}, deps=_source,
+                    last=lambda frame, period, source: last_rsi(getattr(frame, source), period),
+                    window=lambda period, source: period + 1)
+def _rsi(frame, inputs, period, source):
+    return calculate_rsi(inputs[0], period)
+
+
+@register_indicator("macd", {"fast": 12, "slow": 26, "signal": 9},
+                    deps=lambda fast, slow, signal: [indicator("ema", period=fast), indicator("ema", period=slow)],
+                    last=lambda frame, fast, slow, signal: last_macd(frame.close, fast, slow, signal),
+                    # The signal line's convergence window of MACD values, each over the slower EMA's
+                    window=lambda fast, slow, signal: ema_lookback(max(fast, slow)) + ema_lookback(signal) + 1)
+def _macd(frame, inputs, fast, slow, signal):
+    macd_line = inputs[0] - inputs[1]
+    signal_line = calculate_ema(macd_line, signal)
+    return pd.DataFrame({
+        'macd': macd_line,
+        'signal': signal_line,
+        'hist': macd_line - signal_line
+    })
+
+
+@register_indicator("bollinger", {"period": 20, "k": 2},
+                    deps=lambda period, k: [indicator("sma", period=period), indicator("std", period=period)],
+                    last=lambda frame, period, k: last_bollinger(frame.close, period, k),
+                    window=lambda period, k: period)
+def _bollinger(frame, inputs, period, k):
+    sma, std = inputs
+    return pd.DataFrame({
+        'upper': sma + (std * k),
+        'middle': sma,
+        'lower': sma - (std * k)
+    })
+
+
+@register_indicator("atr", {"period": 14},
+                    deps=lambda period: [indicator("column", field=f) for f in ("high", "low", "close")],
+                    last=lambda frame, period: last_atr(frame.high, frame.low, frame.close, period),
+                    window=lambda period: period + 1)
+def _atr(frame, inputs, period):
+    return calculate_atr(*inputs, period)
+
+
+def _last_of(value: Any) -> Any:
+    # Final value of a full node: a float, or a dict for DataFrame nodes
+    if isinstance(value, pd.DataFrame):
+        return {column: float(value[column].iloc[-1]) if len(value) else math.nan for column in value.columns}
+    return float(value.iloc[-1]) if len(value) else math.nan
+
+
+class IndicatorGraph:
+    """
+    Memoized indicator values of one MarketFrame (see MarketFrame.indicators).
+
+    Requested nodes are resolved depth-first through their dependencies
+    (e.g. macd -> ema(12), ema(26) -> close), each node is computed once,
+    and every agent reading it gets the same value. Values are shared:
+    treat them as read-only.
+
+    `last=True` asks for the final value only. It is taken from the full
+    series when that is already computed, else evaluated by the node's
+    `last` kernel over just its lookback window (EMA-based nodes within
+    EMA_TAIL_TOLERANCE of the full value), and memoized separately.
+    """
+
+    def __init__(self, frame, values: Optional[Dict[IndicatorKey, Any]] = None,
+                 last_values: Optional[Dict[IndicatorKey, Any]] = None):
+        self.frame = frame
+        self._values: Dict[IndicatorKey, Any] = dict(values or {})
+        self._last: Dict[IndicatorKey, Any] = dict(last_values or {})
+        self._timings: Dict[IndicatorKey, float] = {}
+        # Reentrant: computing a node computes its dependencies
+        self._lock = threading.RLock()
+
+    def get(self, key: IndicatorKey, last: bool = False) -> Any:
+        memo = self._last if last else self._values
+        try:
+            return memo[key]
+        except KeyError:
+            with self._lock:
+                if last:
+                    self._compute_last(key, [])
+                else:
+                    self._compute(key, [])
+            return memo[key]
+
+    def resolve(self, keys: Iterable[IndicatorKey], last: bool = False) -> Dict[str, Any]:
+        """
+        Computes the union of `keys` and their dependencies (with `last`,
+        only the keys' final values). Returns which nodes were computed now
+        (with milliseconds each, in computation order) and which requested
+        nodes were already memoized.
+        """
+        computed: List[IndicatorKey] = []
+        reused = []
+        memo = self._last if last else self._values
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                if key in memo:
+                    reused.append(label(key))
+                elif last:
+                    self._compute_last(key, computed)
+                else:
+                    self._compute(key, computed)
+        nodes = [{"node": label(key), "ms": round(self._timings[(key, last)], 3)}
+                 for key in computed if key[0] != "column"]
+        return {"mode": "last" if last else "full", "computed": nodes, "reused": reused,
+                "total_ms": round(sum(n["ms"] for n in nodes), 3)}
+
+    def _compute(self, key: IndicatorKey, computed: List[IndicatorKey]):
+        if key in self._values:
+            return
+        definition = _REGISTRY[key[0]]
+        params = dict(key[1])
+        deps = definition.deps(**params)
+        for dep in deps:
+            self._compute(dep, computed)
+        start = time.perf_counter()
+        value = definition.compute(self.frame, [self._values[dep] for dep in deps], **params)
+        self._timings[(key, False)] = (time.perf_counter() - start) * 1000
+        self._values[key] = value
+        computed.append(key)
+
+    def _compute_last(self, key: IndicatorKey, computed: List[IndicatorKey]):
+        if key in self._last:
+            return
+        start = time.perf_counter()
+        if key in self._values:
+            value = _last_of(self._values[key])
+        else:
+            definition = _REGISTRY[key[0]]
+            if definition.last is not None:
+                value = definition.last(self.frame, **dict(key[1]))
+            else:
+                # No kernel: full computation, then its final value
+                self._compute(key, [])
+                value = _last_of(self._values[key])
+        self._timings[(key, True)] = (time.perf_counter() - start) * 1000
+        self._last[key] = value
+        computed.append(key)
+
+    def values(self) -> Dict[IndicatorKey, Any]:
+        with self._lock:
+            return dict(self._values)
+
+    def last_values(self) -> Dict[IndicatorKey, Any]:
+        with self._lock:
+            return dict(self._last)
+
+    def __contains__(self, key: IndicatorKey) -> bool:
+        return key in self._values
@@ -1,3 +1,6 @@
+import math
+from functools import lru_cache
+from typing import Dict
 import pandas as pd
 import numpy as np
 
@@ -57,3 +60,119 @@ def calculate_atr(high: pd.Series, low: pd.Series, close: pd.Series, period: int
     tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
     atr = tr.rolling(window=period).mean()
     return atr
+
+# -- Last-value kernels ----------------------------------------------------
+# Same quantities as the functions above, evaluated for the final bar only.
+# They take NumPy arrays and touch just the window that value depends on,
+# so their cost grows with the lookback, not with the series length.
+
+# An EMA depends on its whole history; contributions older than the point
+# where their weight drops below this (relative) tolerance are truncated
+EMA_TAIL_TOLERANCE = 1e-12
+
+
+@lru_cache(maxsize=None)
+def ema_lookback(period: int, tolerance: float = EMA_TAIL_TOLERANCE) -> int:
+    """Bars after which a value's weight in an EMA(period) is below `tolerance`."""
+    keep = 1 - 2 / (period + 1)
+    return max(1, int(math.ceil(math.log(tolerance) / math.log(keep))))
+
+
+@lru_cache(maxsize=None)
+def _ema_kernel(period: int, lookback: int) -> np.ndarray:
+    # y_t = sum_{j<K} alpha * keep^j * x_{t-j} + keep^K * x_{t-K}, i.e. the
+    # adjust=False recursion seeded K bars back
+    alpha = 2 / (period + 1)
+    keep = 1 - alpha
+    kernel = np.append(alpha * keep ** np.arange(lookback), keep ** lookback)
+    kernel.flags.writeable = False
+    return kernel
+
+
+def ema_tail(values: np.ndarray, period: int, count: int = 1) -> np.ndarray:
+    """
+    The last `count` values of calculate_ema(values, period) (adjust=False),
+    within EMA_TAIL_TOLERANCE, from the last count + ema_lookback(period) inputs.
+    """
+    lookback = ema_lookback(period)
+    need = count + lookback
+    tail = values[-need:]
+    if len(tail) < need:
+        # pandas seeds the EMA with the first value, which is the EMA of a
+        # constant prefix: padding with it makes the short case exact
+        tail = np.concatenate((np.full(need - len(tail), tail[0]), tail))
+    return np.convolve(tail, _ema_kernel(period, lookback), mode="valid")[-count:]
+
+
+def last_sma(values: np.ndarray, period: int) -> float:
+    """calculate_sma(values, period).iloc[-1]"""
+    if len(values) < period:
+        return math.nan
+    return float(values[-period:].mean())
+
+
+def last_std(values: np.ndarray, period: int) -> float:
+    """values.rolling(period).std().iloc[-1] (sample standard deviation)"""
+    if len(values) < period or period < 2:
+        return math.nan
+    return float(values[-period:].std(ddof=1))
+
+
+def last_ema(values: np.ndarray, period: int) -> float:
+    """calculate_ema(values, period).iloc[-1]"""
+    if len(values) == 0:
+        return math.nan
+    return float(ema_tail(values, period)[-1])
+
+
+def last_rsi(values: np.ndarray, period: int = 14) -> float:
+    """calculate_rsi(values, period).iloc[-1]"""
+    n = len(values)
+    if n < period:
+        return 50.0  # calculate_rsi fills undefined values with 50
+    if n > period:
+        delta = np.diff(values[-(period + 1):])
+    else:
+        # The first diff is NaN, which calculate_rsi counts as a 0 gain / 0 loss
+        delta = np.concatenate(([0.0], np.diff(values)))
+    gain = np.where(delta > 0, delta, 0.0).mean()
+    loss = np.where(delta < 0, -delta, 0.0).mean()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - (100 / (1 + np.float64(gain) / loss))
+    return 50.0 if math.isnan(rsi) else float(rsi)
+
+
+def last_macd(values: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, float]:
+    """Last row of calculate_macd(values, fast, slow, signal) as a dict."""
+    if len(values) == 0:
+        return {"macd": math.nan, "signal": math.nan, "hist": math.nan}
+    # The signal line needs the MACD line over its own lookback. When that
+    # reaches back to the first bar, ema_tail's padding seeds it with macd[0]
+    # exactly as calculate_ema does.
+    count = min(len(values), ema_lookback(signal) + 1)
+    macd_line = ema_tail(values, fast, count) - ema_tail(values, slow, count)
+    signal_val = float(ema_tail(macd_line, signal)[-1])
+    macd_val = float(macd_line[-1])
+    return {"macd": macd_val, "signal": signal_val, "hist": macd_val - signal_val}
+
+
+def last_bollinger(values: np.ndarray, period: int = 20, k: float = 2) -> Dict[str, float]:
+    """Last upper / middle / lower Bollinger band values."""
+    middle = last_sma(values, period)
+    std = last_std(values, period)
+    return {"upper": middle + (std * k), "middle": middle, "lower": middle - (std * k)}
+
+
+def last_atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> float:
+    """calculate_atr(high, low, close, period).iloc[-1]"""
+    n = len(close)
+    if n < period:
+        return math.nan
+    h, l = high[-period:], low[-period:]
+    prev_close = close[-(period + 1):-1]
+    if n == period:
+        # No previous close for the first bar: its true range is high - low
+        prev_close = np.concatenate(([math.nan], prev_close))
+    with np.errstate(invalid="ignore"):
+        tr = np.fmax(h - l, np.fmax(np.abs(h - prev_close), np.abs(l - prev_close)))
+    return float(tr.mean())
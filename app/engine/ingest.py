@@ -0,0 +1,233 @@
+import io
+import os
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+from app.engine.frame import (
+    MarketFrame, FrameValidationError, COLUMNS, TIMESTAMP_MIN_MS, TIMESTAMP_MAX_MS, invalid_epoch_ms, to_epoch_ms,
+)
+from app.utils.fastjson import loads
+
+# Hard cap on candles per upload (5M ~= 9.5 years of 1m candles, ~240 MB of columns)
+UPLOAD_MAX_ROWS = int(os.getenv("UPLOAD_MAX_ROWS", 5_000_000))
+# A single row longer than this is rejected instead of buffered
+MAX_LINE_BYTES = 4096
+INITIAL_ROWS = 65536
+
+FORMATS = ("ndjson", "csv")
+FIELDS = ("timestamp",) + COLUMNS
+
+
+class IngestError(ValueError):
+    """A row of the upload stream was rejected; `line` is 1-based."""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+        self.message = message
+
+
+class RowLimitError(IngestError):
+    pass
+
+
+def _parse_timestamp(value) -> int:
+    """Epoch milliseconds, or an ISO-8601 string (naive means UTC)."""
+    if isinstance(value, (bytes, str)):
+        text = value.decode() if isinstance(value, bytes) else value
+        try:
+            ms = int(text)
+        except ValueError:
+            ms = to_epoch_ms(datetime.fromisoformat(text))
+    elif isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError("timestamp must be epoch milliseconds or an ISO-8601 string")
+    elif isinstance(value, float) and not value.is_integer():
+        raise ValueError("timestamp must be a whole number of milliseconds")
+    else:
+        ms = int(value)
+    if not TIMESTAMP_MIN_MS <= ms <= TIMESTAMP_MAX_MS:
+        raise ValueError("timestamp is outside the supported range (1677-2262)")
+    return ms
+
+
+class CandleStreamParser:
+    """
+    Incremental NDJSON / CSV candle parser writing into growing NumPy
+    column buffers.
+
+    Feed it raw chunks as they arrive; memory stays at the column buffers
+    (plus one partial line), never a Python object per candle. Rows are
+    rejected as soon as they are seen, so a bad upload stops early.
+
+    NDJSON rows are objects with timestamp/open/high/low/close/volume or
+    6-element arrays in that order. CSV rows use that column order unless
+    the first line is a header naming the columns (extra columns ignored).
+    """
+
+    def __init__(self, fmt: str = "ndjson", max_rows: int = UPLOAD_MAX_ROWS, initial_rows: int = INITIAL_ROWS):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported upload format {fmt!r}, expected one of {FORMATS}")
+        self.format = fmt
+        self.max_rows = max_rows
+        self.rows = 0
+        self.line_no = 0
+        self._ts = np.empty(min(initial_rows, max_rows), dtype=np.int64)
+        self._cols = np.empty((5, len(self._ts)), dtype=np.float64)
+        self._pending = b""
+        self._csv_index: Optional[List[int]] = None
+
+    # -- buffers ---------------------------------------------------------
+
+    def _reserve(self, extra: int):
+        needed = self.rows + extra
+        if needed > self.max_rows:
+            raise RowLimitError(self.line_no, f"upload exceeds the limit of {self.max_rows} candles")
+        if needed <= len(self._ts):
+            return
+        capacity = min(self.max_rows, max(needed, 2 * len(self._ts)))
+        ts = np.empty(capacity, dtype=np.int64)
+        cols = np.empty((5, capacity), dtype=np.float64)
+        ts[:self.rows] = self._ts[:self.rows]
+        cols[:, :self.rows] = self._cols[:, :self.rows]
+        self._ts, self._cols = ts, cols
+
+    def _commit(self, lines, stamps, values: np.ndarray):
+        """
+        Appends a parsed block: `values` is (5, n) OHLCV, `lines` maps each
+        row back to its line number for error messages.
+        """
+        if len(stamps) == 0:
+            return
+        self._reserve(len(stamps))
+        # Same constraints as the Candle model, checked per block
+        bad = ~np.isfinite(values)
+        bad[:4] |= values[:4] <= 0
+        bad[4] |= values[4] < 0
+        if bad.any():
+            row = int(np.argmax(bad.any(axis=0)))
+            field = int(np.argmax(bad[:, row]))
+            constraint = "a finite number >= 0" if field == 4 else "a finite number > 0"
+            raise IngestError(lines[row], f"{COLUMNS[field]} must be {constraint}")
+        end = self.rows + len(stamps)
+        self._ts[self.rows:end] = stamps
+        self._cols[:, self.rows:end] = values
+        self.rows = end
+
+    # -- parsing ---------------------------------------------------------
+
+    def _parse_ndjson(self, line: bytes):
+        try:
+            row = loads(line)
+        except ValueError:
+            raise IngestError(self.line_no, "not valid JSON")
+        if isinstance(row, dict):
+            try:
+                row = [row[name] for name in FIELDS]
+            except KeyError as e:
+                raise IngestError(self.line_no, f"missing field {e.args[0]!r}")
+        elif not isinstance(row, list) or len(row) != 6:
+            raise IngestError(self.line_no, "expected an object or a 6-element array")
+        return row
+
+    def _parse_csv(self, line: bytes):
+        cells = line.split(b",")
+        if self._csv_index is None:
+            names = [c.strip().strip(b'"').decode(errors="replace").lower() for c in cells]
+            if "open" in names:
+                missing = [name for name in FIELDS if name not in names]
+                if missing:
+                    raise IngestError(self.line_no, f"header is missing {', '.join(missing)}")
+                self._csv_index = [names.index(name) for name in FIELDS]
+                return None
+            self._csv_index = list(range(6))
+        try:
+            return [cells[i].strip().strip(b'"') for i in self._csv_index]
+        except IndexError:
+            raise IngestError(self.line_no, f"expected {max(self._csv_index) + 1} columns, got {len(cells)}")
+
+    def _fast_block(self, lines: List[bytes]):
+        """
+        Vectorized parse of a block of well-formed rows (epoch-ms timestamps,
+        no blank lines). Returns None or raises when the block needs the
+        row-by-row path, which also pinpoints the offending line. Timestamps
+        are checked before the int64 cast, which would truncate fractions.
+        """
+        if self.format == "csv":
+            if self._csv_index is None:
+                return None
+            # NumPy's C reader; epoch-ms timestamps are exact in float64
+            table = np.loadtxt(io.BytesIO(b"\n".join(lines)), delimiter=",", usecols=self._csv_index,
+                               dtype=np.float64, comments=None, ndmin=2).T
+            if invalid_epoch_ms(table[0]) is not None:
+                return None
+            return table[0].astype(np.int64), table[1:]
+
+        rows = loads(b"[" + b",".join(lines) + b"]")
+        if isinstance(rows[0], dict):
+            columns = [[row[name] for row in rows] for name in FIELDS]
+        elif all(isinstance(row, list) and len(row) == 6 for row in rows):
+            columns = list(zip(*rows))
+        else:
+            return None
+        # ISO strings and booleans (which NumPy would turn into 1) go row by row
+        if not set(map(type, columns[0])) <= {int, float}:
+            return None
+        stamps = np.array(columns[0])
+        if stamps.dtype.kind not in "if" or invalid_epoch_ms(stamps) is not None:
+            return None
+        return stamps.astype(np.int64), np.array(columns[1:], dtype=np.float64)
+
+    def _parse_lines(self, lines: List[bytes]):
+        first = self.line_no + 1
+        if lines and all(lines):
+            try:
+                block = self._fast_block(lines)
+            except (TypeError, ValueError, KeyError, OverflowError):
+                block = None
+            if block is not None:
+                self.line_no += len(lines)
+                self._commit(range(first, first + len(lines)), *block)
+                return
+
+        parse = self._parse_ndjson if self.format == "ndjson" else self._parse_csv
+        line_nos, stamps, values = [], [], []
+        for line in lines:
+            self.line_no += 1
+            if not line.strip():
+                continue
+            row = parse(line)
+            if row is None:
+                continue
+            try:
+                stamps.append(_parse_timestamp(row[0]))
+                values.append((float(row[1]), float(row[2]), float(row[3]), float(row[4]), float(row[5])))
+            except (TypeError, ValueError, OverflowError) as e:
+                raise IngestError(self.line_no, f"invalid value ({e})")
+            line_nos.append(self.line_no)
+        if values:
+            self._commit(line_nos, stamps, np.array(values, dtype=np.float64).T)
+
+    def feed(self, chunk: bytes):
+        """Parses every complete line in `chunk` (plus what was left over)."""
+        data = self._pending + chunk if self._pending else chunk
+        lines = data.split(b"\n")
+        self._pending = lines.pop()
+        for i, line in enumerate(lines):
+            if len(line) > MAX_LINE_BYTES:
+                raise IngestError(self.line_no + i + 1, f"row longer than {MAX_LINE_BYTES} bytes")
+        if len(self._pending) > MAX_LINE_BYTES:
+            raise IngestError(self.line_no + len(lines) + 1, f"row longer than {MAX_LINE_BYTES} bytes")
+        self._parse_lines(lines)
+
+    def close(self) -> MarketFrame:
+        """Parses the trailing line and returns the series (sorted by time)."""
+        if self._pending:
+            self._parse_lines([self._pending])
+            self._pending = b""
+        n = self.rows
+        try:
+            return MarketFrame.from_columns(self._ts[:n], *self._cols[:, :n])
+        except FrameValidationError as e:
+            raise IngestError(self.line_no, str(e))
@@ -1,6 +1,12 @@
 import os
+import re
 import json
-from typing import Optional, Dict, Any
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Optional, Callable, Dict, Any, List, Tuple
 from app.schemas import AnalysisResponse, SignalType
 
 try:
@@ -8,88 +14,460 @@ try:
 except ImportError:
     OpenAI = None
 
+LLM_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+# Point at any OpenAI-compatible endpoint (e.g. a local stand-in for tests)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 30))
+# Reviews of analyses with identical normalized prompts are reused for this long
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", 900))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 1024))
+# Numbers in the cache key's prompt are rounded to this many significant
+# digits, so tiny indicator moves share a cached review (the model always
+# sees the exact values)
+LLM_PROMPT_SIG_DIGITS = int(os.getenv("LLM_PROMPT_SIG_DIGITS", 3))
+# Reviews requested together are packed into one completion of up to this
+# many analyses (1 disables batching); a batch is sent once full or once its
+# first review has waited LLM_BATCH_MAX_WAIT_MS
+LLM_BATCH_MAX_ITEMS = int(os.getenv("LLM_BATCH_MAX_ITEMS", 8))
+LLM_BATCH_MAX_WAIT_MS = float(os.getenv("LLM_BATCH_MAX_WAIT_MS", 50))
+LLM_BATCH_WORKERS = 4
+
+SYSTEM_PROMPT = (
+    "You are a conservative AI Trading Risk Manager. "
+    "Your goal is to validate trading signals for accuracy and safety. "
+    "PRINCIPLES: \n"
+    "1. PREFER 'HOLD' over risky 'BUY'/'SELL'. If agents conflict, choose HOLD.\n"
+    "2. SAFETY FIRST. Do not endorse signals catching falling knives.\n"
+    "3. EXPLAINABILITY. Briefly explain WHY the signal is chosen in simple terms."
+)
+
+REVIEW_RULES = (
+    "1. Evaluate if the proposed decision is supported by data. If agents are weak/conflicted, enforce HOLD.\n"
+    "2. If the signal is BUY/SELL, ensure multiple indicators confirm it. If unsure, override to HOLD.\n"
+)
+
+BATCH_SYSTEM_PROMPT = SYSTEM_PROMPT + (
+    "\nYou will receive several independent analyses, each headed '=== ITEM <id>: <symbol> (<timeframe>) ==='. "
+    "Judge every item on its own data only."
+)
+
+# Completion budget per reviewed analysis
+LLM_TOKENS_PER_ITEM = 150
+
+SIGNALS = ("BUY", "SELL", "HOLD")
+
+_NUMBER = re.compile(r"-?\d+\.\d+")
+
+
+def _round_sig(value: float, digits: int = LLM_PROMPT_SIG_DIGITS) -> float:
+    if value == 0 or value != value or value in (float("inf"), float("-inf")):
+        return value
+    return float(f"{value:.{digits}g}")
+
+
+def _quantize(value: Any) -> Any:
+    """
+    Normalizes cache-key inputs: floats (including numbers embedded in
+    reasoning strings) are rounded to LLM_PROMPT_SIG_DIGITS significant digits.
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, float):
+        return _round_sig(value)
+    if isinstance(value, str):
+        return _NUMBER.sub(lambda m: f"{_round_sig(float(m.group())):g}", value)
+    if isinstance(value, dict):
+        return {k: _quantize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_quantize(v) for v in value]
+    return value
+
+
 class LLMReasoner:
-    def __init__(self):
+    def __init__(self, cache_ttl: float = LLM_CACHE_TTL_SECONDS, cache_max_entries: int = LLM_CACHE_MAX_ENTRIES):
         self.api_key = os.environ.get("OPENAI_API_KEY")
         self.client = None
         if self.api_key and OpenAI:
-            self.client = OpenAI(api_key=self.api_key)
+            self.client = OpenAI(api_key=self.api_key, base_url=OPENAI_BASE_URL, timeout=LLM_TIMEOUT_SECONDS)
+        self.model = LLM_MODEL
+        self.cache_ttl = cache_ttl
+        self.cache_max_entries = cache_max_entries
+        # prompt hash -> (expires, verdict); LRU order
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # prompt hash -> Future shared by concurrent identical reviews
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "coalesced_timeouts": 0, "calls": 0, "failures": 0, "evictions": 0}
 
     def is_available(self) -> bool:
         return self.client is not None
 
-    def analyze(self, current_analysis: AnalysisResponse) -> AnalysisResponse:
+    def describe(self, current_analysis: AnalysisResponse, normalized: bool = False) -> str:
         """
-        Refines the rule-based analysis using OpenAI.
+        The data sections of a review prompt, with the exact values. The
+        `normalized` form (rounded numbers, consensus summary without the
+        repeated agent details) is byte-identical for equivalent analyses
+        and only feeds the cache key; it is never sent to the model.
         """
-        if not self.is_available():
-            return current_analysis
-
-        # Construct the prompt
-        indicators_summary = json.dumps(current_analysis.indicators, indent=2)
+        norm = _quantize if normalized else (lambda value: value)
+        indicators_summary = json.dumps(norm(current_analysis.indicators), indent=2, sort_keys=True)
         agents_summary = "\n".join([
-            f"- {a.agent_name}: {a.signal} (Conf: {a.confidence}) - {a.metadata.get('reasoning', '')}" 
+            f"- {a.agent_name}: {a.signal.value} (Conf: {norm(a.confidence)}) - "
+            f"{norm(a.metadata.get('reasoning', ''))}"
             for a in current_analysis.agent_signals
         ])
+        reasoning = current_analysis.reasoning
+        if normalized:
+            reasoning = _quantize(reasoning.split(" Details: ")[0])
 
-        system_prompt = (
-            "You are a conservative AI Trading Risk Manager. "
-            "Your goal is to validate trading signals for accuracy and safety. "
-            "PRINCIPLES: \n"
-            "1. PREFER 'HOLD' over risky 'BUY'/'SELL'. If agents conflict, choose HOLD.\n"
-            "2. SAFETY FIRST. Do not endorse signals catching falling knives.\n"
-            "3. EXPLAINABILITY. Briefly explain WHY the signal is chosen in simple terms."
-        )
-
-        user_prompt = (
-            f"Review this market analysis for {current_analysis.symbol} ({current_analysis.timeframe}).\n\n"
+        return (
             f"--- AGENT INPUTS ---\n{agents_summary}\n\n"
             f"--- TECHNICAL DATA ---\n{indicators_summary}\n\n"
             f"--- PROPOSED DECISION ---\n"
-            f"Signal: {current_analysis.signal}\n"
-            f"Confidence: {current_analysis.confidence}\n"
-            f"Reasoning: {current_analysis.reasoning}\n\n"
+            f"Signal: {current_analysis.signal.value}\n"
+            f"Confidence: {norm(current_analysis.confidence)}\n"
+            f"Reasoning: {reasoning}"
+        )
+
+    def build_prompt(self, current_analysis: AnalysisResponse, normalized: bool = False) -> str:
+        """User prompt for the review of a single analysis (see `describe`)."""
+        return (
+            f"Review this market analysis for {current_analysis.symbol} ({current_analysis.timeframe}).\n\n"
+            f"{self.describe(current_analysis, normalized)}\n\n"
             "INSTRUCTIONS:\n"
-            "1. Evaluate if the proposed decision is supported by data. If agents are weak/conflicted, enforce HOLD.\n"
-            "2. If the signal is BUY/SELL, ensure multiple indicators confirm it. If unsure, override to HOLD.\n"
+            f"{REVIEW_RULES}"
             "3. Return JSON: { 'signal': 'BUY'|'SELL'|'HOLD', 'confidence': float(0.0-1.0), 'explanation': 'One sentence summary.' }"
         )
 
+    def prompt_key(self, user_prompt: str) -> str:
+        """Hash of a review prompt together with the model and system prompt."""
+        return hashlib.blake2b(f"{self.model}\0{SYSTEM_PROMPT}\0{user_prompt}".encode(), digest_size=16).hexdigest()
+
+    def review_key(self, current_analysis: AnalysisResponse) -> str:
+        """Cache key of a single-analysis review: its normalized prompt."""
+        return self.prompt_key(self.build_prompt(current_analysis, normalized=True))
+
+    def analyze(self, current_analysis: AnalysisResponse) -> AnalysisResponse:
+        """
+        Refines the rule-based analysis using OpenAI.
+        Analyses with identical normalized prompts are answered from a TTL
+        cache, and concurrent identical reviews share a single in-flight request.
+        """
+        if not self.is_available():
+            return current_analysis
+
+        verdict = self.review(current_analysis)
+        if verdict is None:
+            return current_analysis
+        return self.apply_verdict(current_analysis, verdict)
+
+    def review(self, current_analysis: AnalysisResponse, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        The LLM verdict for an analysis, or None when the call failed.
+        `timeout` bounds this review (no retries) instead of LLM_TIMEOUT_SECONDS.
+        """
+        return self._review(self.review_key(current_analysis), self.build_prompt(current_analysis), timeout)
+
+    def _review(self, key: str, user_prompt: str, timeout: Optional[float] = None,
+                complete: Optional[Callable[[str, Optional[float]], Optional[Dict[str, Any]]]] = None
+                ) -> Optional[Dict[str, Any]]:
+        """
+        Cached, single-flight review of one prompt; the leader obtains the
+        verdict through `complete` (default: its own chat completion).
+        """
+        leader = False
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                self._counters["hits"] += 1
+                return cached[1]
+            pending = self._inflight.get(key)
+            if pending is not None:
+                self._counters["coalesced"] += 1
+            else:
+                self._counters["misses"] += 1
+                pending = self._inflight[key] = Future()
+                leader = True
+        if not leader:
+            try:
+                return pending.result(timeout=LLM_TIMEOUT_SECONDS if timeout is None else timeout)
+            except FutureTimeout:
+                # The leader's call is still running: not a failure of the API
+                self._count("coalesced_timeouts")
+                return None
+
+        verdict = None
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.0, # Strict, deterministic
-                max_tokens=150
-            )
-            
-            content = response.choices[0].message.content
+            verdict = (complete or self._complete)(user_prompt, timeout)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if verdict is not None and self.cache_ttl > 0:
+                    self._cache[key] = (time.monotonic() + self.cache_ttl, verdict)
+                    self._cache.move_to_end(key)
+                    while len(self._cache) > self.cache_max_entries:
+                        self._cache.popitem(last=False)
+                        self._counters["evictions"] += 1
+            pending.set_result(verdict)
+        return verdict
+
+    def _chat(self, user_prompt: str, timeout: Optional[float] = None,
+              system_prompt: str = SYSTEM_PROMPT, max_tokens: int = LLM_TOKENS_PER_ITEM) -> str:
+        """One chat completion; returns its content and raises on API errors."""
+        with self._lock:
+            self._counters["calls"] += 1
+        client = self.client if timeout is None else self.client.with_options(timeout=timeout, max_retries=0)
+        response = client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.0, # Strict, deterministic
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content
+
+    def _complete(self, user_prompt: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Single-analysis review; returns the parsed JSON verdict or None."""
+        try:
+            content = self._chat(user_prompt, timeout)
             if not content:
                 print("LLM returned empty content.")
-                return current_analysis
-
-            llm_result = json.loads(content)
-            
-            # Update the analysis object
-            # We preserve the original agents/indicators but override the final judgment
-            updated_analysis = current_analysis.copy()
-            
-            signal_str = llm_result.get("signal", "HOLD").upper()
-            if signal_str in ["BUY", "SELL", "HOLD"]:
-                updated_analysis.signal = SignalType(signal_str)
-            
-            updated_analysis.confidence = float(llm_result.get("confidence", current_analysis.confidence))
-            
-            # Append LLM reasoning to existing reasoning
-            llm_explanation = llm_result.get("explanation", "No explanation provided.")
-            updated_analysis.reasoning = f"[AI REASONING]: {llm_explanation} | [ORIGINAL]: {current_analysis.reasoning}"
-            
-            return updated_analysis
-
+                verdict = None
+            else:
+                verdict = json.loads(content)
         except Exception as e:
             print(f"LLM Analysis failed: {e}")
+            verdict = None
+        if verdict is None:
+            self._count("failures")
+        return verdict
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] += n
+
+    def apply_verdict(self, current_analysis: AnalysisResponse, llm_result: Dict[str, Any]) -> AnalysisResponse:
+        """
+        Overrides the final judgment with the LLM's verdict; the original
+        agents/indicators are preserved.
+        """
+        updated_analysis = current_analysis.copy()
+
+        signal_str = str(llm_result.get("signal", "HOLD")).upper()
+        if signal_str in ["BUY", "SELL", "HOLD"]:
+            updated_analysis.signal = SignalType(signal_str)
+
+        try:
+            updated_analysis.confidence = float(llm_result.get("confidence", current_analysis.confidence))
+        except (TypeError, ValueError):
+            pass
+
+        # Append LLM reasoning to existing reasoning
+        llm_explanation = llm_result.get("explanation", "No explanation provided.")
+        updated_analysis.reasoning = f"[AI REASONING]: {llm_explanation} | [ORIGINAL]: {current_analysis.reasoning}"
+
+        return updated_analysis
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["cached"] = len(self._cache)
+            stats["in_flight"] = len(self._inflight)
+        stats.update(available=self.is_available(), model=self.model, ttl_seconds=self.cache_ttl)
+        return stats
+
+
+class _BatchItem:
+    __slots__ = ("analysis", "prompt", "bounded", "deadline", "queued", "future")
+
+    def __init__(self, analysis: AnalysisResponse, prompt: str, timeout: Optional[float]):
+        self.analysis = analysis
+        self.prompt = prompt
+        # Only a caller-requested timeout turns off the client's retries
+        self.bounded = timeout is not None
+        self.queued = time.monotonic()
+        self.deadline = self.queued + (LLM_TIMEOUT_SECONDS if timeout is None else timeout)
+        self.future: Future = Future()
+
+
+# Batch answer for an item that was missing or malformed: review it alone
+_FALLBACK = object()
+
+
+class BatchLLMReviewer:
+    """
+    Packs reviews requested at about the same time (e.g. many symbols closing
+    the same candle) into one chat completion: one system prompt, one request
+    against the rate limit, one round trip.
+
+    Each analysis is still cached and de-duplicated by its normalized
+    single-review prompt through the wrapped LLMReasoner. Items the batch
+    answer leaves out or gets wrong are reviewed on their own.
+
+    Every review waits up to `max_wait` for company, which suits deferred
+    reviews; synchronous requests call LLMReasoner.review directly.
+    """
+
+    def __init__(self, reasoner: LLMReasoner, max_items: int = LLM_BATCH_MAX_ITEMS,
+                 max_wait: float = LLM_BATCH_MAX_WAIT_MS / 1000, workers: int = LLM_BATCH_WORKERS):
+        self.reasoner = reasoner
+        self.max_items = max_items
+        self.max_wait = max_wait
+        self.workers = workers
+        self._queue: List[_BatchItem] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._counters = {"batches": 0, "batched_items": 0, "fallbacks": 0, "batch_failures": 0}
+
+    def is_available(self) -> bool:
+        return self.reasoner.is_available()
+
+    def review(self, current_analysis: AnalysisResponse, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Same contract as LLMReasoner.review."""
+        if self.max_items <= 1:
+            return self.reasoner.review(current_analysis, timeout)
+        return self.reasoner._review(
+            self.reasoner.review_key(current_analysis), self.reasoner.build_prompt(current_analysis), timeout,
+            complete=lambda prompt, t: self._enqueue(current_analysis, prompt, t)
+        )
+
+    def analyze(self, current_analysis: AnalysisResponse) -> AnalysisResponse:
+        verdict = self.review(current_analysis) if self.is_available() else None
+        if verdict is None:
             return current_analysis
+        return self.apply_verdict(current_analysis, verdict)
+
+    def apply_verdict(self, current_analysis: AnalysisResponse, llm_result: Dict[str, Any]) -> AnalysisResponse:
+        return self.reasoner.apply_verdict(current_analysis, llm_result)
+
+    # -- batching --------------------------------------------------------
+
+    def _enqueue(self, analysis: AnalysisResponse, prompt: str, timeout: Optional[float]) -> Optional[Dict[str, Any]]:
+        item = _BatchItem(analysis, prompt, timeout)
+        with self._cond:
+            if self._thread is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="llm-batch")
+                self._thread = threading.Thread(target=self._collect, name="llm-batcher", daemon=True)
+                self._thread.start()
+            self._queue.append(item)
+            self._cond.notify()
+        try:
+            verdict = item.future.result(timeout=max(0.0, item.deadline - time.monotonic()))
+        except Exception:
+            return None
+        if verdict is _FALLBACK:
+            remaining = item.deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self._count("fallbacks")
+            return self.reasoner._complete(prompt, remaining if item.bounded else None)
+        return verdict
+
+    def _collect(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                flush_at = self._queue[0].queued + self.max_wait
+                while len(self._queue) < self.max_items:
+                    remaining = flush_at - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._queue = self._queue[:self.max_items], self._queue[self.max_items:]
+            self._pool.submit(self._send, batch)
+
+    def build_batch_prompt(self, analyses: List[AnalysisResponse]) -> str:
+        sections = "\n\n".join(
+            f"=== ITEM {i}: {a.symbol} ({a.timeframe}) ===\n{self.reasoner.describe(a)}"
+            for i, a in enumerate(analyses, 1)
+        )
+        return (
+            f"Review each of these {len(analyses)} market analyses independently.\n\n"
+            f"{sections}\n\n"
+            "INSTRUCTIONS (apply to every item):\n"
+            f"{REVIEW_RULES}"
+            "3. Return JSON: { 'reviews': [ { 'id': <item number>, 'symbol': '<symbol>', "
+            "'signal': 'BUY'|'SELL'|'HOLD', 'confidence': float(0.0-1.0), 'explanation': 'One sentence summary.' } ] } "
+            "with exactly one entry per item."
+        )
+
+    @staticmethod
+    def parse_batch(content: str, analyses: List[AnalysisResponse]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Per-item verdicts from a batch answer, in item order; None where an
+        item is missing, names the wrong symbol or has no valid signal.
+        """
+        verdicts: List[Optional[Dict[str, Any]]] = [None] * len(analyses)
+        try:
+            data = json.loads(content)
+        except (TypeError, ValueError):
+            return verdicts
+        entries = data.get("reviews") if isinstance(data, dict) else data
+        if not isinstance(entries, list):
+            return verdicts
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            try:
+                index = int(entry.get("id")) - 1
+            except (TypeError, ValueError):
+                continue
+            if not 0 <= index < len(analyses) or verdicts[index] is not None:
+                continue
+            symbol = entry.get("symbol")
+            if symbol is not None and str(symbol).upper() != analyses[index].symbol.upper():
+                continue
+            if str(entry.get("signal", "")).upper() not in SIGNALS:
+                continue
+            verdicts[index] = {k: entry[k] for k in ("signal", "confidence", "explanation") if k in entry}
+        return verdicts
+
+    def _send(self, batch: List[_BatchItem]):
+        timeout = min(item.deadline for item in batch) - time.monotonic()
+        if timeout <= 0:
+            for item in batch:
+                item.future.set_result(None)
+            return
+        if not any(item.bounded for item in batch):
+            timeout = None  # Client default timeout, with its retries
+        if len(batch) == 1:
+            batch[0].future.set_result(self.reasoner._complete(batch[0].prompt, timeout))
+            return
+
+        analyses = [item.analysis for item in batch]
+        self._count("batches")
+        self._count("batched_items", len(batch))
+        try:
+            content = self.reasoner._chat(
+                self.build_batch_prompt(analyses), timeout,
+                system_prompt=BATCH_SYSTEM_PROMPT, max_tokens=LLM_TOKENS_PER_ITEM * len(batch)
+            )
+        except Exception as e:
+            print(f"Batched LLM review of {len(batch)} analyses failed: {e}")
+            self._count("batch_failures")
+            self.reasoner._count("failures", len(batch))
+            for item in batch:
+                item.future.set_result(None)
+            return
+        for item, verdict in zip(batch, self.parse_batch(content, analyses)):
+            item.future.set_result(_FALLBACK if verdict is None else verdict)
+
+    def _count(self, name: str, n: int = 1):
+        with self._cond:
+            self._counters[name] += n
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._counters)
+            stats["queued"] = len(self._queue)
+        stats.update(
+            avg_batch_size=round(stats["batched_items"] / stats["batches"], 2) if stats["batches"] else None,
+            max_items=self.max_items, max_wait_ms=self.max_wait * 1000,
+        )
+        return stats
@@ -0,0 +1,209 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, Set, Tuple
+
+from app.schemas import AnalysisResponse, LLMStatus
+from app.engine.llm import BatchLLMReviewer
+
+# "sync": /analyze waits for the LLM review (original behaviour).
+# "deferred": /analyze returns the rule-based result at once (llm_status
+# "pending") and the review runs in the background.
+LLM_MODE = os.getenv("LLM_MODE", "sync")
+# A deferred review not finished this long after the analysis is dropped
+LLM_REVIEW_DEADLINE_SECONDS = float(os.getenv("LLM_REVIEW_DEADLINE_SECONDS", 10))
+LLM_REVIEW_WORKERS = int(os.getenv("LLM_REVIEW_WORKERS", 8))
+# Results kept for GET /analyses/{analysis_id}
+ANALYSIS_STORE_MAX_ENTRIES = int(os.getenv("ANALYSIS_STORE_MAX_ENTRIES", 10000))
+LATENCY_SAMPLES = 2048
+# Pending events per /signals/stream client; the oldest are dropped beyond it
+FEED_QUEUE_SIZE = 256
+
+LLM_MODES = ("sync", "deferred")
+
+
+class AnalysisStore:
+    """Recent results by analysis_id (bounded, oldest evicted first)."""
+
+    def __init__(self, max_entries: int = ANALYSIS_STORE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, AnalysisResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, result: AnalysisResponse):
+        if not result.analysis_id:
+            return
+        with self._lock:
+            self._entries[result.analysis_id] = result
+            self._entries.move_to_end(result.analysis_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, analysis_id: str) -> Optional[AnalysisResponse]:
+        with self._lock:
+            return self._entries.get(analysis_id)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class LatencyStats:
+    """
+    Rolling latency samples (milliseconds) per label, reported as
+    percentiles. Labels used by the engine:
+    rule (agents + aggregator), llm_review (one LLM review) and
+    refined (analysis start until the LLM-refined result exists).
+    """
+
+    def __init__(self, samples: int = LATENCY_SAMPLES):
+        self.samples = samples
+        self._series: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, label: str, ms: float):
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = deque(maxlen=self.samples)
+            series.append(ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = {label: sorted(series) for label, series in self._series.items()}
+        report = {}
+        for label, values in snapshot.items():
+            if not values:
+                continue
+            pick = lambda q: round(values[min(len(values) - 1, int(q * len(values)))], 3)
+            report[label] = {
+                "count": len(values),
+                "p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99),
+                "max": round(values[-1], 3),
+                "mean": round(sum(values) / len(values), 3),
+            }
+        return report
+
+
+class SignalFeed:
+    """
+    Fan-out of published results to /signals/stream clients. Each client
+    owns an asyncio queue on its event loop; publishers may be any thread.
+    """
+
+    def __init__(self, queue_size: int = FEED_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> asyncio.Queue:
+        """Must be called from the client's event loop."""
+        queue = asyncio.Queue(self.queue_size)
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers = {sub for sub in self._subscribers if sub[1] is not queue}
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, payload: str):
+        if queue.full():
+            queue.get_nowait()  # Slow client: drop its oldest event
+        queue.put_nowait(payload)
+
+    def broadcast(self, result: AnalysisResponse):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if not subscribers:
+            return
+        payload = result.json()  # Serialized once for every client
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, payload)
+            except RuntimeError:  # Event loop closed
+                self.unsubscribe(queue)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+
+class DeferredReviewer:
+    """
+    Runs LLM reviews of already-published rule-based results on a small
+    thread pool. Each review must finish within `deadline` seconds of its
+    submission (queueing included); the refined, timed-out or failed result
+    is handed to `on_done`.
+    """
+
+    def __init__(self, llm: BatchLLMReviewer, on_done: Callable[[AnalysisResponse, float], None],
+                 deadline: float = LLM_REVIEW_DEADLINE_SECONDS, workers: int = LLM_REVIEW_WORKERS,
+                 latency: Optional[LatencyStats] = None):
+        self.llm = llm
+        self.on_done = on_done
+        self.latency = latency
+        self.deadline = deadline
+        self.workers = workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        # analysis_ids queued or running, so a result is never reviewed twice
+        self._pending: Set[str] = set()
+        self._counters = {"submitted": 0, "done": 0, "timeout": 0, "failed": 0}
+
+    def submit(self, result: AnalysisResponse, started: float) -> bool:
+        """
+        Queues a review; `started` is the perf_counter() at which the analysis
+        began. Returns False if this analysis is already being reviewed.
+        """
+        with self._lock:
+            if result.analysis_id in self._pending:
+                return False
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="llm-review")
+            self._pending.add(result.analysis_id)
+            self._counters["submitted"] += 1
+            self._pool.submit(self._review, result, started, time.monotonic() + self.deadline)
+        return True
+
+    def _review(self, result: AnalysisResponse, started: float, deadline: float):
+        status, verdict = LLMStatus.TIMEOUT, None
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                review_started = time.perf_counter()
+                verdict = self.llm.review(result, timeout=remaining)
+                if self.latency is not None:
+                    self.latency.record("llm_review", (time.perf_counter() - review_started) * 1000)
+                if time.monotonic() > deadline:
+                    verdict = None  # Too late to be useful
+                else:
+                    status = LLMStatus.DONE if verdict is not None else LLMStatus.FAILED
+        except Exception as e:
+            print(f"Deferred LLM review failed: {e}")
+            status = LLMStatus.FAILED
+
+        refined = self.llm.apply_verdict(result, verdict) if verdict is not None else result.copy()
+        refined.llm_status = status
+        with self._lock:
+            self._pending.discard(result.analysis_id)
+            self._counters[status.value] += 1
+        try:
+            self.on_done(refined, started)
+        except Exception as e:
+            print(f"Publishing reviewed analysis failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["pending"] = len(self._pending)
+        stats.update(deadline_seconds=self.deadline, workers=self.workers)
+        return stats
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
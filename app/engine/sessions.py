@@ -0,0 +1,131 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.schemas import AnalysisResponse, Candle
+from app.engine.frame import CandleRing, MarketFrame, to_epoch_ms
+from app.engine.streaming import IndicatorState
+
+# Candles kept per session for agents that need the raw window.
+SESSION_WINDOW = 1000
+# Upper bound on live sessions; the least recently used one is evicted beyond it.
+MAX_SESSIONS = 512
+# Sessions untouched for this long are dropped.
+SESSION_IDLE_TTL_SECONDS = 3600
+
+
+class SessionError(Exception):
+    pass
+
+
+class StaleCandleError(SessionError):
+    """Raised when an appended candle is older than the session's last candle."""
+
+
+class AnalysisSession:
+    """
+    Append-only analysis state for one symbol/timeframe.
+
+    Holds a bounded candle window plus streaming indicator state, so each
+    newly closed candle costs O(1) instead of a full recomputation.
+    """
+
+    def __init__(self, symbol: str, timeframe: str, window: int = SESSION_WINDOW):
+        self.id = uuid.uuid4().hex
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.ring = CandleRing(window)
+        self.state = IndicatorState()
+        self.last_result: Optional[AnalysisResponse] = None
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    def seed(self, frame: MarketFrame):
+        self.ring.extend(frame)
+        self.state.seed(frame.high.tolist(), frame.low.tolist(), frame.close.tolist())
+
+    def append(self, candle: Candle) -> bool:
+        """
+        Adds a closed candle. Returns False if it repeats the last candle
+        (e.g. a client retry), raises StaleCandleError if it is older.
+        """
+        ts = to_epoch_ms(candle.timestamp)
+        last = self.ring.last_timestamp
+        if last is not None and ts <= last:
+            if ts == last:
+                return False
+            raise StaleCandleError(f"Candle {candle.timestamp} is older than the session's last candle")
+        self.ring.append(ts, candle.open, candle.high, candle.low, candle.close, candle.volume)
+        self.state.update(candle.high, candle.low, candle.close)
+        return True
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+
+class SessionStore:
+    """
+    Thread-safe, bounded registry of analysis sessions.
+    One session per (symbol, timeframe); idle sessions are evicted.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, idle_ttl: float = SESSION_IDLE_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions: "OrderedDict[str, AnalysisSession]" = OrderedDict()
+        self._by_key: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def create(self, symbol: str, timeframe: str, frame: MarketFrame, window: int = SESSION_WINDOW) -> AnalysisSession:
+        session = AnalysisSession(symbol, timeframe, window)
+        session.seed(frame)
+        with self._lock:
+            self._evict_idle()
+            previous = self._by_key.get((symbol, timeframe))
+            if previous is not None:
+                self._remove(previous)
+            while len(self._sessions) >= self.max_sessions:
+                self._remove(next(iter(self._sessions)))
+            self._sessions[session.id] = session
+            self._by_key[(symbol, timeframe)] = session.id
+        return session
+
+    def get(self, session_id: str) -> Optional[AnalysisSession]:
+        with self._lock:
+            self._evict_idle()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.touch()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._remove(session_id)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _remove(self, session_id: str) -> bool:
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        key = (session.symbol, session.timeframe)
+        if self._by_key.get(key) == session_id:
+            del self._by_key[key]
+        return True
+
+    def _evict_idle(self):
+        # Sessions are kept in LRU order, so idle ones sit at the front.
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_used >= cutoff:
+                break
+            self._remove(session_id)
+
+
+# Global Instance
+sessions = SessionStore()
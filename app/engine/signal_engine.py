@@ -1,55 +1,248 @@
+import operator
+import os
+import time
+import uuid
 from datetime import datetime
-from typing import List, Optional
-from app.schemas import Candle, AnalysisResponse
+from itertools import islice
+from typing import Any, Dict, List, Optional
+from app.schemas import Candle, AnalysisResponse, LLMStatus
 from app.engine.agents import TrendFollowingAgent, MomentumAgent, VolatilityAgent
 from app.engine.aggregator import SignalAggregator
-from app.engine.llm import LLMReasoner
+from app.engine.llm import LLMReasoner, BatchLLMReviewer
+from app.engine.frame import MarketFrame
+from app.engine.streaming import IndicatorState
+from app.engine.cache import ResultCache, CacheEntry
+from app.engine.signal_store import SignalStore
+from app.engine.executor import AgentExecutor
+from app.engine.reviews import (
+    LLM_MODE, LLM_MODES, AnalysisStore, DeferredReviewer, LatencyStats, SignalFeed,
+)
+
+# Trim request input to the trailing window the agents declare they need
+# (0 analyzes the full input; results match within EMA_TAIL_TOLERANCE either way)
+LOOKBACK_TRIM = os.getenv("LOOKBACK_TRIM", "1") != "0"
 
 class SignalEngine:
-    def __init__(self):
+    def __init__(self, llm_mode: str = LLM_MODE):
+        if llm_mode not in LLM_MODES:
+            raise ValueError(f"Unknown LLM mode {llm_mode!r}, expected one of {LLM_MODES}")
         self.agents = [
             TrendFollowingAgent(),
             MomentumAgent(),
             VolatilityAgent()
         ]
         self.aggregator = SignalAggregator()
+        self.executor = AgentExecutor()
         self.llm = LLMReasoner()
-        self._latest_analysis: Optional[AnalysisResponse] = None
+        # Deferred reviews share batched completions; sync reviews are sent at
+        # once (no batch wait) through self.llm
+        self.llm_batcher = BatchLLMReviewer(self.llm)
+        self.cache = ResultCache()
+        self.llm_mode = llm_mode
+        self.latency = LatencyStats()
+        self.reviewer = DeferredReviewer(self.llm_batcher, self._on_reviewed, latency=self.latency)
+        # False in batch process workers: the API process starts their reviews
+        self.submit_reviews = True
+        self.analyses = AnalysisStore()
+        self.feed = SignalFeed()
+        # Latest and recent results per (symbol, timeframe)
+        self.signals = SignalStore()
+        self.trim_input = LOOKBACK_TRIM
+
+    def input_window(self) -> Optional[int]:
+        """
+        Trailing bars the agents need (the largest `required_window`), or
+        None when trimming is off or an agent does not declare its needs.
+        """
+        if not self.trim_input:
+            return None
+        windows = [agent.required_window() for agent in self.agents]
+        if not windows or None in windows:
+            return None
+        return max(windows)
+
+    def trim_candles(self, candles: List[Candle]) -> List[Candle]:
+        """
+        The trailing `input_window()` candles, taken before any conversion.
+        Unsorted input is returned whole (the frame sorts it, then trims).
+        """
+        window = self.input_window()
+        if window is None or len(candles) <= window:
+            return candles
+        timestamps = [c.timestamp for c in candles]
+        try:
+            in_order = all(map(operator.le, timestamps, islice(timestamps, 1, None)))
+        except TypeError:
+            in_order = False  # Naive and aware timestamps mixed: let the frame normalize them
+        return candles[-window:] if in_order else candles
 
     def analyze(self, candles: List[Candle], symbol: str, timeframe: str) -> AnalysisResponse:
         """
         Orchestrates the analysis process: 
         Agents -> Aggregator -> (Optional) LLM Reasoning -> Result
         """
+        frame = MarketFrame.from_candles(self.trim_candles(candles))
+        frame, lookback = self._trim_frame(frame, received=len(candles))
+        return self._run(frame, symbol, timeframe, lookback=lookback)
+
+    def analyze_frame(self, frame: MarketFrame, symbol: str, timeframe: str) -> AnalysisResponse:
+        """
+        Same as `analyze`, for callers that already hold a columnar MarketFrame.
+        The frame is built once and shared by every agent.
+        """
+        frame, lookback = self._trim_frame(frame)
+        return self._run(frame, symbol, timeframe, lookback=lookback)
+
+    def _trim_frame(self, frame: MarketFrame, received: Optional[int] = None):
+        """
+        Trims the frame (zero-copy) to `input_window()` bars, so the cost does
+        not grow with the history sent. `received` is the request's candle
+        count when the caller already trimmed it (`trim_candles`).
+        """
+        window = self.input_window()
+        received = received or len(frame)
+        if window is not None and len(frame) > window:
+            frame = frame.slice(len(frame) - window)
+        return frame, {"window": window, "received": received, "used": len(frame)}
+
+    def analyze_cached(self, frame: MarketFrame, symbol: str, timeframe: str,
+                       received: Optional[int] = None) -> CacheEntry:
+        """
+        `analyze_frame` for the HTTP /analyze routes, returning the cache
+        entry (serialized body + ETag). A window seen within the cache TTL is
+        answered with the stored response as computed, timestamp included:
+        no agent run, no LLM call, and nothing is published again.
+        Other callers use `analyze`/`analyze_frame`, which always run.
+        """
+        frame, lookback = self._trim_frame(frame, received)
+        if not self.cache.enabled:
+            result = self._run(frame, symbol, timeframe, lookback=lookback)
+            return CacheEntry.of(result)
+
+        key = self.cache.key(frame, symbol, timeframe)
+        entry = self.cache.get(key)
+        if entry is not None:
+            if entry.result.llm_status == LLMStatus.PENDING:
+                # The deferred review may have finished since this was cached
+                reviewed = self.analyses.get(entry.result.analysis_id)
+                if reviewed is not None and reviewed.llm_status != LLMStatus.PENDING:
+                    entry = self.cache.put(key, reviewed)
+            return entry
+        # Keyed by the trimmed window: longer histories with the same tail share the
+        # result (its lookback report describes the request that computed it)
+        result = self._run(frame, symbol, timeframe, lookback=lookback)
+        return self.cache.put(key, result)
+
+    def analyze_state(self, state: IndicatorState, frame: MarketFrame, symbol: str, timeframe: str) -> AnalysisResponse:
+        """
+        Analyzes from streaming indicator state (append-only sessions).
+        Agents without streaming support fall back to the bounded `frame` window.
+        """
+        return self._run(frame, symbol, timeframe, state)
+
+    def _run(self, frame: MarketFrame, symbol: str, timeframe: str,
+             state: Optional[IndicatorState] = None, lookback: Optional[Dict[str, Any]] = None) -> AnalysisResponse:
+        started = time.perf_counter()
         agent_signals = []
+
+        # Shared indicators: the union of what the agents declare, each node once.
+        # Agents read only the latest values, so just those are evaluated.
+        indicator_report = None
+        if state is None:
+            indicator_report = frame.indicators.resolve(
+                (key for agent in self.agents for key in agent.required_indicators), last=True
+            )
         
-        # Run each agent
-        for agent in self.agents:
-            try:
-                sig = agent.analyze(candles)
-                agent_signals.append(sig)
-            except Exception as e:
+        # Run the agents (concurrently unless AGENT_EXECUTOR=serial); outcomes keep agent order
+        outcomes = self.executor.run(self.agents, frame, state)
+        for outcome in outcomes:
+            self.latency.record(f"agent:{outcome.agent_name}", outcome.elapsed_ms)
+            if outcome.status == "error":
                 # Log error in production, distinct from crashing
                 # For now just skip this agent or return error signal
-                print(f"Agent {agent.name} failed: {e}")
+                print(f"Agent {outcome.agent_name} failed: {outcome.error}")
+            else:
+                if outcome.status == "timeout":
+                    print(f"Agent {outcome.agent_name} timed out after {outcome.elapsed_ms:.0f} ms")
+                # Timed-out agents are HOLD with confidence 0: no weight in the consensus
+                agent_signals.append(outcome.signal)
                 
         # Aggregate (Rule-Based)
         result = self.aggregator.aggregate(agent_signals, symbol, timeframe)
+        result.analysis_id = uuid.uuid4().hex
+        result.metadata = {
+            "executor": self.executor.kind,
+            "agents": {outcome.agent_name: outcome.report() for outcome in outcomes},
+        }
+        if indicator_report is not None:
+            result.metadata["indicators"] = indicator_report
+        if lookback is not None:
+            result.metadata["lookback"] = lookback
+        self.latency.record("rule", (time.perf_counter() - started) * 1000)
         
         # Refine with LLM if available
-        if self.llm.is_available():
-            result = self.llm.analyze(result)
+        deferred = False
+        if not self.llm.is_available():
+            result.llm_status = LLMStatus.SKIPPED
+        elif self.llm_mode == "deferred":
+            # Answer with the rule-based result; the review publishes later
+            result.llm_status = LLMStatus.PENDING
+            deferred = True
+        else:
+            review_started = time.perf_counter()
+            verdict = self.llm.review(result)
+            self.latency.record("llm_review", (time.perf_counter() - review_started) * 1000)
+            if verdict is None:
+                result.llm_status = LLMStatus.FAILED
+            else:
+                result = self.llm.apply_verdict(result, verdict)
+                result.llm_status = LLMStatus.DONE
+                self.latency.record("refined", (time.perf_counter() - started) * 1000)
         
         # Timestamp
         result.timestamp = datetime.utcnow().isoformat()
         
-        # Cache outcome (stateless, except for this latest-view requirement)
-        self._latest_analysis = result
+        self.publish(result)
+        if deferred and self.submit_reviews:
+            self.reviewer.submit(result, started)
         
         return result
 
-    def get_latest_analysis(self) -> Optional[AnalysisResponse]:
-        return self._latest_analysis
+    def request_review(self, result: AnalysisResponse):
+        """
+        Starts the deferred review of a pending result produced elsewhere
+        (batch process workers do not review). No-op if already under review.
+        """
+        if result.llm_status != LLMStatus.PENDING or not self.llm.is_available():
+            return
+        reviewed = self.analyses.get(result.analysis_id)
+        if reviewed is None or reviewed.llm_status == LLMStatus.PENDING:
+            self.reviewer.submit(result, time.perf_counter())
+
+    def _on_reviewed(self, result: AnalysisResponse, started: float):
+        if result.llm_status == LLMStatus.DONE:
+            self.latency.record("refined", (time.perf_counter() - started) * 1000)
+        self.analyses.put(result)
+        # Updates the pending entry in place; newer results stay the latest
+        self.signals.replace(result)
+        self.feed.broadcast(result)
+
+    def publish(self, result: AnalysisResponse):
+        """
+        Records a result for the latest-signal view (also used for results
+        computed outside this engine instance, e.g. by batch workers).
+        """
+        # Cache outcome (stateless, except for this latest-view requirement)
+        self.signals.put(result)
+        self.analyses.put(result)
+        self.feed.broadcast(result)
+
+    def get_analysis(self, analysis_id: str) -> Optional[AnalysisResponse]:
+        return self.analyses.get(analysis_id)
+
+    def get_latest_analysis(self, symbol: Optional[str] = None, timeframe: Optional[str] = None) -> Optional[AnalysisResponse]:
+        """Latest result for a symbol/timeframe, or overall when not given."""
+        return self.signals.latest(symbol, timeframe)
 
 # Global Instance
 engine = SignalEngine()
@@ -0,0 +1,140 @@
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.schemas import AnalysisResponse
+
+# Recent results kept per (symbol, timeframe)
+SIGNAL_HISTORY_SIZE = int(os.getenv("SIGNAL_HISTORY_SIZE", 100))
+# Keys kept at most; the least recently updated one is dropped beyond it
+SIGNAL_STORE_MAX_KEYS = int(os.getenv("SIGNAL_STORE_MAX_KEYS", 1000))
+
+SignalKey = Tuple[str, str]
+
+
+class SignalStore:
+    """
+    Thread-safe store of published results keyed by (symbol, timeframe).
+
+    Each key holds a fixed-size ring (deque) of its most recent results, so
+    inserting and reading the latest signal are O(1), and memory is bounded
+    by max_keys * history_size results. Symbols are matched case-insensitively.
+    """
+
+    def __init__(self, history_size: int = SIGNAL_HISTORY_SIZE, max_keys: int = SIGNAL_STORE_MAX_KEYS):
+        self.history_size = history_size
+        self.max_keys = max_keys
+        # Key -> newest-last ring; OrderedDict order = least recently updated first
+        self._series: "OrderedDict[SignalKey, Deque[AnalysisResponse]]" = OrderedDict()
+        # Symbol -> key it was last published under (for symbol-only lookups)
+        self._by_symbol: Dict[str, SignalKey] = {}
+        self._last: Optional[AnalysisResponse] = None
+        self._lock = threading.Lock()
+        self._evictions = 0
+
+    @staticmethod
+    def key(symbol: str, timeframe: str) -> SignalKey:
+        return (symbol.upper(), timeframe)
+
+    def put(self, result: AnalysisResponse):
+        """
+        Records a result as the latest for its key. Re-publishing the newest
+        entry (same analysis_id, e.g. a cache hit) replaces it instead of
+        adding a duplicate.
+        """
+        key = self.key(result.symbol, result.timeframe)
+        with self._lock:
+            ring = self._series.get(key)
+            if ring is None:
+                ring = self._series[key] = deque(maxlen=self.history_size)
+            else:
+                self._series.move_to_end(key)
+            if ring and result.analysis_id and ring[-1].analysis_id == result.analysis_id:
+                ring[-1] = result
+            else:
+                ring.append(result)
+            self._by_symbol[key[0]] = key
+            self._last = result
+            while len(self._series) > self.max_keys:
+                old_key, _ = self._series.popitem(last=False)
+                if self._by_symbol.get(old_key[0]) == old_key:
+                    del self._by_symbol[old_key[0]]
+                self._evictions += 1
+
+    def replace(self, result: AnalysisResponse) -> bool:
+        """
+        Swaps in an updated version of an already stored result (matched by
+        analysis_id, e.g. after its deferred LLM review). Nothing is added
+        if it has left the history; returns whether it was found.
+        """
+        if not result.analysis_id:
+            return False
+        key = self.key(result.symbol, result.timeframe)
+        with self._lock:
+            if self._last is not None and self._last.analysis_id == result.analysis_id:
+                self._last = result
+            ring = self._series.get(key)
+            if ring is None:
+                return False
+            # Newest first: the reviewed result is almost always the last one
+            for i in range(len(ring) - 1, -1, -1):
+                if ring[i].analysis_id == result.analysis_id:
+                    ring[i] = result
+                    return True
+        return False
+
+    def latest(self, symbol: Optional[str] = None, timeframe: Optional[str] = None) -> Optional[AnalysisResponse]:
+        """
+        Latest result for (symbol, timeframe); for a symbol on whichever
+        timeframe was published last; with no arguments, the last result overall.
+        """
+        with self._lock:
+            if symbol is None:
+                if timeframe is None:
+                    return self._last
+                # Scan newest-updated first for the timeframe
+                for (_, tf), ring in reversed(self._series.items()):
+                    if tf == timeframe:
+                        return ring[-1]
+                return None
+            key = self.key(symbol, timeframe) if timeframe is not None else self._by_symbol.get(symbol.upper())
+            ring = self._series.get(key) if key is not None else None
+            return ring[-1] if ring else None
+
+    def history(self, symbol: str, timeframe: str, limit: Optional[int] = None) -> List[AnalysisResponse]:
+        """Up to `limit` most recent results for a key, newest first."""
+        with self._lock:
+            ring = self._series.get(self.key(symbol, timeframe))
+            if not ring:
+                return []
+            items = list(ring)
+        items.reverse()
+        return items[:limit] if limit is not None else items
+
+    def snapshot(self, timeframe: Optional[str] = None) -> List[AnalysisResponse]:
+        """Latest result of every key (optionally one timeframe), most recently updated first."""
+        with self._lock:
+            latest = [ring[-1] for (_, tf), ring in self._series.items()
+                      if ring and (timeframe is None or tf == timeframe)]
+        latest.reverse()
+        return latest
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+            self._by_symbol.clear()
+            self._last = None
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            keys = len(self._series)
+            results = sum(len(ring) for ring in self._series.values())
+            evictions = self._evictions
+        return {
+            "keys": keys, "results": results, "evictions": evictions,
+            "history_size": self.history_size, "max_keys": self.max_keys,
+        }
@@ -0,0 +1,226 @@
+import math
+from typing import Iterable, Optional
+import numpy as np
+
+# Max absolute difference expected between a streaming kernel and the batch
+# function in indicators.py (relative to the magnitude of the values).
+STREAMING_TOLERANCE = 1e-9
+
+
+class RollingSum:
+    """
+    Fixed-window running sum backed by a circular buffer.
+    The sum is re-accumulated from the buffer once per wrap to bound float drift.
+    """
+    def __init__(self, period: int):
+        self.period = period
+        self._buf = np.zeros(period, dtype=np.float64)
+        self._pos = 0
+        self.count = 0
+        self.total = 0.0
+
+    def update(self, value: float) -> float:
+        old = self._buf[self._pos]
+        self._buf[self._pos] = value
+        self._pos += 1
+        if self._pos == self.period:
+            self._pos = 0
+            self.total = float(self._buf.sum())
+        else:
+            self.total += value - (old if self.count >= self.period else 0.0)
+        self.count += 1
+        return self.total
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.period
+
+
+class RollingSMA:
+    """
+    Streaming counterpart of `calculate_sma`. NaN until `period` values are seen.
+    """
+    def __init__(self, period: int):
+        self.period = period
+        self._sum = RollingSum(period)
+        self.value = math.nan
+
+    def update(self, value: float) -> float:
+        self._sum.update(value)
+        self.value = self._sum.total / self.period if self._sum.ready else math.nan
+        return self.value
+
+
+class RollingStd:
+    """
+    Streaming sample standard deviation over a fixed window (ddof=1, like
+    pandas `rolling().std()`), using Welford's update with window removal.
+    Mean and M2 are recomputed from the buffer once per wrap, like
+    `RollingSum`, so rounding error cannot build up over long sessions.
+    """
+    def __init__(self, period: int):
+        self.period = period
+        self._buf = np.zeros(period, dtype=np.float64)
+        self._pos = 0
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.value = math.nan
+
+    def update(self, value: float) -> float:
+        if self.count < self.period:
+            n = self.count + 1
+            delta = value - self._mean
+            self._mean += delta / n
+            self._m2 += delta * (value - self._mean)
+        else:
+            old = self._buf[self._pos]
+            new_mean = self._mean + (value - old) / self.period
+            self._m2 += (value - old) * (value - new_mean + old - self._mean)
+            self._mean = new_mean
+
+        self._buf[self._pos] = value
+        self._pos += 1
+        self.count += 1
+        if self._pos == self.period:
+            self._pos = 0
+            self._mean = float(self._buf.mean())
+            self._m2 = float(((self._buf - self._mean) ** 2).sum())
+
+        if self.count >= self.period and self.period > 1:
+            self.value = math.sqrt(max(self._m2, 0.0) / (self.period - 1))
+        else:
+            self.value = math.nan
+        return self.value
+
+
+class StreamingEMA:
+    """
+    Streaming counterpart of `calculate_ema` (span-based, adjust=False):
+    seeded with the first value, then e = a * x + (1 - a) * e.
+    """
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.count = 0
+        self.value = math.nan
+
+    def update(self, value: float) -> float:
+        if self.count == 0:
+            self.value = value
+        else:
+            self.value = self.alpha * value + (1.0 - self.alpha) * self.value
+        self.count += 1
+        return self.value
+
+
+class StreamingMACD:
+    """
+    Streaming counterpart of `calculate_macd`.
+    """
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self._fast = StreamingEMA(fast)
+        self._slow = StreamingEMA(slow)
+        self._signal = StreamingEMA(signal)
+        self.macd = math.nan
+        self.signal = math.nan
+        self.hist = math.nan
+
+    def update(self, value: float) -> float:
+        self.macd = self._fast.update(value) - self._slow.update(value)
+        self.signal = self._signal.update(self.macd)
+        self.hist = self.macd - self.signal
+        return self.macd
+
+
+class StreamingRSI:
+    """
+    Streaming counterpart of `calculate_rsi`.
+
+    Average gain/loss are simple rolling means over the last `period`
+    deltas (kept as rolling sums), exactly like the batch function. This is
+    not Wilder's smoothing; switching to it would break parity with
+    `calculate_rsi`.
+    The very first delta counts as zero and undefined values map to 50.
+    """
+    def __init__(self, period: int = 14):
+        self.period = period
+        self._gain = RollingSum(period)
+        self._loss = RollingSum(period)
+        self._prev: Optional[float] = None
+        self.value = 50.0
+
+    def update(self, value: float) -> float:
+        delta = 0.0 if self._prev is None else value - self._prev
+        self._prev = value
+        self._gain.update(delta if delta > 0 else 0.0)
+        self._loss.update(-delta if delta < 0 else 0.0)
+
+        if not self._gain.ready:
+            self.value = 50.0
+            return self.value
+
+        gain = self._gain.total / self.period
+        loss = self._loss.total / self.period
+        if loss == 0:
+            self.value = 100.0 if gain > 0 else 50.0
+        else:
+            self.value = 100 - (100 / (1 + gain / loss))
+        return self.value
+
+
+class StreamingATR:
+    """
+    Streaming counterpart of `calculate_atr` (rolling mean of the True Range).
+    """
+    def __init__(self, period: int = 14):
+        self.period = period
+        self._sma = RollingSMA(period)
+        self._prev_close: Optional[float] = None
+        self.value = math.nan
+
+    def update(self, high: float, low: float, close: float) -> float:
+        tr = high - low
+        if self._prev_close is not None:
+            tr = max(tr, abs(high - self._prev_close), abs(low - self._prev_close))
+        self._prev_close = close
+        self.value = self._sma.update(tr)
+        return self.value
+
+
+class IndicatorState:
+    """
+    Bundle of streaming kernels covering everything the built-in agents read.
+    Seed it once from history, then advance it one closed candle at a time.
+    """
+    def __init__(self):
+        self.count = 0
+        self.close = math.nan
+        self.sma_20 = RollingSMA(20)
+        self.sma_50 = RollingSMA(50)
+        self.sma_200 = RollingSMA(200)
+        self.std_20 = RollingStd(20)
+        self.rsi = StreamingRSI(14)
+        self.macd = StreamingMACD(12, 26, 9)
+        self.atr = StreamingATR(14)
+
+    def update(self, high: float, low: float, close: float) -> "IndicatorState":
+        self.sma_20.update(close)
+        self.sma_50.update(close)
+        self.sma_200.update(close)
+        self.std_20.update(close)
+        self.rsi.update(close)
+        self.macd.update(close)
+        self.atr.update(high, low, close)
+        self.close = close
+        self.count += 1
+        return self
+
+    def seed(self, highs: Iterable[float], lows: Iterable[float], closes: Iterable[float]) -> "IndicatorState":
+        for h, l, c in zip(highs, lows, closes):
+            self.update(float(h), float(l), float(c))
+        return self
+
+    @classmethod
+    def from_frame(cls, frame) -> "IndicatorState":
+        return cls().seed(frame.high.tolist(), frame.low.tolist(), frame.close.tolist())
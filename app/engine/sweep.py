@@ -0,0 +1,196 @@
+import inspect
+import itertools
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.engine.agents import TrendFollowingAgent, MomentumAgent, VolatilityAgent
+from app.engine.aggregator import SignalAggregator
+from app.engine.backtest import compute_stats
+from app.engine.frame import MarketFrame, COLUMNS
+
+SWEEP_WORKERS = int(os.environ.get("SWEEP_WORKERS", "0")) or (os.cpu_count() or 1)
+
+# Sweepable parameters are "<component>.<constructor argument>"; agents in
+# engine order, so every combination aggregates like the live engine
+AGENT_COMPONENTS = {
+    "trend": TrendFollowingAgent,
+    "momentum": MomentumAgent,
+    "volatility": VolatilityAgent,
+}
+COMPONENTS = dict(AGENT_COMPONENTS, aggregator=SignalAggregator)
+
+DEFAULT_GRID = {
+    "trend.min_separation": [0.01, 0.02, 0.03],
+    "momentum.rsi_oversold": [25, 30, 35],
+    "momentum.rsi_overbought": [65, 70, 75],
+    "volatility.knife_ratio": [0.05, 0.1, 0.2],
+    "aggregator.threshold": [0.3, 0.4, 0.5],
+}
+
+METRICS = ("total_return", "hit_rate", "max_drawdown", "avg_return_per_signal", "trades")
+
+Params = Dict[str, Dict[str, Any]]  # component -> constructor kwargs
+
+
+def parse_grid(specs: Sequence[str]) -> Dict[str, List[float]]:
+    """
+    Parses "component.param=v1,v2,..." specs, e.g. "aggregator.threshold=0.3,0.4".
+    Raises ValueError for unknown components or parameters.
+    """
+    grid = {}
+    for spec in specs:
+        name, sep, values = spec.partition("=")
+        if not sep or not values:
+            raise ValueError(f"Expected component.param=v1,v2,... got {spec!r}")
+        grid[name.strip()] = [float(v) for v in values.split(",")]
+    validate_grid(grid)
+    return grid
+
+
+def validate_grid(grid: Dict[str, Sequence[Any]]):
+    for name, values in grid.items():
+        component, _, param = name.partition(".")
+        if component not in COMPONENTS:
+            raise ValueError(f"Unknown component {component!r}, expected one of {', '.join(COMPONENTS)}")
+        if param not in inspect.signature(COMPONENTS[component]).parameters:
+            raise ValueError(f"{COMPONENTS[component].__name__} has no parameter {param!r}")
+        if not values:
+            raise ValueError(f"No values for {name}")
+
+
+def _split(combo: Dict[str, Any]) -> Params:
+    params: Params = {}
+    for name, value in combo.items():
+        component, _, param = name.partition(".")
+        params.setdefault(component, {})[param] = value
+    return params
+
+
+def _key(params: Dict[str, Any]) -> Tuple:
+    return tuple(sorted(params.items()))
+
+
+# -- worker side -----------------------------------------------------------
+# Each worker holds the frame (and so its memoized indicator graph) plus the
+# agent signal series it has computed, keyed by agent parameters: indicators
+# are computed once per worker, each agent series once per distinct setting.
+
+_FRAME: Optional[MarketFrame] = None
+_SERIES: Dict[Tuple, Tuple[np.ndarray, np.ndarray]] = {}
+
+
+def _init_worker(columns: Tuple[np.ndarray, ...]):
+    global _FRAME
+    _FRAME = MarketFrame(*columns)
+    _SERIES.clear()
+
+
+def _agent_series(component: str, params: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    key = (component, _key(params))
+    series = _SERIES.get(key)
+    if series is None:
+        series = _SERIES[key] = AGENT_COMPONENTS[component](**params).signal_series(_FRAME)
+    return series
+
+
+def _evaluate_group(task: Tuple[Params, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    One agent setting with every aggregator setting: the agents' series and
+    the consensus score are shared, only the thresholds are re-applied.
+    """
+    agent_params, aggregator_params = task
+    series = [_agent_series(component, agent_params.get(component, {})) for component in AGENT_COMPONENTS]
+    score = SignalAggregator().score_series(series)
+    results = []
+    for params in aggregator_params:
+        signal = SignalAggregator(**params).signal_from_score(score)
+        results.append(compute_stats(_FRAME.close, signal, {}).get("consensus", {}))
+    return results
+
+
+# -- driver ----------------------------------------------------------------
+
+class SweepResult:
+    """Every combination with its consensus backtest statistics, best first."""
+
+    def __init__(self, rows: List[Dict[str, Any]], parameters: List[str], sort: str, bars: int,
+                 groups: int, workers: int, elapsed: float):
+        self.rows = rows
+        self.parameters = parameters
+        self.sort = sort
+        self.bars = bars
+        self.groups = groups
+        self.workers = workers
+        self.elapsed = elapsed
+
+    def table(self, top: Optional[int] = None) -> str:
+        columns = ["rank"] + self.parameters + list(METRICS)
+        lines = []
+        for rank, row in enumerate(self.rows[:top], 1):
+            cells = [str(rank)]
+            for name in self.parameters + list(METRICS):
+                value = row.get(name)
+                cells.append("-" if value is None else f"{value:g}" if isinstance(value, (int, float)) else str(value))
+            lines.append(cells)
+        widths = [max(len(c), *(len(cells[i]) for cells in lines)) if lines else len(c) for i, c in enumerate(columns)]
+        header = "  ".join(c.rjust(w) for c, w in zip(columns, widths))
+        return "\n".join([header] + ["  ".join(c.rjust(w) for c, w in zip(cells, widths)) for cells in lines])
+
+
+def _rank_value(row: Dict[str, Any], sort: str) -> float:
+    value = row.get(sort)
+    return -math.inf if value is None else value
+
+
+def run_sweep(frame: MarketFrame, grid: Optional[Dict[str, Sequence[Any]]] = None, workers: int = SWEEP_WORKERS,
+              sort: str = "total_return") -> SweepResult:
+    """
+    Backtests every combination of `grid` (see DEFAULT_GRID) over `frame`
+    and ranks them by a consensus metric (highest first).
+
+    Combinations are grouped by their agent parameters; groups are spread
+    across a process pool (contiguous chunks, so a worker's groups mostly
+    share agent settings), and within a group only the aggregator
+    thresholds change. `workers=1` runs in this process.
+    """
+    grid = dict(DEFAULT_GRID if grid is None else grid)
+    validate_grid(grid)
+    if sort not in METRICS:
+        raise ValueError(f"Unknown metric {sort!r}, expected one of {', '.join(METRICS)}")
+    started = time.perf_counter()
+
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    groups: Dict[Tuple, Tuple[Params, List[Dict[str, Any]], List[Dict[str, Any]]]] = {}
+    for combo in combos:
+        params = _split(combo)
+        aggregator_params = params.pop("aggregator", {})
+        key = tuple((component, _key(params.get(component, {}))) for component in AGENT_COMPONENTS)
+        group = groups.setdefault(key, (params, [], []))
+        group[1].append(aggregator_params)
+        group[2].append(combo)
+
+    tasks = [(params, aggregator_params) for params, aggregator_params, _ in groups.values()]
+    columns = tuple(np.ascontiguousarray(getattr(frame, name)) for name in ("timestamp",) + COLUMNS)
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        _init_worker(columns)
+        outcomes = [_evaluate_group(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(columns,)) as pool:
+            chunksize = max(1, len(tasks) // (workers * 4))
+            outcomes = list(pool.map(_evaluate_group, tasks, chunksize=chunksize))
+
+    rows = []
+    for (_, _, group_combos), stats in zip(groups.values(), outcomes):
+        for combo, consensus in zip(group_combos, stats):
+            rows.append(dict(combo, **{metric: consensus.get(metric) for metric in METRICS}))
+    rows.sort(key=lambda row: _rank_value(row, sort), reverse=True)
+    return SweepResult(rows, names, sort, len(frame), len(tasks), workers, time.perf_counter() - started)
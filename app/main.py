@@ -1,6 +1,16 @@
+import asyncio
+import os
 from fastapi import FastAPI
 from app.api import router as api_router
 from app.utils.helpers import logger
+from app.engine.batch import batch_analyzer
+from app.engine.signal_engine import engine
+
+# Live pairs analyzed inside the API process, e.g. "BTCUSDT:1m,ETHUSDT:5m".
+# Results go straight to /signals/latest without an HTTP/JSON hop.
+LIVE_PAIRS = os.getenv("LIVE_PAIRS", "")
+# "rest" (fetch on candle close) or "ws" (combined-stream websockets)
+LIVE_SOURCE = os.getenv("LIVE_SOURCE", "rest")
 
 app = FastAPI(
     title="AI Trading Signal Engine",
@@ -10,9 +20,42 @@ app = FastAPI(
 
 app.include_router(api_router)
 
+_live = {}
+
+def _parse_live_pairs(value: str):
+    pairs = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        symbol, _, interval = item.partition(":")
+        pairs.append((symbol.upper(), interval or "1m"))
+    return pairs
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("AI Signal Engine starting up...")
+    pairs = _parse_live_pairs(LIVE_PAIRS)
+    if not pairs:
+        return
+
+    from market_data.live import LiveRunner, InProcessAnalyzer
+    logger.info(f"Hosting live analysis for {len(pairs)} pairs ({LIVE_SOURCE})")
+    if LIVE_SOURCE == "ws":
+        from market_data.ws_ingestor import WSIngestor, analyzer_callback
+        ingestor = WSIngestor(pairs, on_candle=analyzer_callback(InProcessAnalyzer()))
+        _live["ingestor"] = ingestor
+        await asyncio.to_thread(ingestor.start)
+    else:
+        runner = LiveRunner(pairs, analyzer=InProcessAnalyzer())
+        _live["task"] = asyncio.create_task(runner.run())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if "task" in _live:
+        _live["task"].cancel()
+    if "ingestor" in _live:
+        _live["ingestor"].stop()
+    batch_analyzer.shutdown()
+    engine.reviewer.shutdown()
+    engine.executor.shutdown()
 
 @app.get("/")
 def root():
@@ -8,6 +8,13 @@ class SignalType(str, Enum):
     SELL = "SELL"
     HOLD = "HOLD"
 
+class LLMStatus(str, Enum):
+    PENDING = "pending"    # Rule-based result; the LLM review is still running
+    DONE = "done"          # Refined by the LLM
+    TIMEOUT = "timeout"    # Review missed its deadline; rule-based result stands
+    FAILED = "failed"      # Review call failed; rule-based result stands
+    SKIPPED = "skipped"    # No LLM configured
+
 class Candle(BaseModel):
     timestamp: datetime
     open: float = Field(..., gt=0)
@@ -32,6 +39,20 @@ class AnalysisRequest(BaseModel):
     timeframe: str
     candles: List[Candle]
 
+class ColumnarAnalysisRequest(BaseModel):
+    """
+    Same data as AnalysisRequest as parallel arrays (one entry per candle).
+    Validated in vectorized form by MarketFrame.from_columns.
+    """
+    symbol: str
+    timeframe: str
+    timestamp: List[int]  # epoch ms
+    open: List[float]
+    high: List[float]
+    low: List[float]
+    close: List[float]
+    volume: List[float]
+
 class AnalysisResponse(BaseModel):
     signal: SignalType
     confidence: float
@@ -41,3 +62,58 @@ class AnalysisResponse(BaseModel):
     agent_signals: List[AgentSignal]
     indicators: Dict[str, Any]
     timestamp: str
+    analysis_id: Optional[str] = None
+    llm_status: Optional[LLMStatus] = None
+    # Execution details (per-agent status and timings)
+    metadata: Dict[str, Any] = {}
+
+class SignalHistoryResponse(BaseModel):
+    symbol: str
+    timeframe: str
+    count: int
+    signals: List[AnalysisResponse]  # Newest first
+
+class SignalSnapshotResponse(BaseModel):
+    count: int
+    signals: List[AnalysisResponse]  # Latest per symbol/timeframe
+
+class SessionResponse(BaseModel):
+    session_id: str
+    symbol: str
+    timeframe: str
+    candles: int
+    analysis: AnalysisResponse
+
+class BacktestRequest(BaseModel):
+    symbol: str
+    timeframe: str
+    start: Optional[int] = None  # epoch ms, inclusive
+    end: Optional[int] = None    # epoch ms, inclusive
+    include_series: bool = True
+
+class BacktestResponse(BaseModel):
+    symbol: str
+    timeframe: str
+    bars: int
+    stats: Dict[str, Any]
+    series: Optional[Dict[str, List[Any]]] = None
+
+class BatchAnalysisRequest(BaseModel):
+    # Items are validated one by one so a bad series fails only its own item
+    items: List[Dict[str, Any]]
+
+class BatchItemResult(BaseModel):
+    index: int
+    symbol: str
+    timeframe: str
+    result: Optional[AnalysisResponse] = None
+    error: Optional[str] = None
+    elapsed_ms: float
+
+class BatchAnalysisResponse(BaseModel):
+    results: List[BatchItemResult]
+    succeeded: int
+    failed: int
+    total_ms: float
+    executor: str
+    workers: int
@@ -0,0 +1,38 @@
+import argparse
+import csv
+import json
+from market_data.storage import load_candles
+from app.engine.frame import MarketFrame, parse_date_ms
+from app.engine.backtest import run_backtest
+from app.engine.signal_engine import engine
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the signal engine over stored history")
+    parser.add_argument("--symbol", type=str, required=True, help="Trading Pair (e.g., BTCUSDT)")
+    parser.add_argument("--interval", type=str, required=True, help="Timeframe (e.g., 1m, 5m, 1h)")
+    parser.add_argument("--start", type=str, default=None, help="Start date, ISO format, UTC unless an offset is given (e.g., 2024-01-01)")
+    parser.add_argument("--end", type=str, default=None, help="End date, ISO format, UTC unless an offset is given")
+    parser.add_argument("--output", type=str, default=None, help="Write the per-bar signal series to this CSV file")
+
+    args = parser.parse_args()
+
+    arrays = load_candles(args.symbol, args.interval, start=parse_date_ms(args.start),
+                          end=parse_date_ms(args.end), as_arrays=True)
+    if len(arrays['timestamp']) == 0:
+        print("No historical data found! Please run download_history.py first.")
+        return
+
+    print(f"--- Backtest: {args.symbol} [{args.interval}] over {len(arrays['timestamp'])} candles ---")
+    result = run_backtest(MarketFrame(**arrays), engine.agents, engine.aggregator)
+    print(json.dumps(result.stats, indent=2))
+
+    if args.output:
+        series = result.series()
+        with open(args.output, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(series.keys())
+            writer.writerows(zip(*series.values()))
+        print(f"Saved signal series to {args.output}")
+
+if __name__ == "__main__":
+    main()
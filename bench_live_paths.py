@@ -0,0 +1,76 @@
+import argparse
+import statistics
+import threading
+import time
+import numpy as np
+from app.engine.frame import MarketFrame
+from market_data.live import LivePair, SessionAnalyzer, InProcessAnalyzer
+from market_data.transport import default_transport
+
+def synthetic_candles(n, start_ts=1_700_000_000_000, step_ms=60_000, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.001, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.001, n))
+    volume = rng.uniform(1, 100, n)
+    ts = start_ts + step_ms * np.arange(n, dtype=np.int64)
+    return MarketFrame(ts, open_, high, low, close, volume).records()
+
+def start_local_api(port):
+    import uvicorn
+    from app.main import app
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    for _ in range(100):
+        try:
+            default_transport.get_json(f"http://127.0.0.1:{port}/health")
+            return f"http://127.0.0.1:{port}"
+        except Exception:
+            time.sleep(0.1)
+    raise RuntimeError("Local API did not start")
+
+def _measure(label, candles, window, closes, analyze_close):
+    """
+    Replays `closes` candle closes after a `window`-candle history and times
+    the analysis of each one (milliseconds).
+    """
+    pair = LivePair("BENCHUSDT", "1m")
+    for c in candles[:window]:
+        pair.ring.append(c["timestamp"], c["open"], c["high"], c["low"], c["close"], c["volume"])
+    analyze_close(pair, [])  # warm-up / session seed
+
+    timings = []
+    for c in candles[window:window + closes]:
+        pair.ring.append(c["timestamp"], c["open"], c["high"], c["low"], c["close"], c["volume"])
+        started = time.perf_counter()
+        analyze_close(pair, [c])
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    print(f"{label:<28} p50 {statistics.median(timings):8.3f} ms   "
+          f"p95 {timings[int(len(timings) * 0.95)]:8.3f} ms   mean {statistics.fmean(timings):8.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-close latency of the live analysis paths")
+    parser.add_argument("--window", type=int, default=1000, help="Candles of history per analysis")
+    parser.add_argument("--closes", type=int, default=200, help="Candle closes to replay per path")
+    parser.add_argument("--api-url", type=str, default=None, help="Running API to call (default: start one locally)")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the locally started API")
+    args = parser.parse_args()
+
+    api_url = args.api_url or start_local_api(args.port)
+    candles = synthetic_candles(args.window + args.closes)
+    print(f"--- {args.closes} closes, {args.window}-candle window, API at {api_url} ---")
+
+    # What run_live used to do: POST the whole window to /analyze on every close
+    def http_full(pair, new_candles):
+        return default_transport.post_json(f"{api_url}/analyze", {
+            "symbol": pair.symbol, "timeframe": pair.interval, "candles": pair.history
+        })
+
+    _measure("HTTP /analyze (full window)", candles, args.window, args.closes, http_full)
+    _measure("HTTP /sessions (append)", candles, args.window, args.closes, SessionAnalyzer(api_url).analyze)
+    _measure("In-process (streaming state)", candles, args.window, args.closes, InProcessAnalyzer().analyze)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mock_llm_server import start_mock_llm
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-item vs batched LLM reviews against the mock LLM server")
+    parser.add_argument("--symbols", type=int, default=32, help="Analyses reviewed at the same candle close")
+    parser.add_argument("--delay", type=float, default=0.5, help="Mock completion latency (seconds)")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Fraction of batch items the mock omits")
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    server, mock, base_url = start_mock_llm(delay=args.delay, drop_rate=args.drop_rate)
+    # Read by app.engine.llm at import time
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+    os.environ["OPENAI_BASE_URL"] = base_url
+
+    from app.engine.frame import MarketFrame
+    from app.engine.llm import LLMReasoner, BatchLLMReviewer
+    from app.engine.signal_engine import SignalEngine
+    from bench_live_paths import synthetic_candles
+
+    # Rule-based analyses of different symbols (the LLM is not involved yet)
+    rule_engine = SignalEngine()
+    rule_engine.llm.client = None
+    analyses = [
+        rule_engine.analyze_frame(MarketFrame.from_records(synthetic_candles(400, seed=i)), f"SYM{i}USDT", "1m")
+        for i in range(args.symbols)
+    ]
+    print(f"--- {args.symbols} reviews, mock latency {args.delay}s, drop rate {args.drop_rate} ---")
+
+    for label, batch_size in (("per-item", 1), (f"batched ({args.batch_size})", args.batch_size)):
+        reviewer = BatchLLMReviewer(LLMReasoner(cache_ttl=0), max_items=batch_size)
+        before = dict(mock.stats)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.symbols) as pool:
+            verdicts = list(pool.map(reviewer.review, analyses))
+        elapsed = time.perf_counter() - started
+        requests = mock.stats["requests"] - before["requests"]
+        chars = mock.stats["prompt_chars"] - before["prompt_chars"]
+        print(f"{label:<14} {requests:4d} requests   {chars / 1000:8.1f}k prompt chars   "
+              f"{elapsed:6.2f} s   {sum(v is not None for v in verdicts)}/{len(verdicts)} verdicts   "
+              f"fallbacks {reviewer.stats()['fallbacks']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import statistics
+import time
+from app.utils.fastjson import dumps, orjson
+from bench_live_paths import synthetic_candles, start_local_api
+from market_data.transport import default_transport
+
+def _time_post(url, body, repeats):
+    headers = {"Content-Type": "application/json"}
+    default_transport.request("POST", url, data=body, headers=headers)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        default_transport.request("POST", url, data=body, headers=headers)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the row and columnar /analyze request formats")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 1000, 10000], help="Candles per request")
+    parser.add_argument("--repeats", type=int, default=30, help="Requests per size and format")
+    parser.add_argument("--api-url", type=str, default=None, help="Running API to call (default: start one locally)")
+    parser.add_argument("--port", type=int, default=8766, help="Port for the locally started API")
+    args = parser.parse_args()
+
+    api_url = args.api_url or start_local_api(args.port)
+    print(f"--- /analyze row vs columnar, median of {args.repeats} requests, "
+          f"JSON via {'orjson' if orjson else 'stdlib json'} ---")
+    print(f"{'candles':>8} {'row ms':>10} {'columnar ms':>12} {'speedup':>8} {'row KB':>8} {'col KB':>8}")
+    for n in args.sizes:
+        rows = synthetic_candles(n)
+        row_body = dumps({"symbol": "BENCHUSDT", "timeframe": "1m", "candles": rows})
+        columns = {"symbol": "BENCHUSDT", "timeframe": "1m"}
+        for name in ("timestamp", "open", "high", "low", "close", "volume"):
+            columns[name] = [r[name] for r in rows]
+        col_body = dumps(columns)
+
+        # Bodies are encoded once, so only the server side differs
+        row_ms = _time_post(f"{api_url}/analyze", row_body, args.repeats)
+        col_ms = _time_post(f"{api_url}/analyze/columnar", col_body, args.repeats)
+        print(f"{n:>8} {row_ms:>10.2f} {col_ms:>12.2f} {row_ms / col_ms:>7.1f}x "
+              f"{len(row_body) / 1024:>8.0f} {len(col_body) / 1024:>8.0f}")
+
+if __name__ == "__main__":
+    main()
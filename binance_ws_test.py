@@ -1,8 +1,8 @@
 import json
-import requests
 import websocket
 import datetime
 import sys
+from market_data.transport import default_transport, HTTPError
 
 # Configuration
 SYMBOL_LOWER = "btcusdt"
@@ -10,11 +10,13 @@ SYMBOL_UPPER = "BTCUSDT"
 INTERVAL = "5m"
 LIMIT = 220
 API_URL = "http://127.0.0.1:8000/analyze"
+SESSIONS_URL = "http://127.0.0.1:8000/sessions"
 BINANCE_REST_URL = "https://api.binance.com/api/v3/klines"
 BINANCE_WS_URL = f"wss://stream.binance.com:9443/ws/{SYMBOL_LOWER}@kline_{INTERVAL}"
 
-# Global buffer for candles
+# Global buffer for candles (kept to re-seed the session if the server drops it)
 candles_buffer = []
+session_id = None
 
 def parse_rest_candle(c):
     # Binance REST format: [Open time, Open, High, Low, Close, Volume, Close time, ...]
@@ -35,9 +37,7 @@ def fetch_rest_history():
         "limit": LIMIT
     }
     try:
-        resp = requests.get(BINANCE_REST_URL, params=params)
-        resp.raise_for_status()
-        data = resp.json()
+        data = default_transport.get_json(BINANCE_REST_URL, params=params)
         chk = [parse_rest_candle(c) for c in data]
         print(f"Loaded {len(chk)} candles.")
         return chk
@@ -45,17 +45,36 @@ def fetch_rest_history():
         print(f"Error fetching REST data: {e}")
         sys.exit(1)
 
-def send_to_ai(candles):
+def open_session(candles):
+    """
+    Seeds a server-side analysis session once; later closes send one candle each.
+    """
+    global session_id
     payload = {
         "symbol": f"{SYMBOL_UPPER} (Binance Live)",
         "timeframe": INTERVAL,
         "candles": candles
     }
     try:
-        resp = requests.post(API_URL, json=payload)
-        resp.raise_for_status()
-        result = resp.json()
-        return result
+        result = default_transport.post_json(SESSIONS_URL, payload)
+        session_id = result["session_id"]
+        return result["analysis"]
+    except Exception as e:
+        print(f"AI Engine Session Failed: {e}")
+        session_id = None
+        return None
+
+def send_candle_to_ai(candle):
+    if session_id is None:
+        return open_session(candles_buffer)
+    try:
+        return default_transport.post_json(f"{SESSIONS_URL}/{session_id}/candles", candle)
+    except HTTPError as e:
+        if e.code == 404:
+            # Session expired on the server: re-seed with the local buffer
+            return open_session(candles_buffer)
+        print(f"AI Engine Request Failed: {e}")
+        return None
     except Exception as e:
         print(f"AI Engine Request Failed: {e}")
         return None
@@ -84,8 +103,8 @@ def on_message(ws, message):
         candles_buffer.pop(0)
         candles_buffer.append(new_candle)
         
-        # Analyze
-        result = send_to_ai(candles_buffer)
+        # Analyze (only the new candle goes over the wire)
+        result = send_candle_to_ai(new_candle)
         if result:
             print(f"Candle Closed: {closed_price} -> AI Signal: {result.get('signal')} ({result.get('confidence')})")
         else:
@@ -107,9 +126,9 @@ def main():
     # 1. Bootstrap via REST
     candles_buffer = fetch_rest_history()
     
-    # 2. Initial Analysis
+    # 2. Initial Analysis (opens the session)
     print("Running initial analysis...")
-    result = send_to_ai(candles_buffer)
+    result = open_session(candles_buffer)
     if result:
         print(f"Initial State -> AI Signal: {result.get('signal')} ({result.get('confidence')})")
     
@@ -1,36 +1,42 @@
 import argparse
 import time
 from datetime import datetime, timedelta
-from market_data.client import fetch_historical_data
-from market_data.storage import save_candles
+from market_data.config import BINANCE_BASE_URL
+from market_data.downloader import download_history, DEFAULT_WEIGHT_PER_MINUTE
 
 def main():
     parser = argparse.ArgumentParser(description="Download Historical Data from Binance")
-    parser.add_argument("--symbol", type=str, required=True, help="Trading Pair (e.g., BTCUSDT)")
-    parser.add_argument("--interval", type=str, required=True, help="Timeframe (e.g., 1m, 5m, 1h)")
+    parser.add_argument("--symbol", type=str, nargs="+", required=True, help="Trading Pair(s) (e.g., BTCUSDT ETHUSDT)")
+    parser.add_argument("--interval", type=str, nargs="+", required=True, help="Timeframe(s) (e.g., 1m 5m 1h)")
     parser.add_argument("--days", type=int, default=365, help="Number of days of history to download")
-    
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent page requests")
+    parser.add_argument("--weight-budget", type=float, default=DEFAULT_WEIGHT_PER_MINUTE,
+                        help="Binance request weight allowed per minute")
+    parser.add_argument("--base-url", type=str, default=BINANCE_BASE_URL, help="Klines API base URL")
+
     args = parser.parse_args()
-    
-    symbol = args.symbol
-    interval = args.interval
-    days = args.days
-    
-    print(f"--- Starting Download: {symbol} [{interval}] for {days} days ---")
-    
+
+    print(f"--- Starting Download: {', '.join(args.symbol)} [{', '.join(args.interval)}] for {args.days} days ---")
+
     end_time = int(time.time() * 1000)
-    start_time = int((datetime.now() - timedelta(days=days)).timestamp() * 1000)
-    
+    start_time = int((datetime.now() - timedelta(days=args.days)).timestamp() * 1000)
+
     print(f"Time Range: {datetime.fromtimestamp(start_time/1000)} to {datetime.fromtimestamp(end_time/1000)}")
-    
-    candles = fetch_historical_data(symbol, interval, start_time, end_time)
-    
-    if candles:
-        print(f"Downloaded {len(candles)} candles.")
-        save_candles(symbol, interval, candles, append=False)
-        print(f"Saved to data/{symbol}/{interval}.json")
-    else:
-        print("No data downloaded.")
+
+    started = time.perf_counter()
+    jobs = download_history(args.symbol, args.interval, start_time, end_time,
+                            workers=args.workers, weight_per_minute=args.weight_budget,
+                            base_url=args.base_url)
+
+    for job in jobs:
+        if job.error:
+            print(f"{job.symbol} [{job.interval}]: stopped after {job.candles} new candles: {job.error}")
+            print("  Re-run the same command to resume.")
+        elif job.windows:
+            print(f"{job.symbol} [{job.interval}]: downloaded {job.candles} candles -> data/{job.symbol}/{job.interval}/")
+        else:
+            print(f"{job.symbol} [{job.interval}]: already up to date.")
+    print(f"Finished in {time.perf_counter() - started:.1f}s")
 
 if __name__ == "__main__":
     main()
@@ -1,14 +1,43 @@
-import urllib.request
-import json
 import time
-import urllib.parse
 from datetime import datetime
 from typing import List, Dict, Optional, Any
 from market_data.config import BINANCE_BASE_URL, BINANCE_INTERVALS
+from market_data.transport import default_transport, HTTPTransport
+
+def parse_kline(kline: List[Any]) -> Dict[str, Any]:
+    # Binance kline format: 
+    # [0: Open Time, 1: Open, 2: High, 3: Low, 4: Close, 5: Volume, ...]
+    return {
+        "timestamp": int(kline[0]),
+        "open": float(kline[1]),
+        "high": float(kline[2]),
+        "low": float(kline[3]),
+        "close": float(kline[4]),
+        "volume": float(kline[5])
+    }
+
+def fetch_klines(symbol: str, interval: str, start_time: int, end_time: int, limit: int = 1000,
+                 base_url: str = BINANCE_BASE_URL, transport: Optional[HTTPTransport] = None,
+                 retries: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Fetches a single page of klines over the shared pooled transport.
+    `interval` is a Binance interval.
+    Raises transport.HTTPError / TransportError once retries are exhausted.
+    """
+    params = {
+        "symbol": symbol,
+        "interval": interval,
+        "startTime": start_time,
+        "endTime": end_time,
+        "limit": limit
+    }
+    data = (transport or default_transport).get_json(f"{base_url}/klines", params=params, retries=retries)
+    return [parse_kline(k) for k in data]
 
 def fetch_historical_data(symbol: str, interval: str, start_time: int, end_time: int) -> List[Dict[str, Any]]:
     """
-    Fetches historical kline data from Binance using urllib.
+    Fetches historical kline data from Binance, one page at a time.
+    (See market_data.downloader for the concurrent, resumable version.)
     
     Args:
         symbol: e.g., "BTCUSDT"
@@ -33,47 +62,24 @@ def fetch_historical_data(symbol: str, interval: str, start_time: int, end_time:
         # Calculate safe end time for this chunk to avoid over-fetching usually handled by limit, 
         # but we use limit=1000 so we just request from current_start
         
-        params = {
-            "symbol": symbol,
-            "interval": binance_interval,
-            "startTime": current_start,
-            "endTime": end_time,
-            "limit": limit
-        }
-        
-        query_string = urllib.parse.urlencode(params)
-        url = f"{BINANCE_BASE_URL}/klines?{query_string}"
-        
         try:
-            with urllib.request.urlopen(url) as response:
-                data = json.loads(response.read().decode())
-                
-                if not data:
-                    break
-                    
-                for kline in data:
-                    # Binance kline format: 
-                    # [0: Open Time, 1: Open, 2: High, 3: Low, 4: Close, 5: Volume, ...]
-                    candle = {
-                        "timestamp": int(kline[0]),
-                        "open": float(kline[1]),
-                        "high": float(kline[2]),
-                        "low": float(kline[3]),
-                        "close": float(kline[4]),
-                        "volume": float(kline[5])
-                    }
-                    all_candles.append(candle)
+            data = fetch_klines(symbol, binance_interval, current_start, end_time, limit=limit)
                 
-                # Update current_start to the last timestamp + 1ms to avoid duplicates
-                last_timestamp = all_candles[-1]["timestamp"]
-                current_start = last_timestamp + 1
+            if not data:
+                break
                 
-                # Rate limit safety
-                time.sleep(0.5)
+            all_candles.extend(data)
+            
+            # Update current_start to the last timestamp + 1ms to avoid duplicates
+            last_timestamp = all_candles[-1]["timestamp"]
+            current_start = last_timestamp + 1
+            
+            # Rate limit safety
+            time.sleep(0.5)
                 
         except Exception as e:
-            print(f"Error fetching data: {e}. Retrying in 2 seconds...")
-            time.sleep(2)
-            continue
+            # The transport already retried with backoff; give up on this range
+            print(f"Error fetching data: {e}. Returning {len(all_candles)} candles fetched so far.")
+            break
             
     return all_candles
@@ -48,3 +48,7 @@ def get_data_path(symbol: str, interval: str) -> str:
     if not os.path.exists(symbol_dir):
         os.makedirs(symbol_dir)
     return os.path.join(symbol_dir, f"{interval}.json")
+
+def get_store_path(symbol: str, interval: str) -> str:
+    """Returns the directory holding the binary column files for a given symbol and interval."""
+    return os.path.join(DATA_DIR, symbol, interval)
@@ -0,0 +1,217 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from market_data.config import BINANCE_BASE_URL, BINANCE_INTERVALS, TIMEFRAMES
+from market_data.client import fetch_klines
+from market_data.transport import HTTPError, TransportError
+from market_data.storage import save_candles, load_arrays
+
+PAGE_LIMIT = 1000
+# Binance allows 6000 weight/minute per IP; stay well below it by default
+DEFAULT_WEIGHT_PER_MINUTE = 1200
+MAX_RETRIES = 5
+# Pages that land before the stored tail need a merge-rewrite of the store;
+# they are batched so a long backfill rewrites it once per this many candles
+BACKFILL_BATCH = 100_000
+
+
+def klines_weight(limit: int) -> int:
+    """Request weight of one klines call for a given `limit` (Binance REST docs)."""
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `acquire(weight)` blocks until enough budget
+    has refilled. Capacity doubles as the allowed burst.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, weight: float = 1.0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_second)
+                self._updated = now
+                if self._tokens >= weight:
+                    self._tokens -= weight
+                    return
+                wait = (weight - self._tokens) / self.refill_per_second
+            time.sleep(wait)
+
+    def penalize(self, seconds: float):
+        """Drains the bucket so nobody sends for `seconds` (e.g. after HTTP 429)."""
+        with self._lock:
+            self._tokens = -seconds * self.refill_per_second
+            self._updated = time.monotonic()
+
+
+class _Job:
+    """
+    One symbol/interval download. Pages finish out of order but are committed
+    to the store strictly in window order. Pages after the stored tail are
+    appended; earlier ones (backfill, interior gaps) are merged in batches of
+    BACKFILL_BATCH candles. Call `flush()` once the job stops.
+    """
+
+    def __init__(self, symbol: str, interval: str, windows: List[Tuple[int, int]],
+                 stored_tail: Optional[int] = None):
+        self.symbol = symbol
+        self.interval = interval
+        self.windows = windows
+        self.candles = 0
+        self.error: Optional[str] = None
+        self._stored_tail = stored_tail
+        self._backfill: List[Dict[str, Any]] = []
+        self._pending: Dict[int, List[Dict[str, Any]]] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def complete(self, index: int, candles: List[Dict[str, Any]]):
+        with self._lock:
+            self._pending[index] = candles
+            while self._next in self._pending:
+                page = self._pending.pop(self._next)
+                if page and self._stored_tail is not None and page[0]["timestamp"] < self._stored_tail:
+                    self._backfill.extend(page)
+                    if len(self._backfill) >= BACKFILL_BATCH:
+                        self._flush_backfill()
+                elif page:
+                    self._flush_backfill()
+                    save_candles(self.symbol, self.interval, page, append=True)
+                    self.candles += len(page)
+                self._next += 1
+
+    def flush(self):
+        with self._lock:
+            self._flush_backfill()
+
+    def _flush_backfill(self):
+        if self._backfill:
+            save_candles(self.symbol, self.interval, self._backfill, append=True)
+            self.candles += len(self._backfill)
+            self._backfill = []
+
+    @property
+    def done(self) -> bool:
+        return self._next == len(self.windows)
+
+
+def missing_ranges(timestamps: np.ndarray, start_time: int, end_time: int, step: int) -> List[Tuple[int, int]]:
+    """
+    Half-open [start, end) ranges of [start_time, end_time) not covered by the
+    sorted stored `timestamps`: before the stored head, interior gaps longer
+    than one candle, and after the stored tail.
+    """
+    if len(timestamps) == 0:
+        return [(start_time, end_time)] if start_time < end_time else []
+    ts = np.asarray(timestamps, dtype=np.int64)
+    ranges = []
+    if ts[0] - start_time >= step:
+        ranges.append((start_time, int(ts[0])))
+    gaps = np.flatnonzero(np.diff(ts) > step)
+    ranges.extend((int(ts[i]) + step, int(ts[i + 1])) for i in gaps)
+    if ts[-1] + step < end_time:
+        ranges.append((int(ts[-1]) + step, end_time))
+    return ranges
+
+
+def plan_windows(symbol: str, interval: str, start_time: int, end_time: int) -> List[Tuple[int, int]]:
+    """
+    Splits the parts of [start_time, end_time) the store does not hold into
+    one-page windows, oldest first. Re-running after an interrupted run, with
+    an earlier --start, or after a gap fetches only what is missing. Gaps the
+    exchange itself has (maintenance) come back empty and are re-checked on
+    every run, one page each.
+    """
+    step = TIMEFRAMES[interval] * 60_000
+    stored = load_arrays(symbol, interval, start=start_time, end=end_time - 1)["timestamp"]
+    page = step * PAGE_LIMIT
+    return [
+        (s, min(s + page, end) - 1)
+        for start, end in missing_ranges(stored, start_time, end_time, step)
+        for s in range(start, end, page)
+    ]
+
+
+def _stored_tail(symbol: str, interval: str) -> Optional[int]:
+    tail = load_arrays(symbol, interval, last_n=1)["timestamp"]
+    return int(tail[-1]) if len(tail) else None
+
+
+def _fetch_page(job: _Job, window: Tuple[int, int], bucket: TokenBucket, base_url: str) -> List[Dict[str, Any]]:
+    delay = 1.0
+    for attempt in range(MAX_RETRIES):
+        bucket.acquire(klines_weight(PAGE_LIMIT))
+        try:
+            # Retries are driven from here so every attempt goes through the budget
+            return fetch_klines(job.symbol, BINANCE_INTERVALS[job.interval], window[0], window[1],
+                                limit=PAGE_LIMIT, base_url=base_url, retries=0)
+        except HTTPError as e:
+            if e.code in (429, 418):
+                # Rate limited: back off everyone, as long as the server asks
+                retry_after = float(e.headers.get("Retry-After") or delay)
+                bucket.penalize(retry_after)
+            elif 400 <= e.code < 500:
+                raise
+        except (TransportError, ValueError):
+            pass
+        time.sleep(delay)
+        delay = min(delay * 2, 30.0)
+    raise RuntimeError(f"{job.symbol} [{job.interval}] window {window}: gave up after {MAX_RETRIES} attempts")
+
+
+def download_history(symbols: Sequence[str], intervals: Sequence[str], start_time: int, end_time: int,
+                     workers: int = 8, weight_per_minute: float = DEFAULT_WEIGHT_PER_MINUTE,
+                     base_url: str = BINANCE_BASE_URL) -> List[_Job]:
+    """
+    Downloads klines for every symbol/interval pair concurrently under a shared
+    request-weight budget, checkpointing pages to the store as they arrive.
+    Re-running the same command resumes where the previous run stopped.
+    """
+    bucket = TokenBucket(capacity=weight_per_minute / 6, refill_per_second=weight_per_minute / 60)
+    jobs = []
+    for symbol in symbols:
+        for interval in intervals:
+            if interval not in BINANCE_INTERVALS:
+                print(f"Warning: Interval {interval} not directly supported by Binance. Skipping fetch "
+                      f"(build it from 1m candles: python resample_history.py --symbol {symbol} --interval {interval}).")
+                continue
+            jobs.append(_Job(symbol, interval, plan_windows(symbol, interval, start_time, end_time),
+                             stored_tail=_stored_tail(symbol, interval)))
+
+    def run(job: _Job, index: int):
+        if job.error:
+            return  # An earlier page failed; later pages could not be committed anyway
+        try:
+            job.complete(index, _fetch_page(job, job.windows[index], bucket, base_url))
+        except Exception as e:
+            job.error = str(e)
+
+    # Interleave jobs so every pair makes progress from the start
+    tasks = []
+    longest = max((len(job.windows) for job in jobs), default=0)
+    for index in range(longest):
+        tasks.extend((job, index) for job in jobs if index < len(job.windows))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for job, index in tasks:
+            pool.submit(run, job, index)
+
+    for job in jobs:
+        job.flush()
+    return jobs
@@ -0,0 +1,288 @@
+import asyncio
+import functools
+import heapq
+import time
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Sequence, Tuple
+from market_data.config import BINANCE_BASE_URL, BINANCE_INTERVALS, TIMEFRAMES
+from market_data.client import parse_kline
+from market_data.downloader import TokenBucket, klines_weight
+from market_data.process import validate_minimum_candles
+from market_data.storage import load_arrays, save_candles
+from app.engine.frame import CandleRing, MarketFrame
+from app.engine.streaming import IndicatorState
+from market_data.transport import default_transport, HTTPError, HTTPTransport
+
+if TYPE_CHECKING:
+    from app.engine.signal_engine import SignalEngine
+
+# Candles kept in memory per pair and used to seed the analysis session
+HISTORY_WINDOW = 1000
+# How long after the scheduled close to fetch (lets the exchange finalize the candle)
+CLOSE_DELAY_MS = 150
+# Retry cadence while the exchange has not published the closed candle yet
+LATE_RETRY_MS = 200
+LATE_RETRY_LIMIT = 25
+# Re-measure the exchange clock offset this often
+CLOCK_SYNC_SECONDS = 600
+# Request weight budget; live fetches are tiny (weight 1), so hundreds of
+# pairs closing together fit in one burst of half the per-minute budget
+LIVE_WEIGHT_PER_MINUTE = 4800
+
+API_BASE_URL = "http://localhost:8000"
+
+
+class LivePair:
+    def __init__(self, symbol: str, interval: str):
+        if interval not in BINANCE_INTERVALS:
+            raise ValueError(f"Interval {interval} is not served by Binance")
+        self.symbol = symbol
+        self.interval = interval
+        self.step_ms = TIMEFRAMES[interval] * 60_000
+        self.ring = CandleRing(HISTORY_WINDOW)
+        self.last_ts: Optional[int] = None
+        self.session_id: Optional[str] = None
+
+    @property
+    def history(self) -> List[Dict[str, Any]]:
+        """Ring contents as candle dicts (used to seed an analysis session)."""
+        return self.ring.frame().records()
+
+    def __repr__(self) -> str:
+        return f"{self.symbol} [{self.interval}]"
+
+
+class SessionAnalyzer:
+    """
+    Sends closed candles to the API's append-only session endpoints.
+    Seeds a session on first use and re-seeds when the server answers 404.
+    """
+
+    def __init__(self, api_base_url: str = API_BASE_URL, transport: HTTPTransport = default_transport):
+        self.sessions_url = f"{api_base_url}/sessions"
+        self.transport = transport
+
+    def _seed(self, pair: LivePair) -> Optional[Dict[str, Any]]:
+        result = self.transport.post_json(self.sessions_url, {
+            "symbol": pair.symbol, "timeframe": pair.interval, "candles": pair.history
+        })
+        pair.session_id = result["session_id"]
+        return result["analysis"]
+
+    def analyze(self, pair: LivePair, new_candles: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if pair.session_id is None:
+            return self._seed(pair)  # The seed already contains the new candles
+        result = None
+        for candle in new_candles:
+            try:
+                result = self.transport.post_json(f"{self.sessions_url}/{pair.session_id}/candles", candle)
+            except HTTPError as e:
+                if e.code != 404:
+                    raise
+                return self._seed(pair)  # Expired on the server
+        return result
+
+
+class InProcessAnalyzer:
+    """
+    Runs the SignalEngine in this process: no JSON, HTTP or pydantic
+    validation between the candle and the signal. Keeps streaming indicator
+    state per pair (like an API session) and reads the pair's ring as the
+    window. Results land in this process's latest-signal view (the API's,
+    when the runner is hosted by the API; see LIVE_PAIRS in app/main.py).
+    `engine` defaults to the API's global engine, imported only here so the
+    HTTP paths never build it.
+    """
+
+    def __init__(self, engine: Optional["SignalEngine"] = None, window: Optional[int] = None):
+        if engine is None:
+            from app.engine.signal_engine import engine
+        self.engine = engine
+        self.window = window
+        self._states: Dict[Tuple[str, str], Tuple[IndicatorState, int]] = {}
+
+    def analyze(self, pair, new_candles: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        # The new candles are already in `pair.ring`; advance the state by
+        # whatever the ring holds past the last analyzed candle
+        frame = pair.ring.frame(self.window)
+        key = (pair.symbol, pair.interval)
+        state, last_ts = self._states.get(key, (None, None))
+        start = 0 if last_ts is None else int(np.searchsorted(frame.timestamp, last_ts, side="right"))
+        if state is None or start == 0:
+            state = IndicatorState.from_frame(frame)
+        else:
+            state.seed(frame.high[start:].tolist(), frame.low[start:].tolist(), frame.close[start:].tolist())
+        self._states[key] = (state, int(frame.timestamp[-1]))
+        result = self.engine.analyze_state(state, frame, pair.symbol, pair.interval).dict()
+        result["signal"] = result["signal"].value  # same shape as the API's JSON
+        return result
+
+
+class LiveRunner:
+    """
+    Tracks many symbol/interval pairs in one asyncio process.
+
+    Each fetch is scheduled from the pair's known close time (interval
+    boundary on the exchange clock + CLOSE_DELAY_MS) instead of a fixed poll,
+    and every pair closing at the same instant is fetched and analyzed
+    concurrently.
+    """
+
+    def __init__(self, pairs: Sequence[Tuple[str, str]], analyzer=None, base_url: str = BINANCE_BASE_URL,
+                 transport: HTTPTransport = default_transport, max_concurrency: int = 32,
+                 weight_per_minute: float = LIVE_WEIGHT_PER_MINUTE):
+        self.pairs = [LivePair(symbol, interval) for symbol, interval in pairs]
+        self.analyzer = analyzer or SessionAnalyzer(transport=transport)
+        self.base_url = base_url
+        self.transport = transport
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(capacity=weight_per_minute / 2, refill_per_second=weight_per_minute / 60)
+        self.clock_offset_ms = 0.0
+        self.latencies_ms: Deque[float] = deque(maxlen=10_000)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # Private pool: the runner may share its event loop with the API server
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    # -- clock -----------------------------------------------------------
+
+    def server_now_ms(self) -> float:
+        return time.time() * 1000 + self.clock_offset_ms
+
+    def _sync_clock(self):
+        sent = time.time() * 1000
+        server_time = self.transport.get_json(f"{self.base_url}/time")["serverTime"]
+        received = time.time() * 1000
+        self.clock_offset_ms = server_time - (sent + received) / 2
+
+    def next_due(self, pair: LivePair) -> float:
+        """Local wall-clock time (ms) at which the current candle of `pair` has closed."""
+        boundary = (self.server_now_ms() // pair.step_ms + 1) * pair.step_ms
+        return boundary + CLOSE_DELAY_MS - self.clock_offset_ms
+
+    # -- per pair work (runs in worker threads) --------------------------
+
+    def _bootstrap(self, pair: LivePair):
+        arrays = load_arrays(pair.symbol, pair.interval, last_n=HISTORY_WINDOW)
+        if len(arrays["timestamp"]):
+            pair.ring.extend(MarketFrame(**arrays))
+            pair.last_ts = pair.ring.last_timestamp
+        else:
+            print(f"{pair}: no historical data found, run download_history.py first.")
+
+    def _fetch_closed(self, pair: LivePair) -> List[Dict[str, Any]]:
+        """
+        Returns the candles closed since `pair.last_ts` (normally exactly one;
+        more after a stall, which also fills the gap).
+        """
+        params = {"symbol": pair.symbol, "interval": BINANCE_INTERVALS[pair.interval], "limit": 2}
+        if pair.last_ts is not None:
+            missing = int((self.server_now_ms() - pair.last_ts) // pair.step_ms)
+            params["startTime"] = pair.last_ts + pair.step_ms
+            params["limit"] = max(2, min(1000, missing + 1))
+
+        self.bucket.acquire(klines_weight(params["limit"]))
+        data = self.transport.get_json(f"{self.base_url}/klines", params=params)
+        now = self.server_now_ms()
+        # Index 6 is the close time; the still-open candle is dropped
+        return [parse_kline(k) for k in data if int(k[6]) < now
+                and (pair.last_ts is None or int(k[0]) > pair.last_ts)]
+
+    def _process(self, pair: LivePair, closed: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        save_candles(pair.symbol, pair.interval, closed, append=True)
+        for c in closed:
+            pair.ring.append(c["timestamp"], c["open"], c["high"], c["low"], c["close"], c["volume"])
+        pair.last_ts = closed[-1]["timestamp"]
+        if not validate_minimum_candles(pair.ring.frame().timestamp, pair.interval):
+            return None
+        return self.analyzer.analyze(pair, closed)
+
+    # -- scheduling ------------------------------------------------------
+
+    def _in_thread(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def _handle(self, pair: LivePair):
+        async with self._semaphore:
+            for _ in range(LATE_RETRY_LIMIT):
+                try:
+                    closed = await self._in_thread(self._fetch_closed, pair)
+                except Exception as e:
+                    print(f"{pair}: fetch failed: {e}")
+                    closed = []
+                if closed:
+                    break
+                await asyncio.sleep(LATE_RETRY_MS / 1000)
+            else:
+                print(f"{pair}: closed candle not published yet, will catch up next close")
+                return
+
+            try:
+                result = await self._in_thread(self._process, pair, closed)
+            except Exception as e:
+                print(f"{pair}: analysis failed: {e}")
+                return
+
+        close_time = closed[-1]["timestamp"] + pair.step_ms
+        latency = self.server_now_ms() - close_time
+        self.latencies_ms.append(latency)
+        if result:
+            t_str = datetime.fromtimestamp(closed[-1]["timestamp"] / 1000).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"Candle closed: {closed[-1]['close']} -> AI Signal: {result.get('signal')} "
+                  f"({result.get('confidence')}) | {pair} | {t_str} | +{latency:.0f}ms")
+
+    async def run(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="live-runner")
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await self._run()
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self):
+
+        try:
+            await self._in_thread(self._sync_clock)
+        except Exception as e:
+            print(f"Clock sync failed, using the local clock: {e}")
+        last_sync = time.monotonic()
+        await asyncio.gather(*(self._in_thread(self._bootstrap, pair) for pair in self.pairs))
+        print(f"Tracking {len(self.pairs)} pairs (exchange clock offset {self.clock_offset_ms:+.0f}ms)")
+
+        # Min-heap of (due time, pair index): one timer for all pairs
+        schedule = [(self.next_due(pair), i) for i, pair in enumerate(self.pairs)]
+        heapq.heapify(schedule)
+        tasks = set()
+
+        while True:
+            due, _ = schedule[0]
+            await asyncio.sleep(max(0.0, (due - time.time() * 1000) / 1000))
+
+            now = time.time() * 1000
+            while schedule and schedule[0][0] <= now:
+                _, i = heapq.heappop(schedule)
+                task = asyncio.create_task(self._handle(self.pairs[i]))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                # We are past this pair's boundary, so this is the following one
+                heapq.heappush(schedule, (self.next_due(self.pairs[i]), i))
+
+            if time.monotonic() - last_sync > CLOCK_SYNC_SECONDS:
+                last_sync = time.monotonic()
+                try:
+                    await self._in_thread(self._sync_clock)
+                except Exception as e:
+                    print(f"Clock sync failed: {e}")
+
+    def latency_stats(self) -> Dict[str, Any]:
+        values = sorted(self.latencies_ms)
+        if not values:
+            return {"samples": 0}
+        return {
+            "samples": len(values),
+            "p50_ms": round(values[len(values) // 2], 1),
+            "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))], 1),
+            "max_ms": round(values[-1], 1),
+        }
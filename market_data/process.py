@@ -1,8 +1,7 @@
 import time
-import urllib.request
-import json
 from typing import List, Dict, Any, Optional
 from market_data.config import TIMEFRAMES, MIN_CANDLES_REQUIRED, BINANCE_BASE_URL, BINANCE_INTERVALS
+from market_data.transport import default_transport
 
 def get_latest_candle(symbol: str, interval: str) -> Optional[Dict[str, Any]]:
     """
@@ -12,25 +11,24 @@ def get_latest_candle(symbol: str, interval: str) -> Optional[Dict[str, Any]]:
         return None
         
     binance_interval = BINANCE_INTERVALS[interval]
-    url = f"{BINANCE_BASE_URL}/klines?symbol={symbol}&interval={binance_interval}&limit=1"
+    params = {"symbol": symbol, "interval": binance_interval, "limit": 1}
     
     try:
-        with urllib.request.urlopen(url) as response:
-            data = json.loads(response.read().decode())
-            if not data:
-                return None
-            
-            kline = data[0]
-            # [0: Open Time, ..., 4: Close, ..., 6: Close Time]
-            return {
-                "timestamp": int(kline[0]),
-                "open": float(kline[1]),
-                "high": float(kline[2]),
-                "low": float(kline[3]),
-                "close": float(kline[4]),
-                "volume": float(kline[5]),
-                "close_time": int(kline[6])
-            }
+        data = default_transport.get_json(f"{BINANCE_BASE_URL}/klines", params=params)
+        if not data:
+            return None
+        
+        kline = data[0]
+        # [0: Open Time, ..., 4: Close, ..., 6: Close Time]
+        return {
+            "timestamp": int(kline[0]),
+            "open": float(kline[1]),
+            "high": float(kline[2]),
+            "low": float(kline[3]),
+            "close": float(kline[4]),
+            "volume": float(kline[5]),
+            "close_time": int(kline[6])
+        }
     except Exception as e:
         print(f"Error fetching latest candle: {e}")
         return None
@@ -0,0 +1,105 @@
+from typing import Dict, Optional
+import numpy as np
+from market_data.config import TIMEFRAMES
+from market_data.storage import COLUMNS, append_columns, load_arrays
+
+# Derived timeframes are built from stored source candles (1m by default)
+# instead of being downloaded separately. Buckets are aligned to UTC epoch
+# time like Binance klines; weekly buckets open on Monday 00:00 UTC.
+SOURCE_INTERVAL = "1m"
+MINUTE_MS = 60_000
+WEEK_MINUTES = 7 * 24 * 60
+# 1970-01-01 was a Thursday: the first Monday is 4 days later
+WEEK_ORIGIN_MS = 4 * 24 * 60 * MINUTE_MS
+
+
+def _empty() -> Dict[str, np.ndarray]:
+    return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS}
+
+
+def bucket_origin(minutes: int) -> int:
+    """Epoch-ms offset bucket boundaries are aligned to (Monday for weekly multiples)."""
+    return WEEK_ORIGIN_MS if minutes % WEEK_MINUTES == 0 else 0
+
+
+def bucket_start(timestamps: np.ndarray, minutes: int) -> np.ndarray:
+    """Open time of the bucket each timestamp falls into."""
+    step = minutes * MINUTE_MS
+    origin = bucket_origin(minutes)
+    return (timestamps - origin) // step * step + origin
+
+
+def resample_arrays(columns: Dict[str, np.ndarray], minutes: int, source_minutes: int = 1,
+                    include_partial: bool = False, partial_head: Optional[bool] = None) -> Dict[str, np.ndarray]:
+    """
+    Aggregates sorted source candles (column arrays as returned by
+    `load_arrays`) into `minutes`-wide OHLCV buckets in one vectorized pass:
+    first open, max high, min low, last close, summed volume.
+
+    Gaps inside a bucket are tolerated (the bucket aggregates whatever was
+    traded); buckets with no source candles are not emitted. Partial buckets
+    at the edges are dropped unless `include_partial`: the first one if the
+    data starts after its open, the last one if the data does not reach its
+    close (the bucket is still forming). `partial_head` overrides the
+    choice for the first bucket (e.g. False when the source is known to be
+    contiguous with earlier, already resampled data).
+    """
+    if minutes % source_minutes:
+        raise ValueError(f"{minutes}m buckets cannot be built from {source_minutes}m candles")
+    timestamps = np.asarray(columns["timestamp"], dtype=np.int64)
+    n = len(timestamps)
+    if n == 0:
+        return _empty()
+
+    step = minutes * MINUTE_MS
+    buckets = bucket_start(timestamps, minutes)
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.append(starts[1:], n) - 1
+
+    result = {
+        "timestamp": buckets[starts],
+        "open": np.asarray(columns["open"], dtype=np.float64)[starts],
+        "high": np.maximum.reduceat(np.asarray(columns["high"], dtype=np.float64), starts),
+        "low": np.minimum.reduceat(np.asarray(columns["low"], dtype=np.float64), starts),
+        "close": np.asarray(columns["close"], dtype=np.float64)[ends],
+        "volume": np.add.reduceat(np.asarray(columns["volume"], dtype=np.float64), starts),
+    }
+    if partial_head is None:
+        partial_head = not include_partial
+    keep = slice(
+        1 if partial_head and timestamps[0] > buckets[0] else 0,
+        # The last source candle closes source_minutes after its open
+        None if include_partial or timestamps[-1] + source_minutes * MINUTE_MS >= buckets[-1] + step else -1,
+    )
+    return {name: values[keep] for name, values in result.items()}
+
+
+def update_resampled(symbol: str, interval: str, source: str = SOURCE_INTERVAL, rebuild: bool = False) -> int:
+    """
+    Brings the stored `interval` series of `symbol` up to date from its
+    stored `source` candles and returns the number of buckets written.
+
+    Only complete buckets are stored. An update reads the source candles
+    from the open of the bucket after the last stored one, so each new 1m
+    candle is aggregated once and a still-forming bucket is picked up by a
+    later update. `rebuild` recomputes the whole series (e.g. after
+    backfilling source candles inside already written buckets).
+    """
+    if interval not in TIMEFRAMES or source not in TIMEFRAMES:
+        raise ValueError(f"Unknown interval {source if interval in TIMEFRAMES else interval!r}")
+    minutes, source_minutes = TIMEFRAMES[interval], TIMEFRAMES[source]
+    if minutes <= source_minutes:
+        raise ValueError(f"{interval} is not coarser than {source}")
+
+    start: Optional[int] = None
+    if not rebuild:
+        last = load_arrays(symbol, interval, last_n=1)["timestamp"]
+        if len(last):
+            start = int(last[-1]) + minutes * MINUTE_MS
+    # After the stored series the source continues it: a gap at a bucket's
+    # open is missing trades, not missing history
+    derived = resample_arrays(load_arrays(symbol, source, start=start), minutes, source_minutes,
+                              partial_head=start is None)
+    if rebuild or len(derived["timestamp"]):
+        append_columns(symbol, interval, derived, append=not rebuild)
+    return len(derived["timestamp"])
@@ -1,67 +1,330 @@
+import contextlib
 import json
 import os
-from typing import List, Dict, Any
-from market_data.config import get_data_path
+import shutil
+import threading
+from typing import List, Dict, Any, Optional, Union
+import numpy as np
+from market_data.config import get_data_path, get_store_path
 
-def save_candles(symbol: str, interval: str, candles: List[Dict[str, Any]], append: bool = False):
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialised within one process
+    fcntl = None
+
+# Binary columnar layout: one fixed-width file per column under
+# data/<symbol>/<interval>/, rows sorted by timestamp (epoch ms).
+# Appending a candle writes 8 bytes to each file; reads are memory-mapped.
+# Rewrites go to a fresh generation directory (g000001/, ...) and are
+# published by replacing the CURRENT pointer file, so readers never see a mix
+# of old and new columns. Without CURRENT the columns sit in the store
+# directory itself (the original layout).
+# Writers (append, rewrite, repair) hold an exclusive lock on the LOCK file;
+# readers take no lock and never modify the files.
+COLUMNS = (
+    ("timestamp", np.int64),
+    ("open", np.float64),
+    ("high", np.float64),
+    ("low", np.float64),
+    ("close", np.float64),
+    ("volume", np.float64),
+)
+ROW_ITEM_SIZE = 8
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = "LOCK"
+GENERATION_PREFIX = "g"
+
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextlib.contextmanager
+def _writer_lock(store_dir: str):
+    """Exclusive lock for writers of one store, across threads and processes."""
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, LOCK_FILE)
+    if fcntl is None:
+        with _thread_locks_guard:
+            lock = _thread_locks.setdefault(os.path.abspath(path), threading.Lock())
+        with lock:
+            yield
+        return
+    # flock belongs to the open file description, so threads of one process
+    # holding separate descriptors exclude each other too
+    with open(path, 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _generation(store_dir: str) -> Optional[str]:
+    try:
+        with open(os.path.join(store_dir, CURRENT_FILE), 'r') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _data_dir(store_dir: str) -> str:
+    """Directory holding the live generation of the columns."""
+    generation = _generation(store_dir)
+    return os.path.join(store_dir, generation) if generation else store_dir
+
+
+def _column_file(store_dir: str, name: str) -> str:
+    return os.path.join(store_dir, f"{name}.bin")
+
+
+def _column_sizes(store_dir: str) -> List[int]:
+    sizes = []
+    for name, _ in COLUMNS:
+        try:
+            sizes.append(os.path.getsize(_column_file(store_dir, name)))
+        except FileNotFoundError:  # Not written yet, or retired by a rewrite
+            sizes.append(0)
+    return sizes
+
+
+def _row_count(store_dir: str) -> int:
     """
-    Saves candles to a JSON file.
-    
-    Args:
-        symbol: e.g., "BTCUSDT"
-        interval: e.g., "1m"
-        candles: List of candle dicts
-        append: If True, appends to existing file. If False, overwrites.
+    Number of complete rows: the shortest column. Read-only, so it is safe
+    while an append is in flight (timestamp is written last).
     """
-    file_path = get_data_path(symbol, interval)
-    
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    
-    existing_candles = []
-    
-    if append and os.path.exists(file_path):
+    return min(_column_sizes(store_dir)) // ROW_ITEM_SIZE
+
+
+def _repair(store_dir: str) -> int:
+    """
+    Truncates the extra bytes an interrupted append left in some columns and
+    returns the row count. Only call with the writer lock held.
+    """
+    sizes = _column_sizes(store_dir)
+    rows = min(sizes) // ROW_ITEM_SIZE
+    if any(size != rows * ROW_ITEM_SIZE for size in sizes):
+        for name, _ in COLUMNS:
+            path = _column_file(store_dir, name)
+            if os.path.exists(path):
+                with open(path, 'r+b') as f:
+                    f.truncate(rows * ROW_ITEM_SIZE)
+    return rows
+
+
+def _last_timestamp(store_dir: str, rows: int) -> Optional[int]:
+    if rows == 0:
+        return None
+    with open(_column_file(store_dir, "timestamp"), 'rb') as f:
+        f.seek((rows - 1) * ROW_ITEM_SIZE)
+        return int(np.frombuffer(f.read(ROW_ITEM_SIZE), dtype=np.int64)[0])
+
+
+def _to_columns(candles: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    n = len(candles)
+    return {
+        name: np.fromiter((c[name] for c in candles), dtype=dtype, count=n)
+        for name, dtype in COLUMNS
+    }
+
+
+def _sorted_unique(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    # np.unique keeps the first occurrence of each timestamp
+    _, first = np.unique(columns["timestamp"], return_index=True)
+    return {name: values[first] for name, values in columns.items()}
+
+
+def _write_columns(store_dir: str, columns: Dict[str, np.ndarray]):
+    """
+    Rewrites the whole store atomically: every column is written into a new
+    generation directory, which one os.replace of CURRENT then publishes.
+    A crash before that leaves the previous generation intact. Only call with
+    the writer lock held.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    previous = _generation(store_dir)
+    number = int(previous[len(GENERATION_PREFIX):]) + 1 if previous else 1
+    generation = f"{GENERATION_PREFIX}{number:06d}"
+    gen_dir = os.path.join(store_dir, generation)
+    shutil.rmtree(gen_dir, ignore_errors=True)  # Leftover of an interrupted rewrite
+    os.makedirs(gen_dir)
+    for name, dtype in COLUMNS:
+        with open(_column_file(gen_dir, name), 'wb') as f:
+            f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    pointer = os.path.join(store_dir, CURRENT_FILE)
+    with open(pointer + ".tmp", 'w') as f:
+        f.write(generation)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer + ".tmp", pointer)
+    _remove_stale(store_dir, generation)
+
+
+def _remove_stale(store_dir: str, generation: str):
+    """
+    Deletes superseded generations and original-layout column files. Open
+    memory maps keep their data on POSIX; where a mapped file cannot be
+    removed (Windows) it is left for the next rewrite to clean up.
+    """
+    for entry in os.listdir(store_dir):
+        path = os.path.join(store_dir, entry)
+        if entry.startswith(GENERATION_PREFIX) and entry != generation and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif entry.endswith(".bin"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _append_columns(data_dir: str, columns: Dict[str, np.ndarray]):
+    os.makedirs(data_dir, exist_ok=True)
+    # Timestamp last: a crash mid-append leaves it shortest, so the partial
+    # row is dropped by _row_count.
+    for name, dtype in COLUMNS[1:] + COLUMNS[:1]:
+        with open(_column_file(data_dir, name), 'ab') as f:
+            f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+
+
+def _ensure_migrated(symbol: str, interval: str) -> str:
+    store_dir = get_store_path(symbol, interval)
+    if not os.path.isdir(store_dir) and os.path.exists(get_data_path(symbol, interval)):
+        with _writer_lock(store_dir):
+            # Another writer may have migrated (and appended) in the meantime
+            if _generation(store_dir) is None and not os.path.exists(_column_file(store_dir, "timestamp")):
+                _import_json(symbol, interval, store_dir)
+    return store_dir
+
+
+def append_columns(symbol: str, interval: str, columns: Dict[str, np.ndarray], append: bool = True):
+    """
+    Writes candles given as column arrays (keys from COLUMNS).
+
+    New candles newer than everything stored are appended in O(rows added).
+    Overlapping or out-of-order batches fall back to a merge and rewrite;
+    on duplicate timestamps the stored candle wins, as with the JSON store.
+    """
+    store_dir = _ensure_migrated(symbol, interval)
+    incoming = _sorted_unique({name: np.asarray(columns[name], dtype=dtype) for name, dtype in COLUMNS})
+
+    with _writer_lock(store_dir):
+        if not append:
+            _write_columns(store_dir, incoming)
+            return
+
+        # CURRENT is read under the lock, so no rewrite can retire data_dir
+        data_dir = _data_dir(store_dir)
+        rows = _repair(data_dir) if os.path.isdir(data_dir) else 0
+        last = _last_timestamp(data_dir, rows)
+        if len(incoming["timestamp"]) == 0:
+            return
+        if last is None or incoming["timestamp"][0] > last:
+            _append_columns(data_dir, incoming)
+            return
+
+        existing = load_arrays(symbol, interval)
+        merged = _sorted_unique({
+            name: np.concatenate([existing[name], incoming[name]]) for name, _ in COLUMNS
+        })
+        del existing  # Release the memory maps so the old generation can be removed
+        _write_columns(store_dir, merged)
+
+
+def load_arrays(symbol: str, interval: str, start: Optional[int] = None, end: Optional[int] = None,
+                last_n: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Returns the stored columns as read-only memory-mapped arrays (zero-copy).
+
+    `start`/`end` (epoch ms, inclusive) and `last_n` select a window by binary
+    search on the sorted timestamps; only the matching rows are ever paged in.
+    """
+    store_dir = _ensure_migrated(symbol, interval)
+    # A concurrent rewrite may retire the generation being opened; follow
+    # CURRENT again in that case.
+    for attempt in range(3):
+        data_dir = _data_dir(store_dir)
+        rows = _row_count(data_dir) if os.path.isdir(data_dir) else 0
         try:
-            with open(file_path, 'r') as f:
-                content = f.read()
-                if content:
-                    existing_candles = json.loads(content)
-        except Exception as e:
-            print(f"Error reading existing file for append: {e}")
-
-    # Deduplication logic
-    existing_timestamps = {c['timestamp'] for c in existing_candles}
-    
-    new_candles_to_add = []
-    for candle in candles:
-        if candle['timestamp'] not in existing_timestamps:
-            new_candles_to_add.append(candle)
-            
-    final_candles = existing_candles + new_candles_to_add
-    
-    # Sort by timestamp just in case
-    final_candles.sort(key=lambda x: x['timestamp'])
-    
-    with open(file_path, 'w') as f:
-        json.dump(final_candles, f, indent=None) # Compact JSON for space, or indent=2 for readability? User asked for JSON, usually implied for structure. I'll use compact for storage efficiency but standard json valid.
-
-def load_candles(symbol: str, interval: str) -> List[Dict[str, Any]]:
-    """
-    Loads candles from a JSON file.
-    
-    Returns:
-        List of dicts.
+            arrays = {
+                name: np.memmap(_column_file(data_dir, name), dtype=dtype, mode='r', shape=(rows,))
+                for name, dtype in COLUMNS
+            } if rows else None
+        except (FileNotFoundError, ValueError):
+            arrays = None
+        if arrays is not None or _data_dir(store_dir) == data_dir or attempt == 2:
+            break
+    if not arrays:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS}
+
+    lo, hi = 0, rows
+    timestamps = arrays["timestamp"]
+    if start is not None:
+        lo = int(np.searchsorted(timestamps, start, side='left'))
+    if end is not None:
+        hi = int(np.searchsorted(timestamps, end, side='right'))
+    if last_n is not None:
+        lo = max(lo, hi - last_n)
+    if lo == 0 and hi == rows:
+        return arrays
+    hi = max(lo, hi)
+    return {name: values[lo:hi] for name, values in arrays.items()}
+
+
+def migrate_json(symbol: str, interval: str) -> int:
+    """
+    Converts data/<symbol>/<interval>.json into the binary column store.
+    The JSON file is left in place as a backup. Returns the number of rows.
     """
+    store_dir = get_store_path(symbol, interval)
+    with _writer_lock(store_dir):
+        return _import_json(symbol, interval, store_dir)
+
+
+def _import_json(symbol: str, interval: str, store_dir: str) -> int:
     file_path = get_data_path(symbol, interval)
-    if not os.path.exists(file_path):
-        return []
-        
     try:
         with open(file_path, 'r') as f:
             content = f.read()
-            if not content:
-                return []
-            return json.loads(content)
+            candles = json.loads(content) if content else []
     except Exception as e:
         print(f"Error loading candles from JSON: {e}")
-        return []
+        candles = []
+
+    columns = _sorted_unique(_to_columns(candles))
+    _write_columns(store_dir, columns)
+    return len(columns["timestamp"])
+
+
+def save_candles(symbol: str, interval: str, candles: List[Dict[str, Any]], append: bool = False):
+    """
+    Saves candles to the binary column store.
+
+    Args:
+        symbol: e.g., "BTCUSDT"
+        interval: e.g., "1m"
+        candles: List of candle dicts
+        append: If True, appends to existing file. If False, overwrites.
+    """
+    append_columns(symbol, interval, _to_columns(candles), append=append)
+
+def load_candles(symbol: str, interval: str, start: Optional[int] = None, end: Optional[int] = None,
+                 last_n: Optional[int] = None, as_arrays: bool = False) -> Union[List[Dict[str, Any]], Dict[str, np.ndarray]]:
+    """
+    Loads candles from the binary column store.
+
+    Args:
+        start: Only candles with timestamp >= start (epoch ms)
+        end: Only candles with timestamp <= end (epoch ms)
+        last_n: Only the last N candles of the selected range
+        as_arrays: Return the columns as NumPy arrays instead of dicts
+
+    Returns:
+        List of dicts, or a dict of column arrays if as_arrays is True.
+    """
+    arrays = load_arrays(symbol, interval, start=start, end=end, last_n=last_n)
+    if as_arrays:
+        return arrays
+    names = [name for name, _ in COLUMNS]
+    return [dict(zip(names, row)) for row in zip(*(arrays[name].tolist() for name in names))]
@@ -0,0 +1,242 @@
+import http.client
+import json
+import select
+import socket
+import threading
+import time
+import urllib.parse
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+# Statuses worth retrying: rate limits and transient server errors
+RETRY_STATUSES = {429, 418, 500, 502, 503, 504}
+# Errors that mean a pooled keep-alive connection went stale
+STALE_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError, http.client.BadStatusLine)
+# Methods safe to send again when a stale connection may already have delivered them
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"}
+
+
+class TransportError(Exception):
+    pass
+
+
+class HTTPError(TransportError):
+    """Non-2xx response. `code` mirrors urllib.error.HTTPError."""
+
+    def __init__(self, code: int, body: bytes, headers: Dict[str, str], url: str):
+        super().__init__(f"HTTP {code} for {url}")
+        self.code = code
+        self.body = body
+        self.headers = headers
+        self.url = url
+
+
+class Response:
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> Any:
+        return json.loads(self.body.decode())
+
+
+class HTTPTransport:
+    """
+    Shared HTTP client with per-host keep-alive connection pools, timeouts
+    and bounded retry with exponential backoff. Thread-safe.
+
+    GETs are retried on connection errors and RETRY_STATUSES. Idle
+    connections the server has already closed are discarded before reuse;
+    if a reused connection still turns out to be stale, the request is sent
+    again only for IDEMPOTENT_METHODS, since a POST may already have arrived.
+    """
+
+    def __init__(self, timeout: float = 10.0, max_retries: int = 3, backoff: float = 0.5,
+                 max_backoff: float = 8.0, max_idle_per_host: int = 8):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_idle_per_host = max_idle_per_host
+        self._idle: Dict[Tuple[str, str, int], list] = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "requests": 0,
+            "attempts": 0,
+            "retries": 0,
+            "errors": 0,
+            "connections_opened": 0,
+            "connections_reused": 0,
+        }
+        self._latencies = deque(maxlen=1024)
+
+    # -- connection pool -------------------------------------------------
+
+    @staticmethod
+    def _is_dropped(conn) -> bool:
+        # An idle keep-alive socket is only readable once the server closed it
+        if conn.sock is None:
+            return True
+        try:
+            return bool(select.select([conn.sock], [], [], 0)[0])
+        except (OSError, ValueError):
+            return True
+
+    def _acquire(self, key: Tuple[str, str, int], timeout: float):
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle:
+                conn = idle.pop()
+                if self._is_dropped(conn):
+                    conn.close()
+                    continue
+                self._counters["connections_reused"] += 1
+                conn.timeout = timeout
+                conn.sock.settimeout(timeout)
+                return conn, True
+            self._counters["connections_opened"] += 1
+
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=timeout), False
+        return http.client.HTTPConnection(host, port, timeout=timeout), False
+
+    def _release(self, key, conn, reusable: bool):
+        if reusable:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_idle_per_host:
+                    idle.append(conn)
+                    return
+        conn.close()
+
+    # -- requests --------------------------------------------------------
+
+    def request(self, method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                json_body: Any = None, headers: Optional[Dict[str, str]] = None,
+                timeout: Optional[float] = None, retries: Optional[int] = None,
+                data: Optional[bytes] = None) -> Response:
+        """
+        `json_body` is encoded here; `data` is sent as-is (e.g. JSON encoded
+        once up front). Raises HTTPError / TransportError.
+        """
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname, port)
+
+        path = parts.path or "/"
+        query = parts.query
+        if params:
+            query = "&".join(filter(None, [query, urllib.parse.urlencode(params)]))
+        if query:
+            path = f"{path}?{query}"
+
+        body = data
+        send_headers = {"Connection": "keep-alive"}
+        if json_body is not None:
+            body = json.dumps(json_body).encode("utf-8")
+            send_headers["Content-Type"] = "application/json"
+        send_headers.update(headers or {})
+
+        timeout = self.timeout if timeout is None else timeout
+        retries = (self.max_retries if method == "GET" else 0) if retries is None else retries
+        delay = self.backoff
+        attempt = 0
+
+        with self._lock:
+            self._counters["requests"] += 1
+
+        while True:
+            conn, reused = self._acquire(key, timeout)
+            started = time.perf_counter()
+            with self._lock:
+                self._counters["attempts"] += 1
+            try:
+                conn.request(method, path, body=body, headers=send_headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except STALE_ERRORS as e:
+                conn.close()
+                if reused and method in IDEMPOTENT_METHODS:
+                    # Server closed an idle keep-alive connection: retry on a fresh one
+                    continue
+                error = e
+            except (socket.timeout, OSError, http.client.HTTPException) as e:
+                conn.close()
+                error = e
+            else:
+                self._release(key, conn, not resp.will_close)
+                self._record_latency(started)
+                resp_headers = {k: v for k, v in resp.getheaders()}
+                if 200 <= resp.status < 300:
+                    return Response(resp.status, resp_headers, data)
+                error = HTTPError(resp.status, data, resp_headers, url)
+                if resp.status not in RETRY_STATUSES:
+                    self._count("errors")
+                    raise error
+
+            if attempt >= retries:
+                self._count("errors")
+                if isinstance(error, HTTPError):
+                    raise error
+                raise TransportError(f"{method} {url} failed: {error}") from error
+
+            attempt += 1
+            self._count("retries")
+            wait = delay
+            if isinstance(error, HTTPError) and error.headers.get("Retry-After"):
+                try:
+                    wait = float(error.headers["Retry-After"])
+                except ValueError:
+                    pass
+            time.sleep(min(wait, self.max_backoff))
+            delay = min(delay * 2, self.max_backoff)
+
+    def get_json(self, url: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> Any:
+        return self.request("GET", url, params=params, **kwargs).json()
+
+    def post_json(self, url: str, payload: Any, **kwargs) -> Any:
+        return self.request("POST", url, json_body=payload, **kwargs).json()
+
+    # -- metrics ---------------------------------------------------------
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _record_latency(self, started: float):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._latencies.append(elapsed_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Connection reuse counters and latency of recent attempts (milliseconds).
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            latencies = sorted(self._latencies)
+        opened = counters["connections_opened"]
+        reused = counters["connections_reused"]
+        counters["reuse_ratio"] = round(reused / (opened + reused), 3) if opened + reused else None
+        if latencies:
+            counters["latency_ms"] = {
+                "avg": round(sum(latencies) / len(latencies), 3),
+                "p50": round(latencies[len(latencies) // 2], 3),
+                "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+                "max": round(latencies[-1], 3),
+            }
+        return counters
+
+    def close(self):
+        with self._lock:
+            pools, self._idle = self._idle, {}
+        for idle in pools.values():
+            for conn in idle:
+                conn.close()
+
+
+# Global Instance shared by the exchange client, the live runners and the engine callers
+default_transport = HTTPTransport()
@@ -0,0 +1,288 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from app.engine.frame import CandleRing, MarketFrame
+from market_data.config import BINANCE_BASE_URL, BINANCE_INTERVALS, TIMEFRAMES
+from market_data.client import fetch_klines
+from market_data.downloader import TokenBucket, klines_weight
+from market_data.live import LIVE_WEIGHT_PER_MINUTE
+from market_data.process import validate_minimum_candles
+from market_data.resample import SOURCE_INTERVAL, update_resampled
+from market_data.storage import load_arrays, save_candles
+
+try:
+    import websocket  # pip install websocket-client
+except ImportError:
+    websocket = None
+
+BINANCE_WS_URL = "wss://stream.binance.com:9443/stream"
+# Binance caps one connection at 1024 streams and 5 incoming messages per second
+MAX_STREAMS_PER_CONNECTION = 1024
+SUBSCRIBE_BATCH = 200
+SUBSCRIBE_PAUSE_SECONDS = 0.25
+RING_CAPACITY = 1000
+RECONNECT_MAX_BACKOFF = 30.0
+# A REST candle only counts as closed once its close time is this far in the past
+CLOSED_MARGIN_MS = 1000
+
+# on_candle(stream, frame, new_count): `frame` is a zero-copy view of the
+# stream's ring ending at the candle that just closed; `new_count` is how
+# many candles were appended (more than one after a gap-fill).
+CandleCallback = Callable[["KlineStream", MarketFrame, int], Any]
+
+
+def analyzer_callback(analyzer, on_result: Optional[Callable] = None) -> CandleCallback:
+    """
+    Adapts a live analyzer (SessionAnalyzer / InProcessAnalyzer from
+    market_data.live) to `on_candle`; `on_result(stream, frame, result)`
+    receives each signal.
+    """
+    def on_candle(stream: "KlineStream", frame: MarketFrame, new_count: int):
+        if not validate_minimum_candles(frame.timestamp, stream.interval):
+            return
+        result = analyzer.analyze(stream, frame.slice(len(frame) - new_count).records())
+        if result and on_result is not None:
+            on_result(stream, frame, result)
+    return on_candle
+
+
+class KlineStream:
+    """One symbol/interval stream and its candle ring."""
+
+    def __init__(self, symbol: str, interval: str, capacity: int = RING_CAPACITY):
+        if interval not in BINANCE_INTERVALS:
+            raise ValueError(f"Interval {interval} is not served by Binance")
+        self.symbol = symbol
+        self.interval = interval
+        self.name = f"{symbol.lower()}@kline_{BINANCE_INTERVALS[interval]}"
+        self.step_ms = TIMEFRAMES[interval] * 60_000
+        self.ring = CandleRing(capacity)
+        self.lock = threading.Lock()
+        self.session_id: Optional[str] = None
+
+    @property
+    def history(self) -> List[Dict[str, Any]]:
+        """Ring contents as candle dicts (used to seed an analysis session)."""
+        return self.ring.frame().records()
+
+    def __repr__(self) -> str:
+        return f"{self.symbol} [{self.interval}]"
+
+
+class _Connection:
+    """One combined-stream websocket carrying up to MAX_STREAMS_PER_CONNECTION streams."""
+
+    def __init__(self, ingestor: "WSIngestor", streams: List[KlineStream]):
+        self.ingestor = ingestor
+        self.streams = streams
+        self.app = None
+        self.connected_once = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _on_open(self, app):
+        names = [s.name for s in self.streams]
+        for i in range(0, len(names), SUBSCRIBE_BATCH):
+            app.send(json.dumps({"method": "SUBSCRIBE", "params": names[i:i + SUBSCRIBE_BATCH], "id": i + 1}))
+            time.sleep(SUBSCRIBE_PAUSE_SECONDS)
+        if self.connected_once:
+            # Candles may have closed while we were away
+            self.ingestor._count("reconnects")
+            for stream in self.streams:
+                self.ingestor.submit(self.ingestor.catch_up, stream, True)
+        self.connected_once = True
+        self._backoff = 1.0
+
+    def _on_error(self, app, error):
+        print(f"WebSocket Error ({len(self.streams)} streams): {error}")
+
+    def _run(self):
+        self._backoff = 1.0
+        while not self.ingestor.stopped.is_set():
+            self.app = websocket.WebSocketApp(
+                self.ingestor.ws_url,
+                on_open=self._on_open,
+                on_message=lambda app, message: self.ingestor.on_message(message),
+                on_error=self._on_error,
+            )
+            self.app.run_forever(ping_interval=60, ping_timeout=20)
+            if self.ingestor.stopped.wait(self._backoff):
+                break
+            self._backoff = min(self._backoff * 2, RECONNECT_MAX_BACKOFF)
+
+    def close(self):
+        if self.app is not None:
+            self.app.close()
+
+
+class WSIngestor:
+    """
+    Multiplexes many kline streams over a few combined-stream websockets.
+
+    Each stream keeps its candles in a preallocated CandleRing, seeded from
+    the local store plus a REST catch-up. The websocket threads only route
+    messages: in-progress updates are dropped (before JSON decoding when
+    they carry Binance's compact `"x":false`), and
+    closed candles are handed to a worker pool which appends them to the
+    ring (REST gap-filling any missed candles), optionally persists them, and
+    calls `on_candle` with a zero-copy window view. Persisted 1m candles
+    also extend the stored `derive` timeframes (market_data.resample).
+    """
+
+    def __init__(self, pairs: Sequence[Tuple[str, str]], on_candle: Optional[CandleCallback] = None,
+                 window: Optional[int] = None, capacity: int = RING_CAPACITY, persist: bool = True,
+                 ws_url: str = BINANCE_WS_URL, rest_base_url: str = BINANCE_BASE_URL,
+                 streams_per_connection: int = MAX_STREAMS_PER_CONNECTION, workers: int = 16,
+                 weight_per_minute: float = LIVE_WEIGHT_PER_MINUTE, derive: Sequence[str] = ()):
+        if websocket is None:
+            raise ImportError("WSIngestor needs websocket-client: pip install websocket-client")
+        self.streams: Dict[str, KlineStream] = {}
+        for symbol, interval in pairs:
+            stream = KlineStream(symbol, interval, capacity)
+            self.streams[stream.name] = stream
+        self.on_candle = on_candle
+        self.window = window
+        self.persist = persist
+        self.derive = tuple(derive)
+        self.ws_url = ws_url
+        self.rest_base_url = rest_base_url
+        self.bucket = TokenBucket(capacity=weight_per_minute / 2, refill_per_second=weight_per_minute / 60)
+        self.stopped = threading.Event()
+        self.stats = {"messages": 0, "closed": 0, "duplicates": 0, "gap_filled": 0, "reconnects": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+
+        streams = list(self.streams.values())
+        size = min(streams_per_connection, MAX_STREAMS_PER_CONNECTION)
+        self.connections = [_Connection(self, streams[i:i + size]) for i in range(0, len(streams), size)]
+
+    # -- ring maintenance ------------------------------------------------
+
+    def _count(self, name: str, n: int = 1):
+        with self._stats_lock:
+            self.stats[name] += n
+
+    def submit(self, fn, *args):
+        def run():
+            try:
+                fn(*args)
+            except Exception as e:
+                self._count("errors")
+                print(f"{args[0]}: {e}")
+        return self._pool.submit(run)
+
+    def _fetch_closed(self, stream: KlineStream, start_time: int, end_time: int, limit: int) -> List[Dict[str, Any]]:
+        self.bucket.acquire(klines_weight(limit))
+        return fetch_klines(stream.symbol, BINANCE_INTERVALS[stream.interval], start_time, end_time,
+                            limit=limit, base_url=self.rest_base_url)
+
+    def _append(self, stream: KlineStream, candles: List[Dict[str, Any]]) -> int:
+        """Appends candles newer than the ring's tail; returns how many were new."""
+        last = stream.ring.last_timestamp
+        fresh = [c for c in candles if last is None or c["timestamp"] > last]
+        for c in fresh:
+            stream.ring.append(c["timestamp"], c["open"], c["high"], c["low"], c["close"], c["volume"])
+        if fresh and self.persist:
+            save_candles(stream.symbol, stream.interval, fresh, append=True)
+            if stream.interval == SOURCE_INTERVAL:
+                for interval in self.derive:
+                    update_resampled(stream.symbol, interval)
+        return len(fresh)
+
+    def _fill_until(self, stream: KlineStream, end_time: int) -> int:
+        """REST-fetches every closed candle after the ring's tail that opened before `end_time`."""
+        added = 0
+        while True:
+            last = stream.ring.last_timestamp
+            start = 0 if last is None else last + stream.step_ms
+            if last is None:
+                # Empty ring: only the most recent `capacity` candles matter
+                start = max(0, end_time - stream.ring.capacity * stream.step_ms)
+            if start >= end_time:
+                return added
+            missing = (end_time - start) // stream.step_ms
+            page = self._fetch_closed(stream, start, end_time - 1, int(max(1, min(1000, missing))))
+            new = self._append(stream, page)
+            added += new
+            if new == 0:
+                return added
+
+    def seed(self, stream: KlineStream):
+        """Loads the ring from the local store (no network)."""
+        arrays = load_arrays(stream.symbol, stream.interval, last_n=stream.ring.capacity)
+        if len(arrays["timestamp"]):
+            stream.ring.extend(MarketFrame(**arrays))
+
+    def catch_up(self, stream: KlineStream, notify: bool = False):
+        """
+        Fills the ring up to the last fully closed candle via REST.
+        With `notify`, `on_candle` is called if anything was added.
+        """
+        now = int(time.time() * 1000) - CLOSED_MARGIN_MS
+        with stream.lock:
+            # Opened at or before now - step means closed, whatever the bucket alignment
+            added = self._fill_until(stream, now - stream.step_ms + 1)
+            self._count("gap_filled", added)
+            if notify and added and self.on_candle is not None:
+                self.on_candle(stream, stream.ring.frame(self.window), added)
+
+    def _on_closed(self, stream: KlineStream, kline: Dict[str, Any]):
+        candle = {
+            "timestamp": int(kline["t"]),
+            "open": float(kline["o"]),
+            "high": float(kline["h"]),
+            "low": float(kline["l"]),
+            "close": float(kline["c"]),
+            "volume": float(kline["v"]),
+        }
+        with stream.lock:
+            last = stream.ring.last_timestamp
+            if last is not None and candle["timestamp"] <= last:
+                self._count("duplicates")
+                return
+            gap = 0
+            if last is not None and candle["timestamp"] > last + stream.step_ms:
+                gap = self._fill_until(stream, candle["timestamp"])
+                self._count("gap_filled", gap)
+            new = gap + self._append(stream, [candle])
+            self._count("closed")
+            if self.on_candle is not None and new:
+                self.on_candle(stream, stream.ring.frame(self.window), new)
+
+    # -- websocket side --------------------------------------------------
+
+    def on_message(self, message: str):
+        self._count("messages")
+        # Only closed candles matter; skip decoding the in-progress updates.
+        # The marker is only a shortcut: anything else is decoded and checked.
+        if '"x":false' in message:
+            return
+        payload = json.loads(message)
+        data = payload.get("data")
+        kline = data.get("k") if isinstance(data, dict) else None
+        if not kline or kline.get("x") is not True:
+            return
+        stream = self.streams.get(payload.get("stream"))
+        if stream is None:
+            return
+        self.submit(self._on_closed, stream, kline)
+
+    def start(self, catch_up: bool = True):
+        """Seeds every ring, catches up over REST, then opens the websockets."""
+        for stream in self.streams.values():
+            self.seed(stream)
+        if catch_up:
+            for future in [self.submit(self.catch_up, s) for s in self.streams.values()]:
+                future.result()
+        for conn in self.connections:
+            conn.thread.start()
+        print(f"Streaming {len(self.streams)} klines over {len(self.connections)} websocket connection(s)")
+
+    def stop(self):
+        self.stopped.set()
+        for conn in self.connections:
+            conn.close()
+        for conn in self.connections:
+            conn.thread.join(timeout=5)
+        self._pool.shutdown(wait=True)
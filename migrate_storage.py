@@ -0,0 +1,25 @@
+import argparse
+import os
+from market_data.config import DATA_DIR
+from market_data.storage import migrate_json
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert stored JSON candle files to the binary column store")
+    parser.add_argument("--symbol", type=str, default=None, help="Only migrate this pair (default: all)")
+    args = parser.parse_args()
+
+    symbols = [args.symbol] if args.symbol else sorted(
+        d for d in os.listdir(DATA_DIR) if os.path.isdir(os.path.join(DATA_DIR, d))
+    )
+
+    for symbol in symbols:
+        symbol_dir = os.path.join(DATA_DIR, symbol)
+        for file_name in sorted(os.listdir(symbol_dir)):
+            if not file_name.endswith(".json"):
+                continue
+            interval = file_name[:-len(".json")]
+            rows = migrate_json(symbol, interval)
+            print(f"Migrated {symbol} [{interval}]: {rows} candles")
+
+if __name__ == "__main__":
+    main()
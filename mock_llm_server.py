@@ -0,0 +1,124 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+# Local stand-in for the OpenAI chat completions API. It answers the
+# engine's single and batched review prompts by echoing the proposed signal,
+# so LLM paths can be exercised without a key:
+#   python mock_llm_server.py --port 8099 --delay 0.8
+#   OPENAI_API_KEY=mock OPENAI_BASE_URL=http://127.0.0.1:8099/v1 uvicorn app.main:app
+
+_ITEM = re.compile(r"^=== ITEM (\d+): (\S+) \(", re.MULTILINE)
+_SINGLE = re.compile(r"^Review this market analysis for (\S+) \(", re.MULTILINE)
+_DECISION = re.compile(r"^Signal: (\w+)\nConfidence: ([\d.]+)", re.MULTILINE)
+
+
+class MockLLM:
+    def __init__(self, delay: float = 0.0, drop_rate: float = 0.0, seed: Optional[int] = None):
+        self.delay = delay
+        # Fraction of batch items left out of the answer (exercises per-item fallback)
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "batched_requests": 0, "items": 0, "prompt_chars": 0}
+
+    def answer(self, body: dict) -> str:
+        prompt = "\n".join(m["content"] for m in body["messages"])
+        decisions = _DECISION.findall(prompt)
+        items = _ITEM.findall(prompt)
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["prompt_chars"] += len(prompt)
+            self.stats["items"] += max(1, len(items))
+            if items:
+                self.stats["batched_requests"] += 1
+
+        def verdict(symbol, decision):
+            signal, confidence = decision
+            return {"signal": signal, "confidence": float(confidence),
+                    "explanation": f"Mock review of {symbol}: {signal} stands."}
+
+        if not items:
+            match = _SINGLE.search(prompt)
+            return json.dumps(verdict(match.group(1) if match else "?", decisions[0] if decisions else ("HOLD", "0")))
+        reviews = []
+        for (item_id, symbol), decision in zip(items, decisions):
+            with self.lock:
+                dropped = self.random.random() < self.drop_rate
+            if not dropped:
+                reviews.append(dict(verdict(symbol, decision), id=int(item_id), symbol=symbol))
+        return json.dumps({"reviews": reviews})
+
+
+def _handler(mock: MockLLM):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, payload: dict):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                with mock.lock:
+                    self._send(200, dict(mock.stats))
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send(404, {"error": "not found"})
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            time.sleep(mock.delay)
+            try:
+                self._send(200, {
+                    "id": "mock", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": mock.answer(body)}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Client gave up (deadline)
+
+    return Handler
+
+
+def start_mock_llm(port: int = 0, delay: float = 0.0, drop_rate: float = 0.0, seed: Optional[int] = None):
+    """Starts the mock in a daemon thread; returns (server, mock, base_url)."""
+    mock = MockLLM(delay, drop_rate, seed)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(mock))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, mock, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI chat completions server for the LLM reviewer")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--delay", type=float, default=0.5, help="Seconds per completion")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Fraction of batch items to omit")
+    args = parser.parse_args()
+
+    server, _, base_url = start_mock_llm(args.port, args.delay, args.drop_rate)
+    print(f"Mock LLM at {base_url} (stats at {base_url}/stats)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import argparse
+import time
+from market_data.config import TIMEFRAMES
+from market_data.resample import SOURCE_INTERVAL, update_resampled
+from market_data.storage import load_arrays
+
+def main():
+    parser = argparse.ArgumentParser(description="Build derived timeframes from stored 1m candles")
+    parser.add_argument("--symbol", type=str, nargs="+", required=True, help="Trading Pair(s) (e.g., BTCUSDT ETHUSDT)")
+    parser.add_argument("--interval", type=str, nargs="+", required=True, help="Derived timeframe(s) (e.g., 10m 1h 1w)")
+    parser.add_argument("--source", type=str, default=SOURCE_INTERVAL, help="Stored timeframe to aggregate from")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Recompute the whole series (after backfilling source candles)")
+    args = parser.parse_args()
+
+    unknown = [i for i in args.interval + [args.source] if i not in TIMEFRAMES]
+    if unknown:
+        parser.error(f"unknown interval(s): {', '.join(unknown)} (choose from {', '.join(TIMEFRAMES)})")
+
+    started = time.perf_counter()
+    for symbol in args.symbol:
+        source_rows = len(load_arrays(symbol, args.source)["timestamp"])
+        if source_rows == 0:
+            print(f"{symbol}: no stored {args.source} candles. Download them first:")
+            print(f"  python download_history.py --symbol {symbol} --interval {args.source}")
+            continue
+        for interval in args.interval:
+            try:
+                written = update_resampled(symbol, interval, source=args.source, rebuild=args.rebuild)
+            except ValueError as e:
+                print(f"{symbol} [{interval}]: {e}")
+                continue
+            total = len(load_arrays(symbol, interval)["timestamp"])
+            if written:
+                print(f"{symbol} [{interval}]: wrote {written} candles from {source_rows} {args.source} "
+                      f"-> data/{symbol}/{interval}/ ({total} stored)")
+            else:
+                print(f"{symbol} [{interval}]: already up to date ({total} stored).")
+    print(f"Finished in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,129 +1,68 @@
-import time
 import argparse
-import urllib.request
-import json
-from market_data.storage import load_candles, save_candles
-from market_data.process import get_latest_candle, validate_minimum_candles
-from market_data.config import TIMEFRAMES
-from datetime import datetime
+import asyncio
+import time
+from market_data.live import LiveRunner, SessionAnalyzer, InProcessAnalyzer, API_BASE_URL
+from market_data.transport import default_transport
 
-# Local API Endpoint
-API_URL = "http://localhost:8000/analyze"
+def _make_analyzer(api_url, in_process):
+    if in_process:
+        print("Analyzing in-process (no API round trip); the API's /signals views will not see these results.")
+        return InProcessAnalyzer()
+    return SessionAnalyzer(api_url)
 
-def post_analyze(candles, symbol, timeframe):
+def run_live(pairs, api_url=API_BASE_URL, max_concurrency=32, in_process=False):
     """
-    Sends the candle data to the AI engine for analysis.
+    Runs the asyncio live runner for the given (symbol, interval) pairs.
+    Each pair is fetched right after its candle closes and analyzed through
+    an append-only session on the AI engine (or in this process).
     """
-    payload = {
-        "symbol": symbol,
-        "timeframe": timeframe,
-        "candles": candles
-    }
-    
+    print(f"--- Starting Safe Mode Live Prediction: {', '.join(f'{s} [{i}]' for s, i in pairs)} ---")
+    runner = LiveRunner(pairs, analyzer=_make_analyzer(api_url, in_process), max_concurrency=max_concurrency)
     try:
-        req = urllib.request.Request(
-            API_URL, 
-            data=json.dumps(payload).encode('utf-8'),
-            headers={'Content-Type': 'application/json'}
-        )
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode())
-            return result
-    except Exception as e:
-        print(f"API Error: {e}")
-        return None
+        asyncio.run(runner.run())
+    except KeyboardInterrupt:
+        print("\nStopping Live Mode.")
+        print(f"Close-to-signal latency: {runner.latency_stats()}")
+        print(f"HTTP transport stats: {default_transport.stats()}")
 
-def run_live(symbol, interval):
-    print(f"--- Starting Safe Mode Live Prediction: {symbol} [{interval}] ---")
-    
-    # 1. Load History
-    history = load_candles(symbol, interval)
-    if not history:
-        print("No historical data found! Please run download_history.py first.")
-        return
+def run_live_ws(pairs, api_url=API_BASE_URL, max_concurrency=32, in_process=False):
+    """
+    Same as run_live, but candles arrive over combined-stream websockets
+    (market_data.ws_ingestor) instead of REST polls.
+    """
+    from market_data.ws_ingestor import WSIngestor, analyzer_callback
 
-    print(f"Loaded {len(history)} historical candles.")
-    
-    # Track last processed candle timestamp to avoid duplicates
-    last_processed_time = history[-1]['timestamp']
-    
-    while True:
-        try:
-            # 2. Fetch Latest Candle
-            # We strictly want COMPLETED candles.
-            # Binance API result: if we ask for limit=1, it gives specific latest.
-            # Strategy: poll every few seconds. If a NEW candle appears that has a timestamp
-            # greater than our `last_processed_time` AND it is considered 'closed' (based on time)
-            # then we proceed.
-            
-            # Actually, to be safe and simple:
-            # We fetch the LAST 2 candles.
-            # If the 2nd to last candle (index 0) has a timestamp > last_processed_time,
-            # it means it has definitely closed because a new one (index 1) has started.
-            
-            # Re-implementing fetch here slightly differently for this logic
-            binance_interval = interval # Assuming valid mapping exists or is same
-            from market_data.config import BINANCE_INTERVALS
-            b_interval = BINANCE_INTERVALS.get(interval)
-            
-            url = f"https://api.binance.com/api/v3/klines?symbol={symbol}&interval={b_interval}&limit=2"
-            
-            with urllib.request.urlopen(url) as response:
-                data = json.loads(response.read().decode())
-                
-                # Check the closed candle (the one before the currently open one, index 0)
-                closed_kline = data[0]
-                closed_ts = int(closed_kline[0])
-                
-                if closed_ts > last_processed_time:
-                    # found a new CLOSED candle
-                    new_candle = {
-                        "timestamp": closed_ts,
-                        "open": float(closed_kline[1]),
-                        "high": float(closed_kline[2]),
-                        "low": float(closed_kline[3]),
-                        "close": float(closed_kline[4]),
-                        "volume": float(closed_kline[5])
-                    }
-                    
-                    # print(f"\n[NEW CANDLE] {datetime.fromtimestamp(closed_ts/1000)}")
-                    
-                    # 3. Append & Save
-                    history.append(new_candle)
-                    save_candles(symbol, interval, [new_candle], append=True)
-                    last_processed_time = closed_ts
-                    
-                    # 4. Validate
-                    if validate_minimum_candles(history, interval):
-                        # 5. Predict
-                        print("Sending to AI Engine...")
-                        # Limit context to last 1000 to avoid huge payloads
-                        prediction = post_analyze(history[-1000:], symbol, interval)
-                        
-                        if prediction:
-                            t_str = datetime.fromtimestamp(closed_ts/1000).strftime('%Y-%m-%d %H:%M:%S')
-                            print(f"Candle closed: {new_candle['close']} -> AI Signal: {prediction.get('signal')} ({prediction.get('confidence')}) | {symbol} | {t_str}")
-                    else:
-                        print("Skipping prediction: Insufficient data.")
-                        
-                else:
-                    # unique visual heartbeat
-                    print(".", end="", flush=True)
-            
-            # Sleep to respect rate limits and avoid busy loop
-            time.sleep(10)
-            
-        except KeyboardInterrupt:
-            print("\nStopping Live Mode.")
-            break
-        except Exception as e:
-            print(f"\nError in loop: {e}")
-            time.sleep(5)
+    def on_result(stream, frame, result):
+        print(f"Candle closed: {frame.close[-1]} -> AI Signal: {result.get('signal')} "
+              f"({result.get('confidence')}) | {stream}")
+
+    print(f"--- Starting Websocket Live Prediction: {', '.join(f'{s} [{i}]' for s, i in pairs)} ---")
+    on_candle = analyzer_callback(_make_analyzer(api_url, in_process), on_result)
+    ingestor = WSIngestor(pairs, on_candle=on_candle, workers=max_concurrency)
+    ingestor.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\nStopping Live Mode.")
+        ingestor.stop()
+        print(f"Ingestor stats: {ingestor.stats}")
+        print(f"HTTP transport stats: {default_transport.stats()}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--symbol", type=str, default="BTCUSDT")
-    parser.add_argument("--interval", type=str, default="1m")
+    parser.add_argument("--symbol", type=str, nargs="+", default=["BTCUSDT"])
+    parser.add_argument("--interval", type=str, nargs="+", default=["1m"])
+    parser.add_argument("--api-url", type=str, default=API_BASE_URL, help="AI engine base URL")
+    parser.add_argument("--max-concurrency", type=int, default=32, help="Pairs fetched/analyzed at once")
+    parser.add_argument("--source", choices=["rest", "ws"], default="rest",
+                        help="rest: fetch on candle close; ws: combined-stream websockets")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Run the signal engine in this process instead of calling the API")
     args = parser.parse_args()
     
-    run_live(args.symbol, args.interval)
+    pairs = [(s, i) for s in args.symbol for i in args.interval]
+    if args.source == "ws":
+        run_live_ws(pairs, args.api_url, args.max_concurrency, args.in_process)
+    else:
+        run_live(pairs, args.api_url, args.max_concurrency, args.in_process)
@@ -0,0 +1,46 @@
+import argparse
+import csv
+from market_data.storage import load_candles
+from app.engine.frame import MarketFrame, parse_date_ms
+from app.engine.sweep import run_sweep, parse_grid, DEFAULT_GRID, METRICS, SWEEP_WORKERS
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep agent / aggregator thresholds over stored history")
+    parser.add_argument("--symbol", type=str, required=True, help="Trading Pair (e.g., BTCUSDT)")
+    parser.add_argument("--interval", type=str, required=True, help="Timeframe (e.g., 1m, 5m, 1h)")
+    parser.add_argument("--start", type=str, default=None, help="Start date, ISO format, UTC unless an offset is given (e.g., 2024-01-01)")
+    parser.add_argument("--end", type=str, default=None, help="End date, ISO format, UTC unless an offset is given")
+    parser.add_argument("--param", type=str, action="append", default=[],
+                        help="Grid as component.param=v1,v2,... (repeatable; default: "
+                             + " ".join(f"{k}={','.join(map(str, v))}" for k, v in DEFAULT_GRID.items()) + ")")
+    parser.add_argument("--sort", choices=METRICS, default="total_return", help="Consensus metric to rank by")
+    parser.add_argument("--workers", type=int, default=SWEEP_WORKERS, help="Worker processes")
+    parser.add_argument("--top", type=int, default=20, help="Rows to print")
+    parser.add_argument("--output", type=str, default=None, help="Write the full ranked table to this CSV file")
+
+    args = parser.parse_args()
+    try:
+        grid = parse_grid(args.param) if args.param else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    arrays = load_candles(args.symbol, args.interval, start=parse_date_ms(args.start),
+                          end=parse_date_ms(args.end), as_arrays=True)
+    if len(arrays['timestamp']) == 0:
+        print("No historical data found! Please run download_history.py first.")
+        return
+
+    result = run_sweep(MarketFrame(**arrays), grid, workers=args.workers, sort=args.sort)
+    print(f"--- Sweep: {args.symbol} [{args.interval}] over {result.bars} candles: {len(result.rows)} combinations "
+          f"({result.groups} agent settings) on {result.workers} worker(s) in {result.elapsed:.1f}s ---")
+    print(result.table(args.top))
+
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(result.rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(result.rows)
+        print(f"Saved ranked results to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,46 @@
+import base64
+import contextlib
+import hashlib
 import json
+import os
+import random
+import shutil
+import socket
+import struct
 import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from fastapi.testclient import TestClient
+import numpy as np
 import pandas as pd
-from app.engine.signal_engine import engine
-from app.schemas import Candle
+from app.main import app
+from app.engine.signal_engine import engine, SignalEngine
+from app.engine import llm
+from app.engine.frame import MarketFrame
+from app.engine.cache import ResultCache
+from app.engine.ingest import CandleStreamParser, IngestError, RowLimitError, MAX_LINE_BYTES
+from app.engine.streaming import IndicatorState, STREAMING_TOLERANCE
+from app.engine.backtest import run_backtest, SIGNAL_NAMES
+from app.engine.indicators import calculate_sma, calculate_rsi, calculate_macd, calculate_atr
+from app.engine.agents import BaseAgent, TrendFollowingAgent, MomentumAgent, VolatilityAgent
+from app.engine.aggregator import SignalAggregator
+from app.engine.sweep import run_sweep, METRICS
+from app.engine.executor import AgentExecutor, EXECUTORS
+from app.engine.indicator_graph import indicator, label
+from app.schemas import Candle, AgentSignal, SignalType
+import market_data.config
+from market_data.client import parse_kline
+from market_data.config import get_store_path
+from market_data.storage import save_candles, load_arrays
+from market_data.downloader import download_history, plan_windows
+from market_data import ws_ingestor
+from market_data.resample import resample_arrays, update_resampled
+from mock_llm_server import start_mock_llm
+from bench_live_paths import synthetic_candles
 
 def test_engine():
     print("Loading sample request...")
@@ -32,5 +70,818 @@ def test_engine():
         print(f"Analysis Failed: {e}")
         sys.exit(1)
 
+def test_streaming_parity():
+    print("Checking streaming indicators against batch functions...")
+    with open("data/sample_request.json", "r") as f:
+        payload = json.load(f)
+    frame = MarketFrame.from_candles([Candle(**c) for c in payload["candles"]])
+    df = frame.df
+
+    batch = {
+        "sma_20": calculate_sma(df['close'], 20),
+        "sma_50": calculate_sma(df['close'], 50),
+        "sma_200": calculate_sma(df['close'], 200),
+        "std_20": df['close'].rolling(window=20).std(),
+        "rsi": calculate_rsi(df['close'], 14),
+        "macd": calculate_macd(df['close'])['macd'],
+        "signal": calculate_macd(df['close'])['signal'],
+        "atr": calculate_atr(df['high'], df['low'], df['close'], 14),
+    }
+
+    state = IndicatorState()
+    for i in range(len(frame)):
+        state.update(frame.high[i], frame.low[i], frame.close[i])
+        streamed = {
+            "sma_20": state.sma_20.value,
+            "sma_50": state.sma_50.value,
+            "sma_200": state.sma_200.value,
+            "std_20": state.std_20.value,
+            "rsi": state.rsi.value,
+            "macd": state.macd.macd,
+            "signal": state.macd.signal,
+            "atr": state.atr.value,
+        }
+        for name, value in streamed.items():
+            expected = batch[name].iloc[i]
+            if pd.isna(expected):
+                assert pd.isna(value), f"{name}[{i}]: expected NaN, got {value}"
+            else:
+                assert abs(value - expected) <= STREAMING_TOLERANCE * max(1.0, abs(expected)), \
+                    f"{name}[{i}]: streaming {value} != batch {expected}"
+
+    for agent in engine.agents:
+        from_state = agent.analyze_state(state)
+        from_frame = agent.analyze_frame(frame)
+        assert (from_state.signal, from_state.confidence) == (from_frame.signal, from_frame.confidence), agent.name
+    print("Streaming parity passed.")
+
+def test_backtest_parity():
+    print("Checking vectorized backtest against per-prefix analysis...")
+    with open("data/sample_request.json", "r") as f:
+        payload = json.load(f)
+    frame = MarketFrame.from_candles([Candle(**c) for c in payload["candles"]])
+    result = run_backtest(frame, engine.agents, engine.aggregator)
+
+    for i in range(len(frame)):
+        expected = engine.analyze_frame(frame.slice(0, i + 1), payload["symbol"], payload["timeframe"])
+        if engine.llm.is_available():
+            break  # LLM overrides are not part of the backtest
+        assert SIGNAL_NAMES[int(result.signal[i])] == expected.signal.value, f"bar {i}: signal"
+        assert result.confidence[i] == expected.confidence, f"bar {i}: confidence"
+    print("Backtest parity passed.")
+
+def test_indicator_graph():
+    print("Checking indicator graph against indicators.py...")
+    with open("data/sample_request.json", "r") as f:
+        payload = json.load(f)
+    frame = MarketFrame.from_candles([Candle(**c) for c in payload["candles"]])
+    close = frame.df['close']
+
+    keys = [key for agent in engine.agents for key in agent.required_indicators]
+    report = frame.indicators.resolve(keys + keys)
+    computed = [node["node"] for node in report["computed"]]
+    assert len(computed) == len(set(computed)), "a node was computed twice"
+    assert "ema(period=12, source=close)" in computed, "macd did not resolve through the ema nodes"
+    assert frame.indicators.resolve(keys)["computed"] == [], "memoized nodes were recomputed"
+
+    macd = calculate_macd(close)
+    sma_20 = calculate_sma(close, 20)
+    std_20 = close.rolling(window=20).std()
+    expected = {
+        indicator("sma", period=50): calculate_sma(close, 50),
+        indicator("rsi", period=14): calculate_rsi(close, 14),
+        indicator("atr", period=14): calculate_atr(frame.df['high'], frame.df['low'], close, 14),
+        indicator("macd"): macd,
+        indicator("bollinger", period=20): pd.DataFrame({
+            'upper': sma_20 + (std_20 * 2), 'middle': sma_20, 'lower': sma_20 - (std_20 * 2)
+        }),
+    }
+    for key, value in expected.items():
+        # Exact equality: agents must see the same floats as the direct calls
+        assert frame.indicator(key).equals(value), label(key)
+    print("Indicator graph passed.")
+
+LAST_VALUE_TOLERANCE = 1e-9
+
+def test_last_value_parity():
+    print("Checking last-value indicator kernels against full series...")
+    with open("data/sample_request.json", "r") as f:
+        payload = json.load(f)
+    full = MarketFrame.from_candles([Candle(**c) for c in payload["candles"]])
+    keys = [indicator("column"), indicator("std", period=20), indicator("ema", period=50), indicator("atr", period=14)]
+    keys += [key for agent in engine.agents for key in agent.required_indicators]
+
+    # Shorter than, equal to and longer than the lookbacks (including the seeded EMA start)
+    for n in (1, 2, 13, 14, 15, 19, 20, 26, 35, 200, len(full)):
+        window = full.slice(0, n)
+        frame = MarketFrame(*(getattr(window, name).copy() for name in ("timestamp", "open", "high", "low", "close", "volume")))
+        for key in keys:
+            value = frame.indicator(key, last=True)
+            expected = frame.indicator(key)
+            pairs = [(value[c], expected[c].iloc[-1]) for c in expected.columns] \
+                if isinstance(expected, pd.DataFrame) else [(value, expected.iloc[-1])]
+            for got, want in pairs:
+                if pd.isna(want):
+                    assert pd.isna(got), f"{label(key)} at {n}: expected NaN, got {got}"
+                else:
+                    assert abs(got - want) <= LAST_VALUE_TOLERANCE * max(1.0, abs(want)), \
+                        f"{label(key)} at {n}: last {got} != full {want}"
+
+    # Tail-only: the kernels never build the DataFrame
+    frame = full.slice(0, len(full))
+    report = frame.indicators.resolve(keys, last=True)
+    assert report["mode"] == "last" and frame._df is None, "last-value resolve built the DataFrame"
+    for agent in engine.agents:
+        agent.analyze_frame(frame)
+    assert frame._df is None, "an agent read the full DataFrame"
+    print("Last-value parity passed.")
+
+def test_lookback_trim():
+    print("Checking lookback trimming against untrimmed runs...")
+    rng = np.random.default_rng(7)
+    n = 10000
+    close = 100 + np.cumsum(rng.normal(0, 0.5, n))
+    close = close - close.min() + 10
+    frame = MarketFrame(np.arange(n) * 60000, close, close + 0.4, close - 0.4, close, np.ones(n))
+    window = engine.input_window()
+    assert window is not None and window < n, "agents did not declare their lookback"
+
+    for stop in (window - 1, window, window + 1, 3000, n):
+        full = frame.slice(0, stop)
+        trimmed = engine.analyze_frame(full, "TRIMUSDT", "1m")
+        untrimmed = engine._run(full, "TRIMUSDT", "1m")
+        assert trimmed.metadata["lookback"] == {"window": window, "received": stop, "used": min(stop, window)}
+        assert (trimmed.signal, trimmed.confidence) == (untrimmed.signal, untrimmed.confidence), f"{stop} bars"
+        # The last-value kernels read no further back than the window: identical agent outputs
+        assert [a.dict() for a in trimmed.agent_signals] == [a.dict() for a in untrimmed.agent_signals], f"{stop} bars"
+    print("Lookback trim passed.")
+
+class _SlowAgent(BaseAgent):
+    def __init__(self, sleep: float = 0.3, budget_ms: float = 50):
+        super().__init__("SlowAgent")
+        self.sleep = sleep
+        self.time_budget_ms = budget_ms
+
+    def analyze_frame(self, frame):
+        time.sleep(self.sleep)
+        return AgentSignal(signal=SignalType.BUY, confidence=1.0, agent_name=self.name)
+
+def test_executor_parity():
+    print("Checking serial / thread / process agent executors...")
+    with open("data/sample_request.json", "r") as f:
+        payload = json.load(f)
+    frame = MarketFrame.from_candles([Candle(**c) for c in payload["candles"]])
+    windows = [frame.slice(0, n) for n in (30, 120, 250, len(frame))]
+
+    results = {}
+    for kind in EXECUTORS:
+        executor = AgentExecutor(kind, workers=4)
+        results[kind] = [
+            [(o.status, o.signal.dict()) for o in executor.run(engine.agents, window)] for window in windows
+        ]
+        executor.shutdown()
+    assert results["thread"] == results["serial"], "thread executor differs from serial"
+    assert results["process"] == results["serial"], "process executor differs from serial"
+
+    # Pooled: the overrunning agent is abandoned; serial: its finished result is kept
+    executor = AgentExecutor("thread", workers=4)
+    outcomes = executor.run(engine.agents + [_SlowAgent()], frame)
+    slow = outcomes[-1]
+    assert slow.status == "timeout", "thread: slow agent not timed out"
+    assert (slow.signal.signal, slow.signal.confidence) == (SignalType.HOLD, 0.0)
+    assert [o.status for o in outcomes[:-1]] == ["ok"] * len(engine.agents)
+    assert executor.abandoned == 1, "overrunning agent not counted as abandoned"
+    time.sleep(0.35)
+    assert executor.abandoned == 0, "finished agent still counted as abandoned"
+    executor.shutdown()
+
+    serial = AgentExecutor("serial").run(engine.agents + [_SlowAgent()], frame)
+    assert (serial[-1].status, serial[-1].signal.signal) == ("ok", SignalType.BUY), "serial dropped a finished result"
+    assert serial[-1].report()["over_budget"] is True
+
+    # Budgets start when the agent does: queueing behind a busy pool is free
+    executor = AgentExecutor("thread", workers=1)
+    outcomes = executor.run([_SlowAgent(sleep=0.03, budget_ms=50) for _ in range(3)], frame)
+    assert [o.status for o in outcomes] == ["ok"] * 3, [o.report() for o in outcomes]
+
+    # Every worker held by an abandoned agent: queued agents fail fast
+    executor.run([_SlowAgent(), _SlowAgent(sleep=0, budget_ms=50)], frame)
+    started = time.perf_counter()
+    outcomes = executor.run(engine.agents, frame)
+    assert [o.status for o in outcomes] == ["timeout"] * len(engine.agents)
+    assert time.perf_counter() - started < 0.2, "queued agents waited behind an abandoned one"
+    executor.shutdown()
+    print("Executor parity passed.")
+
+def test_sweep_parity():
+    print("Checking parameter sweep against the backtest...")
+    with open("data/sample_request.json", "r") as f:
+        payload = json.load(f)
+    frame = MarketFrame.from_candles([Candle(**c) for c in payload["candles"]])
+    grid = {
+        "trend.min_separation": [0.01, 0.02],
+        "momentum.rsi_oversold": [30, 40],
+        "aggregator.threshold": [0.2, 0.4],
+    }
+    serial = run_sweep(frame, grid, workers=1)
+    pooled = run_sweep(frame, grid, workers=2)
+    assert len(serial.rows) == 8 and serial.groups == 4
+    assert pooled.rows == serial.rows, "process pool sweep differs from serial"
+
+    for row in serial.rows:
+        agents = [TrendFollowingAgent(min_separation=row["trend.min_separation"]),
+                  MomentumAgent(rsi_oversold=row["momentum.rsi_oversold"]), VolatilityAgent()]
+        expected = run_backtest(frame, agents, SignalAggregator(threshold=row["aggregator.threshold"]))
+        for metric in METRICS:
+            assert row[metric] == expected.stats["consensus"][metric], f"{row}: {metric}"
+    print("Sweep parity passed.")
+
+def test_columnar_validation():
+    print("Checking columnar validation errors...")
+    client = TestClient(app)
+    with open("data/sample_request.json", "r") as f:
+        candles = json.load(f)["candles"]
+    base = {"symbol": "TESTUSDT", "timeframe": "1h",
+            "timestamp": [int(pd.Timestamp(c["timestamp"]).timestamp() * 1000) for c in candles]}
+    for name in ("open", "high", "low", "close", "volume"):
+        base[name] = [c[name] for c in candles]
+    assert client.post("/analyze/columnar", json=base).status_code == 200
+
+    def error(field, index, value):
+        body = {**base, field: list(base[field])}
+        body[field][index] = value
+        response = client.post("/analyze/columnar", json=body)
+        assert response.status_code == 422, f"{field}[{index}]={value!r}: {response.status_code}"
+        return response.json()["detail"][0]
+
+    cases = [
+        ("timestamp", 3, 1e30, "datetime_parsing"),
+        ("timestamp", 4, 2**70, "datetime_parsing"),
+        ("timestamp", 5, -1e17, "datetime_parsing"),
+        ("timestamp", 6, 1.7e12 + 0.5, "int_from_float"),
+        ("timestamp", 7, True, "int_type"),
+        ("timestamp", 8, "1700000000000", "int_type"),
+        ("close", 9, "12", "float_type"),
+        ("volume", 10, False, "float_type"),
+        ("open", 11, None, "float_type"),
+        ("high", 12, -1.0, "greater_than"),
+    ]
+    for field, index, value, kind in cases:
+        detail = error(field, index, value)
+        assert detail["loc"] == ["body", field, index], detail
+        assert detail["type"] == kind, detail
+    response = client.post("/analyze/columnar", json={**base, "low": base["low"][:-1]})
+    assert response.status_code == 422 and response.json()["detail"][0]["loc"] == ["body", "low"]
+    print("Columnar validation passed.")
+
+def _parse_upload(fmt, body, chunk=7, **kwargs):
+    """Feeds `body` in small chunks so rows straddle chunk boundaries."""
+    parser = CandleStreamParser(fmt, **kwargs)
+    for i in range(0, len(body), chunk):
+        parser.feed(body[i:i + chunk])
+    return parser.close()
+
+def _upload_error(fmt, body, chunk=7, **kwargs):
+    try:
+        _parse_upload(fmt, body, chunk, **kwargs)
+    except IngestError as e:
+        return e
+    raise AssertionError(f"{fmt} upload was accepted")
+
+def test_upload_parser():
+    print("Checking streamed upload parser...")
+    start = 1_700_000_000_000
+    rows = [[start + i * 60000, 10.0 + i, 11.0 + i, 9.0 + i, 10.5 + i, 1.0] for i in range(40)]
+    ndjson = [json.dumps(row).encode() for row in rows]
+    csv = [b"timestamp,open,high,low,close,volume"] + [",".join(map(str, row)).encode() for row in rows]
+    for fmt, lines in (("ndjson", ndjson), ("csv", csv)):
+        for chunk in (7, 1 << 16):
+            frame = _parse_upload(fmt, b"\n".join(lines) + b"\n", chunk)
+            assert frame.timestamp.tolist() == [row[0] for row in rows], (fmt, chunk)
+
+    # Bad rows report their 1-based line, blank lines and the CSV header included,
+    # whether the block goes through the vectorized or the row-by-row path
+    bad_values = {
+        "fraction": (start + 0.5, f"{start}.5"),
+        "range": (1e30, "1e30"),
+        "bool": (True, None),
+        "price": (None, None),
+    }
+    for label, (ndjson_ts, csv_ts) in bad_values.items():
+        for chunk in (7, 1 << 16):
+            broken = list(ndjson)
+            row = list(rows[20])
+            if label == "price":
+                row[4] = -1.0
+            else:
+                row[0] = ndjson_ts
+            broken[20] = json.dumps(row).encode()
+            error = _upload_error("ndjson", b"\n".join(broken[:5] + [b""] + broken[5:]), chunk)
+            assert error.line == 22, (label, chunk, error.line, error.message)
+            if csv_ts is not None:
+                broken = list(csv)
+                broken[21] = ",".join([csv_ts] + [str(v) for v in rows[20][1:]]).encode()
+                error = _upload_error("csv", b"\n".join(broken), chunk)
+                assert error.line == 22, (label, chunk, error.line, error.message)
+    assert _upload_error("ndjson", b"\n".join(ndjson[:3] + [b"{not json"] + ndjson[3:])).line == 4
+    assert _upload_error("csv", b"\n".join(csv[:3] + [b"1,2,3"] + csv[3:])).line == 4
+
+    # Over-long rows are rejected by line number, complete or still pending
+    long_row = b" " * (MAX_LINE_BYTES + 1)
+    assert _upload_error("ndjson", b"\n".join(ndjson[:9] + [long_row] + ndjson[9:]), 1 << 16).line == 10
+    assert _upload_error("ndjson", b"\n".join(ndjson[:9]) + b"\n" + long_row, 1 << 16).line == 10
+
+    # Row limit: exactly max_rows is fine, one more is a RowLimitError
+    assert len(_parse_upload("ndjson", b"\n".join(ndjson[:10]), max_rows=10)) == 10
+    for chunk in (7, 1 << 16):
+        error = _upload_error("ndjson", b"\n".join(ndjson[:11]), chunk, max_rows=10, initial_rows=4)
+        assert isinstance(error, RowLimitError), error
+
+    # The upload route maps parser errors to 422 with the line number
+    client = TestClient(app)
+    broken = list(ndjson)
+    broken[4] = json.dumps([start + 0.25] + rows[4][1:]).encode()
+    response = client.post("/analyze/upload?symbol=TESTUSDT&timeframe=1m", content=b"\n".join(broken),
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 422, response.status_code
+    assert response.json()["detail"][0]["loc"] == ["body", "line", 5], response.json()
+    print("Upload parser passed.")
+
+def test_result_cache():
+    print("Checking the HTTP result cache...")
+    with open("data/sample_request.json", "r") as f:
+        payload = json.load(f)
+    client = TestClient(app)
+    runs = []
+    saved_cache, saved_run = engine.cache, engine._run
+    engine.cache = ResultCache(ttl=0.5, max_entries=2)
+
+    def counting_run(frame, symbol, *args, **kwargs):
+        runs.append(symbol)
+        return saved_run(frame, symbol, *args, **kwargs)
+    engine._run = counting_run
+    try:
+        def post(symbol, etag=None):
+            headers = {"If-None-Match": etag} if etag else {}
+            return client.post("/analyze", json={**payload, "symbol": symbol}, headers=headers)
+
+        first = post("AAA")
+        assert first.status_code == 200 and first.headers["ETag"], first.status_code
+        again = post("AAA")
+        assert again.content == first.content and again.headers["ETag"] == first.headers["ETag"]
+        assert runs == ["AAA"], runs
+
+        # Conditional requests: the current ETag (also weak or in a list) gets an empty 304
+        etag = first.headers["ETag"]
+        for header in (etag, "W/" + etag, '"other", ' + etag):
+            response = post("AAA", header)
+            assert response.status_code == 304 and response.content == b"", header
+            assert response.headers["ETag"] == etag
+        assert post("AAA", '"other"').status_code == 200
+
+        # LRU: touching AAA makes BBB the oldest entry when CCC arrives
+        post("BBB")
+        post("AAA")
+        post("CCC")
+        post("AAA")
+        assert runs == ["AAA", "BBB", "CCC"], runs
+        post("BBB")
+        assert runs == ["AAA", "BBB", "CCC", "BBB"], runs
+        stats = client.get("/cache/stats").json()
+        assert stats["evictions"] == 2 and stats["entries"] == 2, stats
+
+        # TTL: an expired entry is computed again
+        time.sleep(0.6)
+        post("BBB")
+        assert runs[-1] == "BBB" and len(runs) == 5, runs
+        assert client.get("/cache/stats").json()["expirations"] == 1
+
+        # Only the HTTP routes go through the cache; direct engine calls always run
+        before = engine.cache.stats()
+        candles = [Candle(**c) for c in payload["candles"]]
+        engine.analyze(candles, "BBB", payload["timeframe"])
+        engine.analyze(candles, "BBB", payload["timeframe"])
+        after = engine.cache.stats()
+        assert len(runs) == 7, runs
+        assert (after["hits"], after["misses"]) == (before["hits"], before["misses"]), after
+    finally:
+        engine.cache, engine._run = saved_cache, saved_run
+    print("Result cache passed.")
+
+def _rule_analyses(count):
+    """Rule-based analyses of `count` different symbols (no LLM involved)."""
+    rule_engine = SignalEngine()
+    rule_engine.llm.client = None
+    return [
+        rule_engine.analyze_frame(MarketFrame.from_records(synthetic_candles(400, seed=i)), f"SYM{i}USDT", "1m")
+        for i in range(count)
+    ]
+
+def _mock_reasoner(base_url, **kwargs):
+    reasoner = llm.LLMReasoner(**kwargs)
+    reasoner.client = llm.OpenAI(api_key="mock", base_url=base_url, max_retries=0)
+    return reasoner
+
+def test_llm_review_cache():
+    print("Checking LLM review cache and single-flight against the mock LLM server...")
+    if llm.OpenAI is None:
+        print("openai not installed, skipped.")
+        return
+    server, mock, base_url = start_mock_llm(delay=0.2)
+    try:
+        a, b, c, d = _rule_analyses(4)
+        reasoner = _mock_reasoner(base_url, cache_ttl=0.6, cache_max_entries=2)
+        first = reasoner.review(a)
+        assert first is not None and mock.stats["requests"] == 1
+        assert reasoner.review(a) == first and mock.stats["requests"] == 1
+
+        # Differences below the rounding share the key, but the model is sent the exact values
+        near = a.model_copy(update={"indicators": {
+            agent: {k: v * (1 + 1e-7) if isinstance(v, float) else v for k, v in values.items()}
+            for agent, values in a.indicators.items()
+        }})
+        assert reasoner.build_prompt(near) != reasoner.build_prompt(a)
+        assert reasoner.review_key(near) == reasoner.review_key(a)
+        assert reasoner.review(near) == first and mock.stats["requests"] == 1
+
+        # Size bound: b and c push out a, the least recently used entry
+        reasoner.review(b)
+        reasoner.review(c)
+        assert mock.stats["requests"] == 3 and reasoner.stats()["evictions"] == 1
+        reasoner.review(c)
+        assert mock.stats["requests"] == 3
+        reasoner.review(a)
+        assert mock.stats["requests"] == 4
+
+        # TTL: an expired review is requested again
+        time.sleep(0.7)
+        reasoner.review(a)
+        assert mock.stats["requests"] == 5
+        stats = reasoner.stats()
+        assert (stats["hits"], stats["misses"], stats["calls"]) == (3, 5, 5), stats
+
+        # Concurrent identical reviews share one upstream call
+        reasoner = _mock_reasoner(base_url)
+        before = mock.stats["requests"]
+        barrier = threading.Barrier(8)
+        def review():
+            barrier.wait()
+            return reasoner.review(d)
+        with ThreadPoolExecutor(8) as pool:
+            verdicts = list(pool.map(lambda _: review(), range(8)))
+        assert mock.stats["requests"] == before + 1, mock.stats
+        assert verdicts[0] is not None and all(v == verdicts[0] for v in verdicts)
+        stats = reasoner.stats()
+        assert (stats["misses"], stats["coalesced"], stats["calls"]) == (1, 7, 1), stats
+    finally:
+        server.shutdown()
+        server.server_close()
+    print("LLM review cache passed.")
+
+def test_batch_reviewer():
+    print("Checking batched LLM reviews against the mock LLM server...")
+    if llm.OpenAI is None:
+        print("openai not installed, skipped.")
+        return
+    analyses = _rule_analyses(8)
+    symbols = [a.symbol for a in analyses]
+
+    # parse_batch maps answers back by id, whatever their order, and drops
+    # entries with a wrong symbol, an unknown id, a bad signal or a repeated id
+    def entry(i, symbol=None, signal="HOLD"):
+        return {"id": i, "symbol": symbol or symbols[i - 1], "signal": signal, "explanation": f"item {i}"}
+    answer = json.dumps({"reviews": [
+        entry(3), entry(1, signal="buy"), entry(2, symbol="OTHERUSDT"), entry(9, symbol="SYM9USDT"), entry(4, signal="MAYBE"),
+        entry(5), entry(5, signal="SELL"), {"id": "x"}, "junk", entry(6, symbol=symbols[5].lower()),
+    ]})
+    verdicts = llm.BatchLLMReviewer.parse_batch(answer, analyses)
+    assert [v and v["explanation"] for v in verdicts] == ["item 1", None, "item 3", None, "item 5", "item 6", None, None]
+    assert verdicts[4]["signal"] == "HOLD"
+    assert llm.BatchLLMReviewer.parse_batch("not json", analyses) == [None] * 8
+    assert llm.BatchLLMReviewer.parse_batch('{"reviews": {}}', analyses) == [None] * 8
+
+    # Against the mock: one packed call, each symbol gets its own verdict, and the
+    # items the answer drops are reviewed on their own
+    for drop_rate in (0.4, 1.0):
+        server, mock, base_url = start_mock_llm(delay=0.1, drop_rate=drop_rate, seed=5)
+        try:
+            reviewer = llm.BatchLLMReviewer(_mock_reasoner(base_url, cache_ttl=0), max_items=8, max_wait=0.5)
+            with ThreadPoolExecutor(8) as pool:
+                verdicts = list(pool.map(reviewer.review, analyses))
+            stats = reviewer.stats()
+            assert (stats["batches"], stats["batched_items"]) == (1, 8), stats
+            assert mock.stats["batched_requests"] == 1, mock.stats
+            assert mock.stats["requests"] == 1 + stats["fallbacks"], (mock.stats, stats)
+            if drop_rate < 1:
+                assert 0 < stats["fallbacks"] < 8, stats
+            else:
+                assert stats["fallbacks"] == 8, stats
+            for analysis, verdict in zip(analyses, verdicts):
+                assert verdict is not None, analysis.symbol
+                assert verdict["explanation"] == f"Mock review of {analysis.symbol}: {analysis.signal.value} stands."
+        finally:
+            server.shutdown()
+            server.server_close()
+    print("Batched LLM reviews passed.")
+
+@contextlib.contextmanager
+def _temp_store():
+    """Points the candle store at a scratch directory for the duration."""
+    saved = market_data.config.DATA_DIR
+    market_data.config.DATA_DIR = tempfile.mkdtemp(prefix="signal-engine-")
+    try:
+        yield market_data.config.DATA_DIR
+    finally:
+        shutil.rmtree(market_data.config.DATA_DIR, ignore_errors=True)
+        market_data.config.DATA_DIR = saved
+
+def _kline(ts):
+    price = ts / 60000
+    return [ts, str(price), str(price + 1), str(price - 1), str(price), "1.0"]
+
+class _KlinesServer:
+    """
+    Stand-in for the Binance klines endpoint: 1m candles for every minute
+    except `exchange_gap`, answered after a random delay so pages finish out
+    of order. Requests whose startTime is in `fail_starts` get HTTP 400.
+    """
+
+    def __init__(self, exchange_gap):
+        self.exchange_gap = exchange_gap
+        self.fail_starts = set()
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+                start, end, limit = int(query["startTime"]), int(query["endTime"]), int(query["limit"])
+                server.requests.append(start)
+                time.sleep(random.uniform(0, 0.02))
+                if start in server.fail_starts:
+                    self.send_response(400)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                first = -(-start // 60000) * 60000
+                opens = [t for t in range(first, end + 1, 60000)
+                         if not server.exchange_gap[0] <= t < server.exchange_gap[1]][:limit]
+                body = json.dumps([_kline(t) for t in opens]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def _candle(ts):
+    return {"timestamp": ts, "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5, "volume": 3.0}
+
+def test_storage_concurrency():
+    print("Checking column store writers and readers under concurrency...")
+    minute = 60000
+    with _temp_store():
+        # A torn append (timestamp written last) is invisible to readers and
+        # left on disk until the next writer repairs it
+        save_candles("TESTUSDT", "1m", [_candle(i * minute) for i in range(10)], append=True)
+        store = get_store_path("TESTUSDT", "1m")
+        with open(os.path.join(store, "close.bin"), "ab") as f:
+            f.write(b"\0" * 12)
+        assert len(load_arrays("TESTUSDT", "1m")["timestamp"]) == 10
+        assert os.path.getsize(os.path.join(store, "close.bin")) == 10 * 8 + 12, "reader modified the store"
+        save_candles("TESTUSDT", "1m", [_candle(10 * minute)], append=True)
+        sizes = {os.path.getsize(os.path.join(store, f"{name}.bin"))
+                 for name in ("timestamp", "open", "high", "low", "close", "volume")}
+        assert sizes == {11 * 8}, sizes
+
+        # Appenders, an overlapping rewriter and readers at once: nothing is
+        # lost and every read is a consistent, sorted prefix
+        errors = []
+        def appender(offset):
+            for i in range(40):
+                ts = (100 + offset + 4 * i) * minute
+                save_candles("TESTUSDT", "1m", [_candle(ts)], append=True)
+        def rewriter():
+            for i in range(15):
+                save_candles("TESTUSDT", "1m", [_candle(i * minute)], append=True)
+        def reader():
+            for _ in range(200):
+                try:
+                    arrays = load_arrays("TESTUSDT", "1m")
+                except Exception as e:
+                    errors.append(repr(e))
+                    continue
+                ts = np.array(arrays["timestamp"])
+                if len(ts) < 11 or not np.all(np.diff(ts) > 0) or len(arrays["close"]) != len(ts):
+                    errors.append(len(ts))
+        threads = [threading.Thread(target=appender, args=(k,)) for k in range(4)]
+        threads += [threading.Thread(target=rewriter), threading.Thread(target=reader)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert not errors, f"inconsistent reads: {errors[:5]}"
+        ts = load_arrays("TESTUSDT", "1m")["timestamp"]
+        # Concurrent appends land out of order, so some go through the merge path
+        assert set(ts.tolist()) == {i * minute for i in range(15)} | {(100 + k) * minute for k in range(160)}
+        assert sorted(e for e in os.listdir(store) if e.startswith("g")) == [open(os.path.join(store, "CURRENT")).read()]
+    print("Storage concurrency passed.")
+
+def test_downloader_resume():
+    print("Checking resumable downloader against a stand-in klines server...")
+    minute = 60000
+    start, end = 1_700_000_040_000, 1_700_000_040_000 + 12_000 * minute
+    exchange_gap = (start + 9_500 * minute, start + 9_530 * minute)
+    expected = np.array([t for t in range(start, end, minute) if not exchange_gap[0] <= t < exchange_gap[1]])
+
+    server = _KlinesServer(exchange_gap)
+    with _temp_store():
+        # An earlier run stored a middle stretch with an interior gap
+        held = [t for t in range(start + 4_000 * minute, start + 7_000 * minute, minute)
+                if not start + 5_000 * minute <= t < start + 5_200 * minute]
+        save_candles("TESTUSDT", "1m", [parse_kline(_kline(t)) for t in held])
+        windows = plan_windows("TESTUSDT", "1m", start, end)
+        assert windows[0][0] == start, "range before the stored head was skipped"
+        assert (start + 5_000 * minute, start + 5_200 * minute - 1) in windows, "interior gap not planned"
+        assert all(not (start + 4_000 * minute <= s < start + 5_000 * minute) for s, _ in windows), \
+            "a stored stretch was planned again"
+
+        # Interrupted run: every page after the failing one stays uncommitted
+        failing = windows[6][0]
+        server.fail_starts.add(failing)
+        job, = download_history(["TESTUSDT"], ["1m"], start, end, workers=4,
+                                weight_per_minute=1e9, base_url=server.base_url)
+        assert job.error, "failing page did not stop the job"
+        stored = np.asarray(load_arrays("TESTUSDT", "1m")["timestamp"])
+        assert stored[0] == start and not np.any((stored >= failing) & ~np.isin(stored, held)), \
+            "pages were committed out of order"
+
+        server.fail_starts.clear()
+        job, = download_history(["TESTUSDT"], ["1m"], start, end, workers=4,
+                                weight_per_minute=1e9, base_url=server.base_url)
+        assert not job.error, job.error
+        arrays = load_arrays("TESTUSDT", "1m")
+        assert np.array_equal(arrays["timestamp"], expected), "resumed store differs from the full range"
+        assert np.array_equal(arrays["close"], expected / minute), "columns misaligned"
+
+        # Up to date: only the exchange's own gap is re-checked
+        server.requests.clear()
+        download_history(["TESTUSDT"], ["1m"], start, end, weight_per_minute=1e9, base_url=server.base_url)
+        assert server.requests == [exchange_gap[0]], server.requests
+    server.close()
+    print("Downloader resume passed.")
+
+class _KlineSocketServer:
+    """
+    Stand-in for Binance's combined-stream websocket: accepts one client,
+    completes the RFC 6455 handshake and sends each queued message as an
+    unmasked text frame, then closes.
+    """
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.url = f"ws://127.0.0.1:{self.sock.getsockname()[1]}/stream"
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        conn, _ = self.sock.accept()
+        request = b""
+        while b"\r\n\r\n" not in request:
+            request += conn.recv(4096)
+        key = next(line.split(b":", 1)[1].strip() for line in request.split(b"\r\n")
+                   if line.lower().startswith(b"sec-websocket-key"))
+        accept = base64.b64encode(hashlib.sha1(key + b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11").digest())
+        conn.sendall(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        time.sleep(0.3)  # Let the client subscribe
+        for message in self.messages:
+            data = message.encode()
+            header = bytes([0x81, len(data)]) if len(data) < 126 else bytes([0x81, 126]) + struct.pack("!H", len(data))
+            conn.sendall(header + data)
+        time.sleep(0.5)
+        conn.close()
+        self.sock.close()
+
+def test_ws_ingestor():
+    print("Checking websocket ingestor against stand-in websocket and klines servers...")
+    if ws_ingestor.websocket is None:
+        print("websocket-client not installed, skipped.")
+        return
+    minute = 60000
+    t0 = 1_700_000_040_000
+
+    def event(ts, closed, separators=(",", ":")):
+        kline = {"t": ts, "T": ts + minute - 1, "s": "TESTUSDT", "i": "1m", "o": "1.0", "h": "2.0",
+                 "l": "0.5", "c": str(ts / minute), "v": "3.0", "x": closed}
+        return json.dumps({"stream": "testusdt@kline_1m", "data": {"e": "kline", "s": "TESTUSDT", "k": kline}},
+                          separators=separators)
+
+    messages = [
+        event(t0, False), event(t0, True),
+        event(t0 + minute, False), event(t0 + minute, False, separators=(", ", ": ")),
+        event(t0 + minute, True, separators=(", ", ": ")),  # Not Binance's byte layout
+        event(t0 + minute, True),                          # Duplicate
+        event(t0 + 4 * minute, True),                      # t0+2m and t0+3m come over REST
+        json.dumps({"result": None, "id": 1}),
+    ]
+    rest = _KlinesServer(exchange_gap=(0, 0))
+    ws = _KlineSocketServer(messages)
+    calls = []
+    with _temp_store():
+        ingestor = ws_ingestor.WSIngestor([("TESTUSDT", "1m")], ws_url=ws.url, rest_base_url=rest.base_url,
+                                          on_candle=lambda stream, frame, new: calls.append((int(frame.timestamp[-1]), new)),
+                                          weight_per_minute=1e9, workers=1)
+        ingestor.start(catch_up=False)
+        deadline = time.time() + 10
+        while (ingestor.stats["closed"] < 3 or ingestor.stats["duplicates"] < 1) and time.time() < deadline:
+            time.sleep(0.05)
+        ingestor.stop()
+        stream = ingestor.streams["testusdt@kline_1m"]
+        expected = t0 + minute * np.arange(5)
+        assert ingestor.stats["messages"] == len(messages), ingestor.stats
+        assert (ingestor.stats["closed"], ingestor.stats["duplicates"], ingestor.stats["gap_filled"]) == (3, 1, 2), \
+            ingestor.stats
+        assert np.array_equal(stream.ring.frame().timestamp, expected), "ring out of order"
+        assert calls == [(t0, 1), (t0 + minute, 1), (t0 + 4 * minute, 3)], calls
+        assert np.array_equal(load_arrays("TESTUSDT", "1m")["timestamp"], expected), "store differs from the ring"
+    rest.close()
+    print("WebSocket ingestor passed.")
+
+def test_resample_parity():
+    print("Checking 1m resampling against pandas...")
+    rng = np.random.default_rng(11)
+    minute = 60000
+    # Five weeks from a Wednesday 13:37 UTC, with gaps: scattered minutes, a
+    # whole empty hour and a missing bucket open
+    ts = 1_700_055_420_000 + minute * np.arange(5 * 7 * 24 * 60)
+    drop = rng.random(len(ts)) < 0.02
+    drop[3000:3060 + 75] = True
+    drop[(ts // minute) % 600 == 0] = True
+    ts = ts[~drop]
+    close = 100 + np.cumsum(rng.normal(0, 0.1, len(ts)))
+    columns = {"timestamp": ts, "open": close + rng.normal(0, 0.05, len(ts)), "high": close + 0.2,
+               "low": close - 0.2, "close": close, "volume": rng.random(len(ts))}
+    df = pd.DataFrame({k: v for k, v in columns.items() if k != "timestamp"},
+                      index=pd.to_datetime(ts, unit="ms", utc=True))
+
+    for interval, minutes, rule in (("10m", 10, "10min"), ("1h", 60, "1h"), ("1w", 7 * 24 * 60, "W-MON")):
+        expected = df.resample(rule, closed="left", label="left").agg(
+            {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}).dropna()
+        expected_ts = expected.index.as_unit("ms").asi8
+        got = resample_arrays(columns, minutes, include_partial=True)
+        assert np.array_equal(got["timestamp"], expected_ts), f"{interval}: bucket opens differ"
+        for name in ("open", "high", "low", "close", "volume"):
+            assert np.allclose(got[name], expected[name].to_numpy(), rtol=1e-12, atol=0), f"{interval}: {name}"
+
+        # Without include_partial only buckets covered from open to close remain
+        complete = (expected_ts >= ts[0]) & (expected_ts + minutes * minute <= ts[-1] + minute)
+        assert np.array_equal(resample_arrays(columns, minutes)["timestamp"], expected_ts[complete]), \
+            f"{interval}: partial edge buckets"
+
+    # Incremental updates over a growing 1m store match a full rebuild
+    with _temp_store():
+        cuts = np.sort(rng.choice(np.arange(1, len(ts)), size=40, replace=False))
+        for lo, hi in zip(np.concatenate(([0], cuts)), np.concatenate((cuts, [len(ts)]))):
+            save_candles("TESTUSDT", "1m", [
+                dict(zip(columns, row)) for row in zip(*(columns[name][lo:hi].tolist() for name in columns))
+            ], append=True)
+            for interval in ("10m", "1h", "1w"):
+                update_resampled("TESTUSDT", interval)
+        for interval in ("10m", "1h", "1w"):
+            incremental = {k: np.array(v) for k, v in load_arrays("TESTUSDT", interval).items()}
+            update_resampled("TESTUSDT", interval, rebuild=True)
+            rebuilt = load_arrays("TESTUSDT", interval)
+            assert len(incremental["timestamp"]) > 0, interval
+            for name in incremental:
+                assert np.array_equal(incremental[name], rebuilt[name]), f"{interval}: incremental {name} differs"
+    print("Resample parity passed.")
+
 if __name__ == "__main__":
     test_engine()
+    test_streaming_parity()
+    test_indicator_graph()
+    test_last_value_parity()
+    test_lookback_trim()
+    test_executor_parity()
+    test_backtest_parity()
+    test_sweep_parity()
+    test_columnar_validation()
+    test_upload_parser()
+    test_result_cache()
+    test_llm_review_cache()
+    test_batch_reviewer()
+    test_storage_concurrency()
+    test_downloader_resume()
+    test_ws_ingestor()
+    test_resample_parity()